@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile
+
+# file_id'ning o'zi rad etilganini bildiruvchi xato matnlari; qolgan BadRequest'lar
+# (uzun caption, chat topilmadi, parse_mode...) qayta yuklash bilan tuzalmaydi
+STALE_FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file", "file reference", "wrong file_id")
+
+
+def _is_stale_file_id(exc: TelegramBadRequest) -> bool:
+    text = (exc.message or "").lower()
+    return any(marker in text for marker in STALE_FILE_ID_ERRORS)
+
+
+def _photo_file_id(message: Any) -> str | None:
+    photo = getattr(message, "photo", None)
+    return photo[-1].file_id if photo else None
+
+
+class AssetRegistry:
+    """
+    Bot bilan birga keladigan fayllar (assets/*.png) uchun Telegram file_id
+    keshi. Fayl bir marta yuklanadi, qaytgan file_id fayl mazmunining sha256
+    xeshi bo'yicha diskka yoziladi va keyingi yuborishlarda ishlatiladi.
+    Telegram eskirgan id'ni rad etsa — fayl qayta yuklanadi.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ids: dict[str, str] = self._load()
+        self._digests: dict[str, str | None] = {}  # fayl yo'li -> sha256 (None — fayl yo'q)
+        self.uploads = 0
+        self.reused = 0
+        self.stale = 0
+
+    def _load(self) -> dict[str, str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return {}
+        return {str(k): str(v) for k, v in data.items()} if isinstance(data, dict) else {}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._ids, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def digest(self, file_path: str) -> str | None:
+        # Xesh bir marta hisoblanadi; fayl almashtirilsa — bot qayta ishga tushiriladi
+        if file_path not in self._digests:
+            try:
+                with open(file_path, "rb") as f:
+                    self._digests[file_path] = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                self._digests[file_path] = None
+        return self._digests[file_path]
+
+    async def send(
+        self,
+        file_path: str,
+        send: Callable[[Any], Awaitable[Any]],
+        extract: Callable[[Any], str | None] = _photo_file_id,
+    ) -> Any:
+        """
+        `send(media)` — media file_id (str) yoki FSInputFile bo'ladi;
+        `extract(natija)` yuklangan faylning file_id'sini qaytaradi.
+        """
+        digest = self.digest(file_path)
+        if digest is None:
+            raise FileNotFoundError(file_path)
+        file_id = self._ids.get(digest)
+        if file_id:
+            try:
+                result = await send(file_id)
+                self.reused += 1
+                return result
+            except TelegramBadRequest as exc:
+                if not _is_stale_file_id(exc):
+                    raise
+                # Eskirgan yoki boshqa botga tegishli id — qayta yuklaymiz
+                self.stale += 1
+                self._ids.pop(digest, None)
+
+        result = await send(FSInputFile(file_path))
+        self.uploads += 1
+        try:
+            new_id = extract(result)
+        except Exception:
+            new_id = None
+        if new_id:
+            self._ids[digest] = new_id
+            try:
+                await asyncio.to_thread(self._save)
+            except Exception:
+                pass
+        return result
+
+    def stats(self) -> dict[str, int]:
+        return {"cached": len(self._ids), "uploads": self.uploads, "reused": self.reused, "stale": self.stale}
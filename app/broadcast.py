@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from aiogram.exceptions import TelegramForbiddenError
+
+from app.outbound import PRIORITY_BACKGROUND, outbound_priority
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class BroadcastEngine:
+    """
+    Ommaviy xabar yuborish: maqsadlar ro'yxati bo'yicha bir nechta worker,
+    tezlik chiquvchi navbat (OutboundLimiter) orqali cheklanadi. Holat
+    checkpoint faylga yoziladi — qayta ishga tushganda davom ettiriladi.
+
+    Checkpoint'da `next` — undan oldingi barcha maqsadlar bajarilgan indeks,
+    `done_ahead` — `next` dan keyin allaqachon bajarilganlari; tiklashda ular
+    o'tkazib yuboriladi, hisoblagichlar ikki marta oshmaydi.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        send: Callable[[int, dict], Awaitable[Any]],
+        concurrency: int = 20,
+        checkpoint_interval: float = 2.0,
+        on_finish: Callable[[dict], Awaitable[None]] | None = None,
+    ):
+        self.path = path
+        self.send = send
+        self.concurrency = max(1, int(concurrency))
+        self.checkpoint_interval = checkpoint_interval
+        self.on_finish = on_finish
+        self.job: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._done_ahead: set[int] = set()
+        self._last_checkpoint = 0.0
+        self._resumed_at = 0.0
+        self._suspending = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def load(self) -> dict | None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except Exception:
+            return None
+        return job if isinstance(job, dict) else None
+
+    async def _checkpoint(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_checkpoint < self.checkpoint_interval:
+            return
+        self._last_checkpoint = now
+        job = dict(self.job)
+        job["elapsed"] = self._elapsed()
+        job["done_ahead"] = sorted(self._done_ahead)
+        try:
+            await asyncio.to_thread(_write_json_atomic, self.path, job)
+        except Exception:
+            pass
+
+    def _elapsed(self) -> float:
+        job = self.job or {}
+        if job.get("state") == "running" and self._resumed_at:
+            return job.get("elapsed", 0.0) + (time.monotonic() - self._resumed_at)
+        return job.get("elapsed", 0.0)
+
+    def start(self, targets: list[int], payload: dict[str, Any]) -> dict:
+        if self.running:
+            raise RuntimeError("Boshqa xabar yuborish jarayoni davom etmoqda.")
+        self.job = {
+            **payload,
+            "state": "running",
+            "targets": list(targets),
+            "next": 0,
+            "delivered": 0,
+            "blocked": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "started_at": datetime.now().isoformat(),
+        }
+        self._launch()
+        return self.job
+
+    def resume(self) -> dict | None:
+        """Checkpoint'dagi tugallanmagan ishni davom ettiradi."""
+        if self.running:
+            return self.job
+        job = self.load()
+        if not job or job.get("state") != "running":
+            return None
+        self.job = job
+        self._launch()
+        return job
+
+    def _launch(self) -> None:
+        self._done_ahead = set(self.job.pop("done_ahead", None) or ())
+        self._suspending = False
+        self._resumed_at = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+    async def cancel(self) -> bool:
+        if not self.running:
+            return False
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        return True
+
+    async def suspend(self) -> None:
+        """Bot to'xtaganda: checkpoint yoziladi, holat "running" qoladi (keyin resume)."""
+        if not self.running:
+            return
+        self._suspending = True
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    async def _run(self) -> None:
+        job = self.job
+        targets = job["targets"]
+        cursor = job["next"]
+        lock = asyncio.Lock()
+
+        async def worker():
+            nonlocal cursor
+            while True:
+                async with lock:
+                    while cursor in self._done_ahead:
+                        # Oldingi ishga tushishda yuborilgan
+                        cursor += 1
+                    if cursor >= len(targets):
+                        return
+                    index = cursor
+                    cursor += 1
+                try:
+                    await self.send(targets[index], job)
+                    job["delivered"] += 1
+                except TelegramForbiddenError:
+                    # Foydalanuvchi botni bloklagan yoki o'chirilgan
+                    job["blocked"] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    job["failed"] += 1
+                self._mark_done(index)
+                await self._checkpoint()
+
+        try:
+            # Ommaviy yuborish interaktiv javoblardan keyin navbatga turadi
+            with outbound_priority(PRIORITY_BACKGROUND):
+                await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        except asyncio.CancelledError:
+            job["elapsed"] = self._elapsed()
+            if not self._suspending:
+                job["state"] = "cancelled"
+            self._resumed_at = time.monotonic()
+            await self._checkpoint(force=True)
+            raise
+        job["elapsed"] = self._elapsed()
+        job["state"] = "done"
+        job["finished_at"] = datetime.now().isoformat()
+        await self._checkpoint(force=True)
+        if self.on_finish is not None:
+            try:
+                await self.on_finish(job)
+            except Exception:
+                pass
+
+    def _mark_done(self, index: int) -> None:
+        job = self.job
+        if index != job["next"]:
+            self._done_ahead.add(index)
+            return
+        job["next"] += 1
+        while job["next"] in self._done_ahead:
+            self._done_ahead.discard(job["next"])
+            job["next"] += 1
+
+    def status(self) -> dict[str, Any] | None:
+        job = self.job or self.load()
+        if not job:
+            return None
+        processed = job["delivered"] + job["blocked"] + job["failed"]
+        elapsed = self._elapsed() if job is self.job else job.get("elapsed", 0.0)
+        return {
+            "state": job.get("state"),
+            "filters": job.get("filters"),
+            "total": len(job.get("targets") or ()),
+            "processed": processed,
+            "delivered": job["delivered"],
+            "blocked": job["blocked"],
+            "failed": job["failed"],
+            "elapsed_s": round(elapsed, 1),
+            "rate": round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+        }
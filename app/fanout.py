@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple
+
+
+class Outcome(NamedTuple):
+    item: Any
+    value: Any
+    error: BaseException | None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.value is not False
+
+
+async def fan_out(
+    func: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    limit: int = 5,
+) -> list[Outcome]:
+    """
+    `func(item)`ni har bir element uchun parallel bajaradi, bir vaqtda ko'pi
+    bilan `limit` ta. Natijalar kirish tartibida qaytadi; xatolar yutilmaydi,
+    Outcome.error'da saqlanadi. Telegram limitlari OutboundLimiter'da.
+    """
+    items = list(items)
+    semaphore = asyncio.Semaphore(max(1, int(limit)))
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return Outcome(item, await func(item), None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                return Outcome(item, None, exc)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+def summarize(outcomes: list[Outcome]) -> str:
+    """Hudud bo'yicha natija: "✅ Quva, ❌ Rishton"."""
+    return ", ".join(("✅ " if o.ok else "❌ ") + str(o.item) for o in outcomes)
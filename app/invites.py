@@ -0,0 +1,175 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Iterable
+
+
+class InviteLinkPool:
+    """
+    Har bir haydovchilar guruhi uchun oldindan yaratilgan bir martalik
+    (member_limit=1) invite silkalar zaxirasi. `take()` silkani darhol beradi,
+    zaxira fon vazifasida to'ldiriladi; muddati yaqinlashgan ishlatilmagan
+    silkalar bekor qilinib, yangisi bilan almashtiriladi.
+
+    Silka haydovchiga berilganda kamida `min_lifetime` soniya amal qilishi
+    kafolatlanadi (yaratishda expire_date = hozir + ttl).
+    """
+
+    def __init__(
+        self,
+        create: Callable[[int, int], Awaitable[str]],
+        revoke: Callable[[int, str], Awaitable[Any]],
+        size: int = 3,
+        ttl: float = 7 * 86400,
+        min_lifetime: float = 5 * 86400,
+        refill_interval: float = 600.0,
+        on_change: Callable[[], None] | None = None,
+    ):
+        self.create = create
+        self.revoke = revoke
+        self.size = max(0, int(size))
+        self.ttl = ttl
+        self.min_lifetime = min(min_lifetime, ttl)
+        self.refill_interval = refill_interval
+        self.on_change = on_change
+        self._links: dict[int, deque] = {}  # chat_id -> deque[(link, expires_ts)]
+        self._chats: list[int] = []
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._backoff: dict[int, float] = {}
+        self._stale: list[tuple[int, str]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.revoked = 0
+        self.errors = 0
+
+    # ---------- guruhlar ----------
+    def set_chats(self, chat_ids: Iterable[int]) -> None:
+        """Kuzatiladigan guruhlar; olib tashlanganlarning silkalari keyingi to'ldirishda bekor qilinadi."""
+        self._chats = list(dict.fromkeys(chat_ids))
+        self._wake.set()
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change()
+            except Exception:
+                pass
+
+    # ---------- berish ----------
+    def take(self, chat_id: int) -> str | None:
+        links = self._links.get(chat_id)
+        deadline = time.time() + self.min_lifetime
+        while links:
+            link, expires = links.popleft()
+            if expires >= deadline:
+                self.hits += 1
+                self._changed()
+                self._wake.set()
+                return link
+            # Muddati qisqa qolgan — fon vazifasi bekor qiladi
+            self._stale.append((chat_id, link))
+        self.misses += 1
+        self._wake.set()
+        return None
+
+    # ---------- to'ldirish ----------
+    async def refill(self) -> None:
+        now = time.time()
+        deadline = now + self.min_lifetime
+        stale, self._stale = self._stale, []
+        # Olib tashlangan yoki snapshot'dan tiklangan, lekin endi kuzatilmaydigan guruhlar
+        for chat_id in [chat_id for chat_id in self._links if chat_id not in self._chats]:
+            stale.extend((chat_id, link) for link, _ in self._links.pop(chat_id))
+        for chat_id in self._chats:
+            links = self._links.setdefault(chat_id, deque())
+            while links and links[0][1] < deadline:
+                stale.append((chat_id, links.popleft()[0]))
+        for chat_id, link in stale:
+            try:
+                await self.revoke(chat_id, link)
+                self.revoked += 1
+            except Exception:
+                self.errors += 1
+        if stale:
+            self._changed()
+
+        for chat_id in list(self._chats):
+            if self._backoff.get(chat_id, 0.0) > time.monotonic():
+                continue
+            links = self._links.setdefault(chat_id, deque())
+            while len(links) < self.size and chat_id in self._chats:
+                expires = int(time.time() + self.ttl)
+                try:
+                    link = await self.create(chat_id, expires)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    # Bot guruhda admin emas va h.k. — biroz keyin qayta urinamiz
+                    self.errors += 1
+                    self._backoff[chat_id] = time.monotonic() + self.refill_interval
+                    break
+                links.append((link, expires))
+                self.created += 1
+                self._changed()
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                await self.refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self.size > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        # Zaxiradagi silkalar bekor qilinmaydi — runtime snapshot orqali keyingi ishga tushishga o'tadi
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    # ---------- snapshot ----------
+    def export(self) -> dict[int, list[tuple[str, int]]]:
+        return {chat_id: list(links) for chat_id, links in self._links.items() if links}
+
+    def restore(self, data: Any) -> int:
+        if not isinstance(data, dict):
+            return 0
+        restored = 0
+        for chat_id, links in data.items():
+            try:
+                bucket = self._links.setdefault(int(chat_id), deque())
+                for link, expires in links:
+                    bucket.append((str(link), int(expires)))
+                    restored += 1
+            except Exception:
+                continue
+        return restored
+
+    def stats(self) -> dict[str, Any]:
+        served = self.hits + self.misses
+        return {
+            "size": self.size,
+            "available": {chat_id: len(links) for chat_id, links in self._links.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / served * 100, 1) if served else 0.0,
+            "created": self.created,
+            "revoked": self.revoked,
+            "errors": self.errors,
+        }
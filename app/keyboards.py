@@ -0,0 +1,63 @@
+from typing import Any, Callable, Hashable
+
+
+class KeyboardCache:
+    """
+    Statik klaviaturalar keshi: har bir markup bir marta quriladi va keyin
+    o'sha obyekt qayta beriladi. Markupning JSON ko'rinishi ham birinchi
+    yuborishda hisoblanib saqlanadi (qarang: app.session.CachedMarkupSession).
+
+    Keshdagi markuplar o'zgartirilmasligi kerak — ular barcha javoblarda umumiy.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._markups: dict[Hashable, Any] = {}
+        # id(markup) -> [markup, json | None]; markupning o'zi ham saqlanadi, shuning uchun id qayta ishlatilmaydi
+        self._by_id: dict[int, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.json_hits = 0
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        markup = self._markups.get(key)
+        if markup is not None:
+            self.hits += 1
+            return markup
+        self.misses += 1
+        if len(self._markups) >= self.max_entries:
+            self.clear()
+        markup = build()
+        self._markups[key] = markup
+        self._by_id[id(markup)] = [markup, None]
+        return markup
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = [key for key in self._markups if predicate(key)]
+        for key in keys:
+            markup = self._markups.pop(key)
+            self._by_id.pop(id(markup), None)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._markups.clear()
+        self._by_id.clear()
+
+    def serialized(self, markup: Any, dumps: Callable[[Any], str]) -> str | None:
+        """Keshdagi markup uchun tayyor JSON; boshqa markuplar uchun None."""
+        entry = self._by_id.get(id(markup))
+        if entry is None or entry[0] is not markup:
+            return None
+        if entry[1] is None:
+            entry[1] = dumps(markup)
+        else:
+            self.json_hits += 1
+        return entry[1]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "markups": len(self._markups),
+            "hits": self.hits,
+            "misses": self.misses,
+            "json_hits": self.json_hits,
+        }
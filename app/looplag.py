@@ -0,0 +1,173 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import deque
+from types import CodeType, FrameType
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from app.metrics import RollingHistogram
+
+
+class SlowCallback(NamedTuple):
+    at: float            # time.time(), bloklanish boshlangan payt (taxminan)
+    seconds: float       # loop javob bermay turgan vaqt
+    handler: str | None
+    update_type: str | None
+    where: str | None    # loyiha kodidagi eng chuqur kadr: "bot.py:123 funksiya"
+
+
+class LoopLagMonitor:
+    """
+    Event loop kechikishini alohida thread'dan o'lchaydi: har `interval`
+    soniyada loop'ga call_soon_threadsafe orqali "probe" yuboriladi, u
+    bajarilguncha o'tgan vaqt — lag (RollingHistogram'ga yoziladi).
+
+    Probe `slow_threshold` ichida bajarilmasa loop bloklangan: o'sha paytdagi
+    stekdan handler nomi, update turi (register_context orqali) va loyiha
+    kodidagi joy olinadi, loop bo'shagach SlowCallback yoziladi.
+
+    Lag `alert_threshold`dan `alert_after` soniya uzluksiz yuqori tursa
+    `on_alert(matn)` loop ichida chaqiriladi (keyingisi `alert_cooldown`dan keyin).
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        slow_threshold: float = 0.1,
+        alert_threshold: float = 0.5,
+        alert_after: float = 30.0,
+        alert_cooldown: float = 900.0,
+        project_dir: str | None = None,
+        on_slow: Callable[[SlowCallback], None] | None = None,
+        on_alert: Callable[[str], Awaitable[Any]] | None = None,
+        history: int = 50,
+    ):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.alert_threshold = alert_threshold
+        self.alert_after = alert_after
+        self.alert_cooldown = alert_cooldown
+        self.project_dir = os.path.abspath(project_dir) if project_dir else None
+        self.on_slow = on_slow
+        self.on_alert = on_alert
+        self.lag = RollingHistogram()
+        self.slow: deque[SlowCallback] = deque(maxlen=history)
+        self.slow_by_handler: dict[str, int] = {}
+        self.alerts = 0
+        self._contexts: dict[CodeType, Callable[[dict], tuple[str | None, str | None]]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._thread: threading.Thread | None = None
+        self._halt = threading.Event()
+        self._above_since: float | None = None
+        self._last_alert = 0.0
+
+    def register_context(self, func: Callable, extract: Callable[[dict], tuple[str | None, str | None]]) -> None:
+        """`func` stekda bo'lsa, uning lokal o'zgaruvchilaridan (handler, update turi) olinadi."""
+        self._contexts[func.__code__] = extract
+
+    # ---------- ishga tushirish ----------
+    def start(self, loop: asyncio.AbstractEventLoop | None = None) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._halt.clear()
+        self._thread = threading.Thread(target=self._run, name="loop-lag-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._halt.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + self.slow_threshold + 1)
+            self._thread = None
+
+    # ---------- o'lchash (monitor thread) ----------
+    def _run(self) -> None:
+        while not self._halt.wait(self.interval):
+            done = threading.Event()
+            started = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(done.set)
+            except RuntimeError:
+                return  # loop yopilgan
+            blocked = None
+            if not done.wait(self.slow_threshold):
+                blocked = self._describe_stack()
+                while not done.wait(self.interval):
+                    if self._halt.is_set():
+                        return
+            lag = time.perf_counter() - started
+            self.lag.observe(lag)
+            if blocked is not None:
+                self._record_slow(lag, blocked)
+            self._check_alert(lag)
+
+    def _describe_stack(self) -> tuple[str | None, str | None, str | None]:
+        frame: FrameType | None = sys._current_frames().get(self._loop_thread)
+        handler = update_type = where = None
+        while frame is not None:
+            code = frame.f_code
+            if where is None and self.project_dir and os.path.abspath(code.co_filename).startswith(self.project_dir):
+                where = f"{os.path.relpath(code.co_filename, self.project_dir)}:{frame.f_lineno} {code.co_name}"
+            extract = self._contexts.get(code)
+            if extract is not None and handler is None:
+                try:
+                    handler, update_type = extract(frame.f_locals)
+                except Exception:
+                    pass
+            frame = frame.f_back
+        return handler, update_type, where
+
+    def _record_slow(self, lag: float, blocked: tuple[str | None, str | None, str | None]) -> None:
+        handler, update_type, where = blocked
+        event = SlowCallback(time.time() - lag, lag, handler, update_type, where)
+        self.slow.append(event)
+        key = handler or "?"
+        self.slow_by_handler[key] = self.slow_by_handler.get(key, 0) + 1
+        if self.on_slow is not None:
+            try:
+                self.on_slow(event)
+            except Exception:
+                pass
+
+    def _check_alert(self, lag: float) -> None:
+        now = time.monotonic()
+        if lag < self.alert_threshold:
+            self._above_since = None
+            return
+        if self._above_since is None:
+            self._above_since = now - lag
+        if now - self._above_since < self.alert_after or now - self._last_alert < self.alert_cooldown:
+            return
+        self._last_alert = now
+        self.alerts += 1
+        if self.on_alert is None:
+            return
+        text = (
+            f"⚠️ Event loop kechikishi {now - self._above_since:.0f} s davomida "
+            f"{self.alert_threshold * 1000:.0f} ms dan yuqori (oxirgisi {lag * 1000:.0f} ms)."
+        )
+        recent = [e for e in self.slow if e.at >= time.time() - (now - self._above_since)]
+        if recent:
+            worst = max(recent, key=lambda e: e.seconds)
+            text += f"\nEng sekin: {worst.handler or '?'} ({worst.update_type or '?'}) {worst.seconds * 1000:.0f} ms"
+            if worst.where:
+                text += f" — {worst.where}"
+        try:
+            asyncio.run_coroutine_threadsafe(self.on_alert(text), self._loop)
+        except RuntimeError:
+            pass
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "window": self.lag.window().summary(),
+            "total": self.lag.total.summary(),
+            "slow_threshold_ms": round(self.slow_threshold * 1000),
+            "slow_total": sum(self.slow_by_handler.values()),
+            "slow_by_handler": dict(sorted(self.slow_by_handler.items(), key=lambda item: -item[1])),
+            "recent": list(self.slow)[-10:],
+            "alerts": self.alerts,
+        }
@@ -0,0 +1,188 @@
+import bisect
+import time
+from typing import Any, Iterable
+
+# Kechikish chegaralari (soniya) — Prometheus'dagi standart bucket'larga yaqin
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Qat'iy bucket'li gistogramma: O(log n) yozish, xotira doimiy."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "peak")
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # oxirgisi — +Inf
+        self.count = 0
+        self.total = 0.0
+        self.peak = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.peak:
+            self.peak = seconds
+
+    def quantile(self, q: float) -> float:
+        """Taxminiy kvantil: tegishli bucket'ning yuqori chegarasi (maksimumdan oshmaydi)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[index], self.peak) if index < len(self.bounds) else self.peak
+        return self.peak
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """(le, yig'indi soni) juftlari; oxirgisi float('inf')."""
+        result, seen = [], 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            result.append((bound, seen))
+        return result
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 1),
+            "p95_ms": round(self.quantile(0.95) * 1000, 1),
+            "max_ms": round(self.peak * 1000, 1),
+        }
+
+
+class RollingHistogram:
+    """
+    Oxirgi `window` soniya uchun gistogramma: vaqt `slots` ta bo'lakka bo'linadi,
+    eskirgan bo'lak navbatdagi yozuvda qayta ishlatiladi. `total` — ishga
+    tushgandan beri (Prometheus uchun).
+    """
+
+    def __init__(self, window: float = 900.0, slots: int = 15, bounds: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.slot_seconds = window / max(1, slots)
+        self.total = LatencyHistogram(self.bounds)
+        self._slots: list[tuple[int, LatencyHistogram]] = [(-1, LatencyHistogram(self.bounds)) for _ in range(max(1, slots))]
+
+    def observe(self, seconds: float, now: float | None = None) -> None:
+        self.total.observe(seconds)
+        index = int((time.monotonic() if now is None else now) // self.slot_seconds)
+        position = index % len(self._slots)
+        slot_index, histogram = self._slots[position]
+        if slot_index != index:
+            histogram = LatencyHistogram(self.bounds)
+            self._slots[position] = (index, histogram)
+        histogram.observe(seconds)
+
+    def window(self, now: float | None = None) -> LatencyHistogram:
+        """Oyna ichidagi bo'laklar birlashmasi."""
+        current = int((time.monotonic() if now is None else now) // self.slot_seconds)
+        merged = LatencyHistogram(self.bounds)
+        for slot_index, histogram in self._slots:
+            if current - slot_index >= len(self._slots) or not histogram.count:
+                continue
+            for position, count in enumerate(histogram.counts):
+                merged.counts[position] += count
+            merged.count += histogram.count
+            merged.total += histogram.total
+            merged.peak = max(merged.peak, histogram.peak)
+        return merged
+
+
+class ApiMetrics:
+    """Telegram API metodlari bo'yicha kechikish gistogrammasi va xatolar soni."""
+
+    def __init__(self, bounds: Iterable[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.latency: dict[str, LatencyHistogram] = {}
+        self.errors: dict[tuple[str, str], int] = {}  # (metod, xato turi) -> soni
+
+    def observe(self, method: str, seconds: float, error: str | None = None) -> None:
+        histogram = self.latency.get(method)
+        if histogram is None:
+            histogram = self.latency[method] = LatencyHistogram(self.bounds)
+        histogram.observe(seconds)
+        if error is not None:
+            key = (method, error)
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        return {
+            method: histogram.summary()
+            for method, histogram in sorted(self.latency.items(), key=lambda item: -item[1].count)
+        }
+
+
+class Counters:
+    """Nomlangan hisoblagichlar (biznes voqealari): inc() — bitta dict amali."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.values: dict[str, int] = dict.fromkeys(names, 0)
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        self.values[name] = self.values.get(name, 0) + amount
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class PrometheusText:
+    """Prometheus text formati (0.0.4) uchun yozuvchi; render() — /metrics javobi."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def _header(self, name: str, kind: str, help_text: str) -> None:
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def counter(self, name: str, help_text: str, samples: Iterable[tuple[dict[str, str], float]]) -> None:
+        self._header(name, "counter", help_text)
+        for labels, value in samples:
+            self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def gauge(self, name: str, help_text: str, samples: Iterable[tuple[dict[str, str], float]]) -> None:
+        self._header(name, "gauge", help_text)
+        for labels, value in samples:
+            self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histograms(self, name: str, help_text: str, label: str, histograms: dict[str, LatencyHistogram]) -> None:
+        self._header(name, "histogram", help_text)
+        for key, histogram in sorted(histograms.items()):
+            for bound, count in histogram.cumulative():
+                self.lines.append(f"{name}_bucket{_labels({label: key, 'le': _number(bound)})} {count}")
+            self.lines.append(f"{name}_sum{_labels({label: key})} {histogram.total!r}")
+            self.lines.append(f"{name}_count{_labels({label: key})} {histogram.count}")
+
+    def latency(self, prefix: str, help_text: str, label: str, metrics: ApiMetrics) -> None:
+        """ApiMetrics: <prefix>_seconds gistogrammasi va <prefix>_errors_total (xato turi bo'yicha)."""
+        self.histograms(f"{prefix}_seconds", help_text, label, metrics.latency)
+        self.counter(
+            f"{prefix}_errors_total",
+            help_text + " — xatolar",
+            (({label: key, "error": error}, count) for (key, error), count in sorted(metrics.errors.items())),
+        )
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
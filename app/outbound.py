@@ -0,0 +1,256 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+# Ustuvorlik sinflari: kichik raqam — oldinroq yuboriladi
+PRIORITY_INTERACTIVE = 0   # foydalanuvchiga javob (update ichida, o'sha chatga)
+PRIORITY_NORMAL = 1        # update ichidan boshqa chatlarga: guruhga buyurtma, adminlarga xabar
+PRIORITY_BACKGROUND = 2    # eslatmalar, trial nazorati, fon vazifalari
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_NORMAL: "normal", PRIORITY_BACKGROUND: "background"}
+
+_priority: ContextVar[int] = ContextVar("outbound_priority", default=PRIORITY_BACKGROUND)
+_reply_chat: ContextVar[Any] = ContextVar("outbound_reply_chat", default=None)
+
+# Limitlarga kirmaydigan xizmat so'rovlari (long polling va h.k.)
+EXEMPT_METHODS = frozenset({"GetUpdates", "GetMe", "DeleteWebhook", "SetWebhook", "GetWebhookInfo", "Close", "LogOut"})
+# Chat limitlari faqat chatga xabar chiqaradigan metodlarga tegishli; ban/unban,
+# invite link yaratish va h.k. faqat umumiy limitdan o'tadi
+CHAT_LIMITED_PREFIXES = ("Send", "Copy", "Forward", "Edit")
+# Tahrirlar yangi xabar emas: ular chatning yuborish bucketini yemaydi, o'z
+# alohida (chat_rate/chat_burst) byudjetidan o'tadi
+EDIT_PREFIX = "Edit"
+
+
+@contextmanager
+def outbound_priority(level: int, reply_chat: Any = None):
+    """Blok ichidagi barcha yuborishlar uchun ustuvorlikni belgilaydi."""
+    token = _priority.set(level)
+    chat_token = _reply_chat.set(reply_chat)
+    try:
+        yield
+    finally:
+        _reply_chat.reset(chat_token)
+        _priority.reset(token)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Keyingi token uchun kutish (soniya); 0 — hozir olish mumkin."""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def reserve(self, now: float) -> float:
+        # Token oldindan band qilinadi (manfiy balans) — bitta chatga navbat FIFO bo'ladi
+        wait = self.delay(now)
+        self.tokens -= 1
+        return max(wait, -self.tokens / self.rate if self.tokens < 0 else 0.0)
+
+    def refund(self) -> None:
+        # Band qilingan, lekin ishlatilmagan token qaytariladi
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class OutboundLimiter(BaseRequestMiddleware):
+    """
+    Barcha chiquvchi so'rovlar uchun markaziy rejalashtiruvchi (session
+    middleware): umumiy va har bir chat uchun token bucket, ustuvorlik
+    navbati va RetryAfter (429) bo'lsa kutib qayta yuborish.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_per_minute: float = 20.0,
+        group_burst: float = 5.0,
+        max_retries: int = 3,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_per_minute / 60.0
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+
+        self._global: TokenBucket | None = None
+        self._chats: dict[Any, TokenBucket] = {}
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._pump_task: asyncio.Task | None = None
+        self._chat_waiting = 0
+
+        self.sent = 0
+        self.retry_after = 0
+        self.failed_after_retries = 0
+        self._waits = {level: [0, 0.0, 0.0] for level in PRIORITY_NAMES}  # soni, jami, maks
+
+    # ---------- bucketlar ----------
+    @staticmethod
+    def _now() -> float:
+        return asyncio.get_running_loop().time()
+
+    def _global_bucket(self, now: float) -> TokenBucket:
+        if self._global is None:
+            self._global = TokenBucket(self.global_rate, self.global_rate, now)
+        return self._global
+
+    def _chat_bucket(self, chat_id: Any, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= 5000:
+                # To'lib qolgan (bo'sh turgan) chatlarni tozalaymiz
+                for key in [key for key, b in self._chats.items() if b.idle(now)]:
+                    del self._chats[key]
+            is_edit = isinstance(chat_id, tuple)
+            is_group = not is_edit and isinstance(chat_id, int) and chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, self.group_burst, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    # ---------- navbat ----------
+    async def _acquire_global(self, priority: int) -> None:
+        bucket = self._global_bucket(self._now())
+        if not self._waiters and bucket.delay(self._now()) <= 0:
+            bucket.take(self._now())
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        bucket = self._global_bucket(self._now())
+        while self._waiters:
+            wait = bucket.delay(self._now())
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Kutayotgan so'rov bekor qilingan
+                continue
+            bucket.take(self._now())
+            future.set_result(None)
+
+    async def _acquire(self, chat_id: Any, priority: int) -> None:
+        if chat_id is None:
+            await self._acquire_global(priority)
+            return
+        bucket = self._chat_bucket(chat_id, self._now())
+        wait = bucket.reserve(self._now())
+        try:
+            if wait > 0:
+                self._chat_waiting += 1
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self._chat_waiting -= 1
+            await self._acquire_global(priority)
+        except asyncio.CancelledError:
+            # So'rov yuborilmadi — chat tokenini keyingilarga qaytaramiz
+            bucket.refund()
+            raise
+
+    def _record_wait(self, priority: int, waited: float) -> None:
+        stat = self._waits[priority]
+        stat[0] += 1
+        stat[1] += waited
+        stat[2] = max(stat[2], waited)
+
+    # ---------- middleware ----------
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        if name in EXEMPT_METHODS:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        priority = _priority.get()
+        if priority == PRIORITY_INTERACTIVE and chat_id is not None and chat_id != _reply_chat.get():
+            priority = PRIORITY_NORMAL
+        if not name.startswith(CHAT_LIMITED_PREFIXES):
+            chat_id = None
+        elif chat_id is not None and name.startswith(EDIT_PREFIX):
+            chat_id = (EDIT_PREFIX, chat_id)
+
+        attempt = 0
+        while True:
+            started = self._now()
+            await self._acquire(chat_id, priority)
+            self._record_wait(priority, self._now() - started)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                self.retry_after += 1
+                until = self._now() + exc.retry_after
+                if chat_id is not None:
+                    self._chat_bucket(chat_id, self._now()).block(until)
+                else:
+                    self._global_bucket(self._now()).block(until)
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.failed_after_retries += 1
+                    raise
+                continue
+            self.sent += 1
+            return response
+
+    def stats(self) -> dict[str, Any]:
+        waits = {}
+        for level, (count, total, peak) in self._waits.items():
+            waits[PRIORITY_NAMES[level]] = {
+                "count": count,
+                "avg_ms": round(total / count * 1000, 1) if count else 0.0,
+                "max_ms": round(peak * 1000, 1),
+            }
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for level, _, future in self._waiters:
+            if not future.done():
+                depth[PRIORITY_NAMES[level]] += 1
+        return {
+            "sent": self.sent,
+            "retry_after": self.retry_after,
+            "failed_after_retries": self.failed_after_retries,
+            "queue_depth": depth,
+            "chat_waiting": self._chat_waiting,
+            "chats_tracked": len(self._chats),
+            "waits": waits,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+
+# Loop I/O kutayotganda stek shu funksiyalardan birida tugaydi
+IDLE_FRAMES = ("EpollSelector.select", "KqueueSelector.select", "SelectSelector.select", "PollSelector.select")
+
+
+class StackSampler(threading.Thread):
+    """
+    Fon thread: har `interval` soniyada kuzatilayotgan thread (event loop)
+    stekini oladi va "collapsed stacks" ko'rinishida sanaydi. Loop'ning o'ziga
+    hech narsa qo'shilmaydi — narx faqat GIL uchun qisqa navbat.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.01, max_depth: int = 64):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.cpu_seconds = 0.0  # sampler thread'ning o'zi sarflagan CPU
+        self._halt = threading.Event()
+
+    def run(self) -> None:
+        cpu_started = time.thread_time()
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            del frame
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+        self.cpu_seconds = time.thread_time() - cpu_started
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        """flamegraph.pl / speedscope uchun: "a;b;c SONI" qatorlari."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 25) -> tuple[list[tuple[str, int]], list[tuple[str, int]]]:
+        """(self, inclusive) — funksiya bo'yicha namunalar soni, kamayish tartibida."""
+        own: Counter[str] = Counter()
+        inclusive: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        return own.most_common(limit), inclusive.most_common(limit)
+
+
+class ProfileResult(NamedTuple):
+    report: str
+    collapsed: str
+    samples: int
+    seconds: float
+
+
+def _format_top(title: str, rows: list[tuple[str, int]], total: int) -> list[str]:
+    lines = [title]
+    for name, count in rows:
+        lines.append(f"{count / total * 100:6.1f}%  {count:>7}  {name}")
+    return lines + [""]
+
+
+async def capture(seconds: float, interval: float = 0.01, use_cprofile: bool = False) -> ProfileResult:
+    """
+    Joriy event loop'ni `seconds` davomida kuzatadi: har doim stek namunalari,
+    `use_cprofile` bo'lsa — qo'shimcha ravishda cProfile (aniqroq, lekin sekinlashtiradi).
+    Loop thread'ida (handler ichidan) chaqiriladi.
+    """
+    sampler = StackSampler(threading.get_ident(), interval=interval)
+    profile = cProfile.Profile() if use_cprofile else None
+    started = time.perf_counter()
+    sampler.start()
+    if profile is not None:
+        profile.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        if profile is not None:
+            profile.disable()
+        sampler.stop()
+    elapsed = time.perf_counter() - started
+
+    total = max(1, sampler.samples)
+    own, inclusive = sampler.top()
+    # selector.select'da turgan namunalar — loop bo'sh (I/O kutmoqda)
+    idle = sum(count for stack, count in sampler.stacks.items() if stack.rsplit(";", 1)[-1].startswith(IDLE_FRAMES))
+    lines = [
+        f"Davomiyligi: {elapsed:.1f} s, namunalar: {sampler.samples} "
+        f"(har {interval * 1000:g} ms), sampler CPU: {sampler.cpu_seconds * 1000:.0f} ms",
+        f"Loop band: {(total - idle) / total * 100:.1f}% (bo'sh: {idle / total * 100:.1f}%)",
+        "",
+    ]
+    lines += _format_top("== Eng ko'p vaqt (self) ==", own, total)
+    lines += _format_top("== Inclusive (chaqirilganlari bilan) ==", inclusive, total)
+    if profile is not None:
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(40)
+        lines += ["== cProfile (cumulative) ==", out.getvalue()]
+    return ProfileResult("\n".join(lines), sampler.collapsed(), sampler.samples, elapsed)
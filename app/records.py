@@ -0,0 +1,205 @@
+from collections.abc import MutableMapping
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from typing import Any
+
+
+# Slot bo'sh bo'lsa — kalit "yo'q" hisoblanadi (dict'dagi kabi). Belgi sifatida
+# Ellipsis olingan: pickle va marshal uni o'zi biladi, profil qiymati esa hech
+# qachon `...` bo'lmaydi.
+MISSING = ...
+
+
+class Record(MutableMapping):
+    """
+    __slots__ asosidagi yozuvlar uchun dict-ga mos interfeys: mavjud kod
+    `obj["vehicle"]`, `.get()`, `.pop()`, `.setdefault()`ni o'zgarishsiz
+    ishlataveradi, ma'lum kalitlar esa slot'larda saqlanadi.
+    Noma'lum kalitlar `extra` dict'ga tushadi.
+    """
+
+    __slots__ = ()
+
+    _KEY_TO_ATTR: dict[str, str] = {}
+    _ATTR_TO_KEY: dict[str, str] = {}
+    _KEYS: tuple = ()
+    # Snapshot'ga (pickle) yozilmaydigan slot'lar, masalan asyncio.Task ro'yxati
+    _TRANSIENT: frozenset = frozenset()
+
+    # ---------- Mapping interfeysi ----------
+    def __getitem__(self, key):
+        attr = self._KEY_TO_ATTR.get(key)
+        if attr is not None:
+            value = getattr(self, attr)
+            if value is MISSING:
+                raise KeyError(key)
+            return value
+        extra = self.extra
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        attr = self._KEY_TO_ATTR.get(key)
+        if attr is not None:
+            value = getattr(self, attr)
+            return default if value is MISSING else value
+        extra = self.extra
+        if extra is not None:
+            return extra.get(key, default)
+        return default
+
+    def __setitem__(self, key, value) -> None:
+        attr = self._KEY_TO_ATTR.get(key)
+        if attr is not None:
+            setattr(self, attr, value)
+            return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __delitem__(self, key) -> None:
+        attr = self._KEY_TO_ATTR.get(key)
+        if attr is not None:
+            if getattr(self, attr) is MISSING:
+                raise KeyError(key)
+            setattr(self, attr, MISSING)
+            return
+        if self.extra is None or key not in self.extra:
+            raise KeyError(key)
+        del self.extra[key]
+        if not self.extra:
+            self.extra = None
+
+    def __contains__(self, key) -> bool:
+        attr = self._KEY_TO_ATTR.get(key)
+        if attr is not None:
+            return getattr(self, attr) is not MISSING
+        return self.extra is not None and key in self.extra
+
+    def __iter__(self):
+        for attr, key in self._ATTR_TO_KEY.items():
+            if getattr(self, attr) is not MISSING:
+                yield key
+        if self.extra:
+            yield from list(self.extra)
+
+    def __len__(self) -> int:
+        count = sum(1 for attr in self._ATTR_TO_KEY if getattr(self, attr) is not MISSING)
+        return count + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    # ---------- pickle ----------
+    _GETTER = None
+    _TRANSIENT_POS: tuple = ()
+
+    def __reduce__(self):
+        # cls(*qiymatlar) — slot'lar bir martada (C darajasida) o'qiladi
+        values = self._GETTER(self)
+        if self._TRANSIENT_POS:
+            values = list(values)
+            for pos in self._TRANSIENT_POS:
+                values[pos] = MISSING
+            values = tuple(values)
+        return type(self), values
+
+    # ---------- JSON formatiga/formatidan ----------
+    def to_dict(self) -> dict[str, Any]:
+        return {key: self[key] for key in self}
+
+    @classmethod
+    def row_from_dict(cls, data: dict) -> tuple:
+        """dict -> konstruktor argumentlari tartibidagi tuple (extra oxirida)."""
+        known = cls._KEY_TO_ATTR
+        extra = {k: v for k, v in data.items() if k not in known} or None
+        return tuple(data.get(key, MISSING) for key in cls._KEYS) + (extra,)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        obj = cls()
+        for key, value in (data or {}).items():
+            obj[key] = value
+        return obj
+
+
+def record(cls):
+    """`@dataclass(slots=True)` + kalit<->slot jadvali ("from" -> from_)."""
+    cls = dataclass(slots=True, eq=False, repr=False)(cls)
+    attrs = [f.name for f in fields(cls) if f.name != "extra"]
+    cls._ATTR_TO_KEY = {attr: attr.rstrip("_") for attr in attrs}
+    cls._KEY_TO_ATTR = {key: attr for attr, key in cls._ATTR_TO_KEY.items()}
+    cls._KEYS = tuple(cls._ATTR_TO_KEY.values())
+    names = [f.name for f in fields(cls)]
+    cls._GETTER = attrgetter(*names)
+    cls._TRANSIENT_POS = tuple(names.index(attr) for attr in cls._TRANSIENT)
+    return cls
+
+
+# ================== YOZUV TURLARI ==================
+@record
+class Profile(Record):
+    name: Any = MISSING
+    phone: Any = MISSING
+    regions: Any = MISSING
+    last_region: Any = MISSING
+    region: Any = MISSING  # eski format
+    trial_granted_at: Any = MISSING
+    trial_expires_at: Any = MISSING
+    trial_joined_at: Any = MISSING
+    extra: dict | None = None
+
+
+@record
+class Draft(Record):
+    stage: Any = MISSING
+    region: Any = MISSING
+    chat_id: Any = MISSING
+    vehicle: Any = MISSING
+    from_: Any = MISSING
+    to: Any = MISSING
+    when: Any = MISSING
+    confirm_msg_id: Any = MISSING
+    extra: dict | None = None
+
+
+@record
+class Order(Record):
+    region: Any = MISSING
+    vehicle: Any = MISSING
+    from_: Any = MISSING
+    to: Any = MISSING
+    when: Any = MISSING
+    msg_id: Any = MISSING
+    chat_id: Any = MISSING
+    status: Any = MISSING
+    driver_id: Any = MISSING
+    cust_info_msg_id: Any = MISSING
+    drv_info_msg_id: Any = MISSING
+    cust_rating_msg_id: Any = MISSING
+    rating: Any = MISSING
+    reminder_tasks: Any = MISSING  # eski: eslatmalar endi TimerService'da
+    extra: dict | None = None
+
+    _TRANSIENT = frozenset({"reminder_tasks"})
+
+
+@record
+class Subscription(Record):
+    active: Any = MISSING
+    regions: Any = MISSING
+    last_region: Any = MISSING
+    region: Any = MISSING  # eski format
+    extra: dict | None = None
+
+
+@record
+class TrialEntry(Record):
+    expires_at: Any = MISSING
+    regions: Any = MISSING
+    last_region: Any = MISSING
+    region: Any = MISSING  # eski format
+    extra: dict | None = None
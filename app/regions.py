@@ -0,0 +1,202 @@
+import re
+from collections import defaultdict
+from typing import Iterable
+
+# O'zbek apostrofining barcha ko'rinishlari: Farg'ona / Fargʻona / Farg‘ona / Farg’ona
+_APOSTROPHES = "'`ʻʼ‘’′´"
+
+# Kirill -> lotin (o'zbek imlosi bo'yicha, apostroflarsiz — ular baribir olib tashlanadi)
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}
+_FOLD_TABLE = str.maketrans({**_CYRILLIC, **{ch: "" for ch in _APOSTROPHES}})
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def fold_region(text: str) -> str:
+    """Taqqoslash uchun normal shakl: kichik harf, lotin, apostrof va tinish belgilarisiz."""
+    folded = text.strip().lower().translate(_FOLD_TABLE)
+    return " ".join(_NON_WORD.split(folded)).strip()
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class RegionIndex:
+    """
+    Hudud nomlari uchun oldindan qurilgan indeks: aniq nom, normal shakl
+    (apostrof/kirill/alias) bo'yicha O(1) qidiruv va yozilgan matn uchun
+    trigram asosidagi taxminiy (fuzzy) moslash.
+    """
+
+    def __init__(self, names: Iterable[str], aliases: dict[str, Iterable[str]] | None = None,
+                 fuzzy_threshold: float = 0.5):
+        self.names = list(names)
+        self.fuzzy_threshold = fuzzy_threshold
+        self._exact: dict[str, str] = {name: name for name in self.names}
+        self._folded: dict[str, str] = {}
+        for name in self.names:
+            self._add(name, name)
+        for name, extra in (aliases or {}).items():
+            if name not in self._exact:
+                continue
+            for alias in extra or ():
+                self._add(str(alias), name)
+
+        self._postings: dict[str, list[str]] = defaultdict(list)
+        self._sizes: dict[str, int] = {}
+        for key in self._folded:
+            grams = _trigrams(key)
+            self._sizes[key] = len(grams)
+            for gram in grams:
+                self._postings[gram].append(key)
+        self._postings = dict(self._postings)
+        self._fuzzy_cache: dict[str, str | None] = {}
+
+    def _add(self, text: str, name: str) -> None:
+        key = fold_region(text)
+        if key:
+            # Birinchi yozilgan nom ustun (haqiqiy nom aliasdan oldin qo'shiladi)
+            self._folded.setdefault(key, name)
+
+    def lookup(self, value: str | None, fuzzy: bool = False) -> str | None:
+        if not value:
+            return None
+        name = self._exact.get(value)
+        if name is not None:
+            return name
+        key = fold_region(value)
+        name = self._folded.get(key)
+        if name is not None or not fuzzy or len(key) < 3:
+            return name
+        if key in self._fuzzy_cache:
+            return self._fuzzy_cache[key]
+        name = self._fuzzy(key)
+        if len(self._fuzzy_cache) >= 4096:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[key] = name
+        return name
+
+    def _fuzzy(self, key: str) -> str | None:
+        grams = _trigrams(key)
+        overlap: dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                overlap[candidate] += 1
+        best_name, best, second = None, 0.0, 0.0
+        scored: dict[str, float] = {}
+        for candidate, common in overlap.items():
+            # Dice koeffitsienti; bir hududning bir nechta aliasi — eng yaxshisi olinadi
+            score = 2 * common / (len(grams) + self._sizes[candidate])
+            name = self._folded[candidate]
+            if score > scored.get(name, 0.0):
+                scored[name] = score
+        for name, score in scored.items():
+            if score > best:
+                best_name, best, second = name, score, best
+            elif score > second:
+                second = score
+        # Ikki hudud deyarli teng bo'lsa — taxmin qilmaymiz
+        if best < self.fuzzy_threshold or best - second < 0.1:
+            return None
+        return best_name
+
+
+class RegionMembership:
+    """
+    Ikki tomonlama indeks: foydalanuvchi -> hududlar va hudud -> foydalanuvchilar.
+    Manba dict'lar o'zgarganda `assign()`/`discard()` chaqiriladi. To'liq qayta
+    qurish `begin_rebuild()` ... `finish_rebuild()` orasida bosqichma-bosqich
+    bajariladi: shu vaqtda `assign()` qilingan yozuvlar yangi holatda ustun turadi.
+    """
+
+    def __init__(self):
+        self._by_uid: dict[int, tuple[str, ...]] = {}
+        self._by_region: dict[str, set[int]] = defaultdict(set)
+        self._touched: set[int] | None = None
+        self.ready = False
+        self.rebuilds = 0
+        self.last_rebuild_ms = 0.0
+
+    def get(self, uid: int) -> tuple[str, ...] | None:
+        return self._by_uid.get(uid)
+
+    def __contains__(self, uid) -> bool:
+        return uid in self._by_uid
+
+    def __len__(self) -> int:
+        return len(self._by_uid)
+
+    def assign(self, uid: int, regions: Iterable[str]) -> None:
+        new = tuple(regions)
+        if self._touched is not None:
+            self._touched.add(uid)
+        old = self._by_uid.get(uid)
+        if old == new:
+            return
+        if old:
+            for region in old:
+                members = self._by_region.get(region)
+                if members is not None:
+                    members.discard(uid)
+                    if not members:
+                        del self._by_region[region]
+        if new:
+            self._by_uid[uid] = new
+            for region in new:
+                self._by_region[region].add(uid)
+        else:
+            self._by_uid.pop(uid, None)
+
+    def discard(self, uid: int) -> None:
+        self.assign(uid, ())
+
+    def members(self, region: str) -> set[int]:
+        return set(self._by_region.get(region, ()))
+
+    def counts(self) -> dict[str, int]:
+        return {region: len(members) for region, members in self._by_region.items()}
+
+    def begin_rebuild(self) -> None:
+        self._touched = set()
+
+    def abort_rebuild(self) -> None:
+        self._touched = None
+
+    def finish_rebuild(self, mapping: dict[int, Iterable[str]], elapsed_ms: float = 0.0) -> None:
+        touched, self._touched = self._touched or set(), None
+        for uid in touched:
+            current = self._by_uid.get(uid)
+            if current:
+                mapping[uid] = current
+            else:
+                mapping.pop(uid, None)
+        self.replace(mapping)
+        self.ready = True
+        self.rebuilds += 1
+        self.last_rebuild_ms = elapsed_ms
+
+    def replace(self, mapping: dict[int, Iterable[str]]) -> None:
+        by_uid: dict[int, tuple[str, ...]] = {}
+        by_region: dict[str, set[int]] = defaultdict(set)
+        for uid, regions in mapping.items():
+            regions = tuple(regions)
+            if not regions:
+                continue
+            by_uid[uid] = regions
+            for region in regions:
+                by_region[region].add(uid)
+        self._by_uid, self._by_region = by_uid, by_region
+
+    def diff(self, expected: dict[int, Iterable[str]]) -> list[int]:
+        """`expected` bilan farq qiladigan foydalanuvchilar (tekshiruv uchun)."""
+        expected = {uid: tuple(regions) for uid, regions in expected.items() if regions}
+        mismatched = [uid for uid, regions in expected.items() if self._by_uid.get(uid) != regions]
+        mismatched.extend(uid for uid in self._by_uid if uid not in expected)
+        return mismatched
@@ -0,0 +1,134 @@
+import time
+from typing import Any
+
+from aiogram import Bot
+from aiogram import __version__ as aiogram_version
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiohttp import ClientSession, FormData, TraceConfig
+from aiohttp.hdrs import USER_AGENT
+from aiohttp.http import SERVER_SOFTWARE
+
+from app.keyboards import KeyboardCache
+from app.metrics import ApiMetrics
+
+
+class CachedMarkupSession(AiohttpSession):
+    """
+    Keshdagi (statik) klaviatura yuborilganda uning JSON ko'rinishi qayta
+    hisoblanmaydi: `reply_markup` model_dump/json_dumps'dan o'tkazilmay,
+    KeyboardCache'dagi tayyor satr qo'yiladi.
+    """
+
+    def __init__(self, keyboards: KeyboardCache, **kwargs):
+        super().__init__(**kwargs)
+        self.keyboards = keyboards
+
+    def build_form_data(self, bot: Bot, method: TelegramMethod) -> FormData:
+        markup = getattr(method, "reply_markup", None)
+        cached = None
+        if markup is not None:
+            cached = self.keyboards.serialized(
+                markup, lambda m: self.prepare_value(m, bot=bot, files={})
+            )
+        if cached is None:
+            return super().build_form_data(bot, method)
+
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field("reply_markup", cached)
+        for key, value in files.items():
+            form.add_field(
+                key,
+                value.read(bot),
+                filename=value.filename or key,
+            )
+        return form
+
+
+class InstrumentedSession(CachedMarkupSession):
+    """
+    Sozlanadigan ulanishlar puli (hajm, keep-alive, DNS kesh), metod bo'yicha
+    timeout'lar va o'lchovlar: har bir API metodi kechikishi (ApiMetrics) hamda
+    yangi/qayta ishlatilgan ulanishlar soni.
+    """
+
+    def __init__(
+        self,
+        keyboards: KeyboardCache,
+        metrics: ApiMetrics | None = None,
+        pool_size: int = 100,
+        keepalive: float = 30.0,
+        dns_ttl: int = 300,
+        method_timeouts: dict[str, float] | None = None,
+        **kwargs,
+    ):
+        super().__init__(keyboards, **kwargs)
+        self.metrics = metrics if metrics is not None else ApiMetrics()
+        self.method_timeouts = dict(method_timeouts or {})
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.dns_ttl = dns_ttl
+        self._connector_init.update(
+            limit=pool_size,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=dns_ttl,
+            use_dns_cache=True,
+        )
+        self.connections_created = 0
+        self.connections_reused = 0
+        self._trace = TraceConfig()
+        self._trace.on_connection_create_end.append(self._on_connection_created)
+        self._trace.on_connection_reuseconn.append(self._on_connection_reused)
+
+    async def _on_connection_created(self, session, context, params) -> None:
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params) -> None:
+        self.connections_reused += 1
+
+    async def create_session(self) -> ClientSession:
+        # AiohttpSession.create_session bilan bir xil, faqat trace_configs qo'shilgan
+        if self._should_reset_connector:
+            await self.close()
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=self._connector_type(**self._connector_init),
+                headers={USER_AGENT: f"{SERVER_SOFTWARE} aiogram/{aiogram_version}"},
+                trace_configs=[self._trace],
+            )
+            self._should_reset_connector = False
+        return self._session
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None):
+        name = method.__api_method__
+        if timeout is None:
+            timeout = self.method_timeouts.get(name)
+        started = time.perf_counter()
+        try:
+            result = await super().make_request(bot, method, timeout=timeout)
+        except Exception as exc:
+            self.metrics.observe(name, time.perf_counter() - started, type(exc).__name__)
+            raise
+        self.metrics.observe(name, time.perf_counter() - started)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        total = self.connections_created + self.connections_reused
+        return {
+            "pool_size": self.pool_size,
+            "keepalive": self.keepalive,
+            "dns_ttl": self.dns_ttl,
+            "timeout": self.timeout,
+            "method_timeouts": self.method_timeouts,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": round(self.connections_reused / total * 100, 1) if total else 0.0,
+            "methods": self.metrics.summary(),
+            "errors": dict(self.metrics.errors),
+        }
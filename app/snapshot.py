@@ -0,0 +1,253 @@
+import asyncio
+import gc
+import json
+import marshal
+import os
+import pickle
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable
+
+# Fayl sarlavhasi: magic | format versiyasi | tur (16 bayt) | crc32 | uzunlik
+MAGIC = b"ELTBSNAP"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sH16sIQ")
+
+
+def write_snapshot(path: str, kind: str, payload: bytes) -> None:
+    """Snapshot'ni atomik yozadi (tmp + fsync + os.replace)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, kind.encode()[:16], zlib.crc32(payload), len(payload))
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+        raise
+
+
+def read_snapshot(path: str, kind: str) -> bytes | None:
+    """Bitta o'qish bilan payload'ni qaytaradi; fayl yo'q/buzilgan bo'lsa None."""
+    try:
+        with open(path, "rb") as f:
+            blob = f.read()
+    except OSError:
+        return None
+    if len(blob) < _HEADER.size:
+        return None
+    magic, version, raw_kind, crc, length = _HEADER.unpack_from(blob)
+    if magic != MAGIC or version != FORMAT_VERSION or raw_kind.rstrip(b"\0") != kind.encode()[:16]:
+        return None
+    payload = memoryview(blob)[_HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        return None
+    return bytes(payload)
+
+
+def load_json_with_snapshot(path: str, default: Any = None, kind: str = "json") -> Any:
+    """
+    JSON faylni `path + ".bin"` binar nusxasi orqali o'qiydi. Nusxa manba
+    faylning mtime/hajmi bilan bog'langan: mos kelmasa JSON o'qiladi va
+    binar nusxa yangilanadi.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return default
+    bin_path = path + ".bin"
+    payload = read_snapshot(bin_path, kind)
+    if payload is not None:
+        try:
+            mtime_ns, size, data = marshal.loads(payload)
+            if mtime_ns == st.st_mtime_ns and size == st.st_size:
+                return data
+        except Exception:
+            pass
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return default
+    try:
+        write_snapshot(bin_path, kind, marshal.dumps((st.st_mtime_ns, st.st_size, data)))
+    except Exception:
+        pass
+    return data
+
+
+# Joriy update davomida belgilangan bo'limlar (StateSnapshotter.tracking())
+_touched: ContextVar[set | None] = ContextVar("snapshot_touched", default=None)
+
+
+class StateSnapshotter:
+    """
+    RAM'dagi holatni (buyurtmalar, obunalar, trial...) davriy ravishda diskka
+    yozadi. Holat nomli bo'limlardan iborat: har biri alohida pickle qilinadi
+    va keshlanadi, saqlashda faqat mark_dirty() bilan belgilangan bo'limlar
+    qayta yig'iladi. Bo'lim funksiyasi loop ichida sayoz nusxa qaytaradi,
+    pickle va yozish esa thread'da.
+    """
+
+    kind = "runtime"
+
+    def __init__(self, path: str, sections: dict[str, Callable[[], Any]], interval: float = 10.0):
+        self.path = path
+        self.sections = sections
+        self.interval = max(0.5, float(interval))
+        # Ishga tushgandan keyingi birinchi saqlash hamma bo'limni yozadi
+        self._dirty: set[str] = set(sections)
+        self._blobs: dict[str, bytes] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        self.saves = 0
+        self.save_errors = 0
+        self.last_save_ms = 0.0
+        self.last_loop_ms = 0.0
+        self.last_sections: tuple[str, ...] = ()
+        self.last_size = 0
+        self.last_restore_ms = 0.0
+
+    def mark_dirty(self, *names: str) -> None:
+        """Bo'lim(lar) o'zgardi; nomsiz chaqiruv — hammasi."""
+        names = names or tuple(self.sections)
+        self._dirty.update(names)
+        touched = _touched.get()
+        if touched is not None:
+            touched.update(names)
+
+    @contextmanager
+    def tracking(self):
+        """
+        Handler atrofida: ichida belgilangan bo'limlar handler tugaganda yana
+        belgilanadi. Handler bo'limni boshida belgilab, keyin await'dan so'ng
+        o'zgartirsa ham, oraliqdagi saqlash bu o'zgarishni yo'qotmaydi.
+        """
+        touched: set = set()
+        token = _touched.set(touched)
+        try:
+            yield
+        finally:
+            _touched.reset(token)
+            self._dirty.update(touched)
+
+    def load(self) -> dict | None:
+        started = time.perf_counter()
+        payload = read_snapshot(self.path, self.kind)
+        if payload is None:
+            return None
+        # Ko'p mayda obyekt yaratilganda GC keraksiz to'xtashlar qiladi
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            state = pickle.loads(payload)
+            if isinstance(state, dict):
+                # Bo'limlar alohida pickle qilingan (eski formatda — to'g'ridan-to'g'ri obyektlar)
+                state = {key: pickle.loads(value) if isinstance(value, bytes) else value
+                         for key, value in state.items()}
+        except Exception:
+            return None
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self.last_restore_ms = (time.perf_counter() - started) * 1000
+        return state if isinstance(state, dict) else None
+
+    @staticmethod
+    def _dump(values: dict[str, Any]) -> tuple[dict[str, bytes], set[str]]:
+        # Thread'da: loop shu payt ichki dict'ni o'zgartirsa pickle RuntimeError
+        # beradi — bir marta qayta urinamiz, bo'lmasa bo'lim keyingi saqlashga qoladi
+        blobs, failed = {}, set()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for name, value in values.items():
+                for _ in range(2):
+                    try:
+                        blobs[name] = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                        break
+                    except RuntimeError:
+                        continue
+                else:
+                    failed.add(name)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return blobs, failed
+
+    def _write(self, blobs: dict[str, bytes]) -> int:
+        payload = pickle.dumps({"saved_at": datetime.now(), **blobs}, protocol=pickle.HIGHEST_PROTOCOL)
+        write_snapshot(self.path, self.kind, payload)
+        return len(payload)
+
+    async def save(self) -> bool:
+        async with self._lock:
+            names = self._dirty
+            if not names:
+                return True
+            self._dirty = set()
+            started = time.perf_counter()
+            try:
+                # Loop ichida faqat o'zgargan bo'limlarning sayoz nusxasi
+                values = {name: self.sections[name]() for name in names if name in self.sections}
+                self.last_loop_ms = (time.perf_counter() - started) * 1000
+                blobs, failed = await asyncio.to_thread(self._dump, values)
+                self._dirty |= failed
+                merged = {**self._blobs, **blobs}
+                size = await asyncio.to_thread(self._write, merged)
+            except Exception:
+                self._dirty |= names
+                self.save_errors += 1
+                return False
+            self._blobs = merged
+            self.saves += 1
+            self.last_sections = tuple(sorted(blobs))
+            self.last_size = size
+            self.last_save_ms = (time.perf_counter() - started) * 1000
+            return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._dirty:
+                await self.save()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.save()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "saves": self.saves,
+            "save_errors": self.save_errors,
+            "last_save_ms": round(self.last_save_ms, 2),
+            "last_loop_ms": round(self.last_loop_ms, 2),
+            "last_sections": self.last_sections,
+            "last_size": self.last_size,
+            "last_restore_ms": round(self.last_restore_ms, 2),
+            "pending": sorted(self._dirty),
+        }
@@ -0,0 +1,915 @@
+import asyncio
+import gc
+import json
+import marshal
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from app.snapshot import read_snapshot, write_snapshot
+
+
+def _plain_copy(profile: dict) -> dict:
+    # Diskka yozish alohida threadda bo'ladi — ichki list/dict'larni ham nusxalaymiz
+    out = {}
+    for key, value in profile.items():
+        if isinstance(value, list):
+            value = list(value)
+        elif isinstance(value, dict):
+            value = dict(value)
+        out[key] = value
+    return out
+
+
+def _int_keys(raw: dict) -> dict:
+    fixed = {}
+    # JSON kalitlari string bo'lib keladi -> int'ga aylantiramiz
+    for k, v in (raw or {}).items():
+        try:
+            ik = int(k)
+        except (ValueError, TypeError):
+            ik = k
+        fixed[ik] = v
+    return fixed
+
+
+# Binar snapshot'dagi bitta marshal bo'lagi (qatorlar soni)
+BINARY_CHUNK_ROWS = 5000
+
+
+# ================== BACKENDLAR ==================
+class JsonProfileBackend:
+    """Eski format: hamma profillar bitta users.json faylida (RAM'da ham to'liq)."""
+
+    name = "json"
+    in_memory = True
+
+    def __init__(self, path: str, record_cls=None, binary_snapshot: bool = True):
+        self.path = path
+        self.record_cls = record_cls
+        # users.json yonida versiyali, checksum'li binar nusxa (tez ishga tushish uchun)
+        self.bin_path = path + ".bin" if binary_snapshot else None
+        self._state: dict | None = None
+        self._load_lock = threading.Lock()
+        self.loaded_from = None
+        self.last_load_ms = 0.0
+
+    def _from_dict(self, profile):
+        return self.record_cls.from_dict(profile) if self.record_cls is not None else profile
+
+    # ---------- binar snapshot ----------
+    def _read_binary(self) -> dict | None:
+        if not self.bin_path:
+            return None
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        payload = read_snapshot(self.bin_path, "users")
+        if payload is None:
+            return None
+        try:
+            keys, mtime_ns, size, rows = marshal.loads(payload)
+        except Exception:
+            return None
+        # users.json keyin qo'lda o'zgartirilgan bo'lsa — nusxa eskirgan
+        if mtime_ns != st.st_mtime_ns or size != st.st_size:
+            return None
+        if isinstance(rows, list):
+            merged = {}
+            for chunk in rows:
+                merged.update(marshal.loads(chunk))
+            rows = merged
+        cls = self.record_cls
+        if cls is None:
+            return rows if not keys else None
+        if tuple(keys) != cls._KEYS:
+            return None
+        return {uid: cls(*values) for uid, values in rows.items()}
+
+    def _write_binary(self, items) -> None:
+        cls = self.record_cls
+        keys = () if cls is None else cls._KEYS
+        # Qatorlar bo'laklab marshal qilinadi: bitta katta marshal.dumps GIL'ni
+        # (va loop'ni) o'n millisekundlab ushlab turadi
+        chunks, rows = [], {}
+        for uid, p in items:
+            if cls is None:
+                rows[uid] = dict(p)
+            else:
+                rows[uid] = cls._GETTER(p) if type(p) is cls else cls.row_from_dict(p)
+            if len(rows) >= BINARY_CHUNK_ROWS:
+                chunks.append(marshal.dumps(rows))
+                rows = {}
+        if rows:
+            chunks.append(marshal.dumps(rows))
+        st = os.stat(self.path)
+        write_snapshot(self.bin_path, "users", marshal.dumps((keys, st.st_mtime_ns, st.st_size, chunks)))
+
+    def _read_file(self) -> dict:
+        started = time.perf_counter()
+        # Ko'p mayda obyekt yaratilganda GC keraksiz to'xtashlar qiladi
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            state = self._load_state()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        self.last_load_ms = (time.perf_counter() - started) * 1000
+        return state
+
+    def _load_state(self) -> dict:
+        state = self._read_binary()
+        if state is not None:
+            self.loaded_from = "binary"
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+            except Exception:
+                raw = None
+            state = {uid: self._from_dict(p) for uid, p in _int_keys(raw).items()}
+            self.loaded_from = "json"
+            if raw is not None and self.bin_path:
+                try:
+                    self._write_binary(state.items())
+                except Exception:
+                    pass
+        return state
+
+    def _ensure(self) -> dict:
+        # Fayl birinchi murojaatda (yoki fon preload'da) o'qiladi, import paytida emas
+        if self._state is None:
+            with self._load_lock:
+                if self._state is None:
+                    self._state = self._read_file()
+        return self._state
+
+    def preload(self) -> None:
+        self._ensure()
+
+    # ---------- o'qish ----------
+    def fetch(self, uid):
+        # _state faqat flush nusxalarini saqlaydi (ularni thread yozadi) — keshga
+        # handlerlar o'zgartiradigan alohida obyekt beriladi
+        profile = self._ensure().get(uid)
+        if profile is None:
+            return None
+        return self._from_dict(_plain_copy(profile))
+
+    def contains(self, uid) -> bool:
+        return uid in self._ensure()
+
+    def count(self) -> int:
+        return len(self._ensure())
+
+    def iter_uids(self):
+        return list(self._ensure().keys())
+
+    def iter_profiles(self):
+        return list(self._ensure().items())
+
+    # ---------- yozish ----------
+    def stage(self, changes: dict) -> None:
+        # Loop ichida: RAM'dagi holatni flush nusxalari bilan yangilaymiz (disk
+        # yozuvi keyin thread'da). Qatorlar almashtiriladi, hech qachon o'zgartirilmaydi
+        state = self._ensure()
+        for uid, profile in changes.items():
+            if profile is None:
+                state.pop(uid, None)
+            else:
+                state[uid] = self._from_dict(profile)
+
+    def wants_snapshot(self) -> bool:
+        return True
+
+    def _write_file(self) -> None:
+        # Worker thread'da chaqiriladi. _state faqat stage()da (flush lock ostida)
+        # o'zgaradi va handlerlar ushlaydigan obyektlarni saqlamaydi; qatorlar
+        # birma-bir yoziladi — O(users) ish ham,
+        # 100k vaqtinchalik dict (va ular chaqiradigan to'liq GC) ham loop'dan tashqarida
+        state = self._ensure()
+        # Faqat kalitlar ro'yxati: 100k (uid, profil) juftligi GC'ni ishga tushirib yuboradi
+        uids = list(state)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                self._dump_rows(f, ((uid, state[uid]) for uid in uids))
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+            raise
+        if self.bin_path:
+            try:
+                self._write_binary((uid, state[uid]) for uid in uids)
+            except Exception:
+                # Binar nusxa ixtiyoriy — keyingi ishga tushishda JSON o'qiladi
+                pass
+
+    @staticmethod
+    def _dump_rows(f, items) -> None:
+        # json.dump(..., indent=2) bilan bir xil matn, lekin butun nusxa xotirada yig'ilmaydi
+        sep = "{\n"
+        for uid, profile in items:
+            body = json.dumps(dict(profile), ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(f"{sep}  {json.dumps(str(uid))}: {body}")
+            sep = ",\n"
+        f.write("{}" if sep == "{\n" else "\n}")
+
+    def write(self, changes: dict, full: bool = False) -> None:
+        self._write_file()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "loaded_from": self.loaded_from,
+            "load_ms": round(self.last_load_ms, 2),
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class JournalProfileBackend(JsonProfileBackend):
+    """
+    Snapshot (users.json) + append-only jurnal. Har flush faqat o'zgargan
+    profillarni jurnalga qo'shadi va fsync qiladi; jurnal `compact_bytes`dan
+    oshsa, holat yangi snapshot'ga yig'iladi va jurnal tozalanadi.
+    """
+
+    name = "journal"
+
+    def __init__(self, snapshot_path: str, journal_path: str, compact_bytes: int = 4 * 1024 * 1024,
+                 record_cls=None, binary_snapshot: bool = True):
+        super().__init__(snapshot_path, record_cls=record_cls, binary_snapshot=binary_snapshot)
+        self.journal_path = journal_path
+        self.compact_bytes = max(1024, int(compact_bytes))
+        self._journal = None
+        self._journal_bytes = 0
+        self.records = 0
+        self.compactions = 0
+        self.last_compact_ms = 0.0
+
+    def _load_state(self) -> dict:
+        state = super()._load_state()
+        good_offset = 0
+        try:
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                        uid = rec["u"]
+                    except Exception:
+                        # Yarim yozilgan oxirgi qator (crash) — shu joydan kesamiz
+                        break
+                    if rec.get("d"):
+                        state.pop(uid, None)
+                    else:
+                        state[uid] = self._from_dict(rec.get("p") or {})
+                    good_offset += len(line)
+                    self.records += 1
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good_offset)
+        except FileNotFoundError:
+            pass
+        self._journal_bytes = good_offset
+        return state
+
+    def _open_journal(self):
+        if self._journal is None:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return self._journal
+
+    def wants_snapshot(self) -> bool:
+        return self._journal_bytes >= self.compact_bytes
+
+    def write(self, changes: dict, full: bool = False) -> None:
+        lines = []
+        for uid, profile in changes.items():
+            if profile is None:
+                lines.append(json.dumps({"u": uid, "d": 1}))
+            else:
+                lines.append(json.dumps({"u": uid, "p": profile}, ensure_ascii=False, separators=(",", ":")))
+        if lines:
+            journal = self._open_journal()
+            journal.write("\n".join(lines) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+            self.records += len(lines)
+            self._journal_bytes = journal.tell()
+        if full:
+            self.compact()
+
+    def compact(self) -> None:
+        started = time.perf_counter()
+        self._write_file()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        # Snapshot tayyor — jurnalni bo'shatamiz (qayta o'qilsa ham idempotent)
+        with open(self.journal_path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_bytes = 0
+        self.records = 0
+        self.compactions += 1
+        self.last_compact_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **super().stats(),
+            "journal_bytes": self._journal_bytes,
+            "journal_records": self.records,
+            "compactions": self.compactions,
+            "last_compact_ms": round(self.last_compact_ms, 2),
+        }
+
+    def close(self) -> None:
+        if self._journal is not None:
+            try:
+                self._journal.close()
+            except Exception:
+                pass
+            self._journal = None
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    uid INTEGER PRIMARY KEY,
+    name TEXT,
+    phone TEXT,
+    trial_granted_at TEXT,
+    trial_expires_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profile_regions (
+    uid INTEGER NOT NULL,
+    region TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    PRIMARY KEY (uid, region)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_phone ON profiles(phone);
+CREATE INDEX IF NOT EXISTS idx_profiles_trial_granted ON profiles(trial_granted_at);
+CREATE INDEX IF NOT EXISTS idx_profiles_trial_expires ON profiles(trial_expires_at);
+CREATE INDEX IF NOT EXISTS idx_profile_regions_region ON profile_regions(region);
+"""
+
+
+class SqliteProfileBackend:
+    """
+    Profillar SQLite (WAL) bazasida: har bir o'zgarish bitta qatorga upsert,
+    telefon, hududlar va trial sanalari bo'yicha indekslar bor.
+    """
+
+    name = "sqlite"
+    in_memory = False
+
+    def __init__(self, path: str, record_cls=None):
+        self.path = path
+        self.record_cls = record_cls
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.executescript(_SQLITE_SCHEMA)
+        self._conn.commit()
+        # Nuqtaviy o'qishlar uchun alohida ulanish (WAL yozuvchini bloklamaydi).
+        # fetch/contains loop ichidan chaqiriladi — bu lock faqat qisqa so'rovlarga
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _scan(self):
+        # To'liq o'tish va agregatlar uchun alohida ulanish — nuqtaviy o'qishlar
+        # (_read_lock) uzoq COUNT/GROUP BY tugashini kutib qolmaydi
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ---------- o'qish (nuqtaviy, PRIMARY KEY bo'yicha) ----------
+    def fetch(self, uid):
+        if not isinstance(uid, int):
+            return None
+        with self._read_lock:
+            row = self._read_conn.execute("SELECT data FROM profiles WHERE uid = ?", (uid,)).fetchone()
+        if not row:
+            return None
+        try:
+            profile = json.loads(row[0])
+        except Exception:
+            return None
+        return self.record_cls.from_dict(profile) if self.record_cls is not None else profile
+
+    def contains(self, uid) -> bool:
+        if not isinstance(uid, int):
+            return False
+        with self._read_lock:
+            row = self._read_conn.execute("SELECT 1 FROM profiles WHERE uid = ?", (uid,)).fetchone()
+        return row is not None
+
+    def count(self) -> int:
+        with self._read_lock:
+            return self._read_conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def iter_uids(self):
+        with self._scan() as conn:
+            for (uid,) in conn.execute("SELECT uid FROM profiles"):
+                yield uid
+
+    def iter_profiles(self):
+        with self._scan() as conn:
+            for uid, data in conn.execute("SELECT uid, data FROM profiles"):
+                try:
+                    yield uid, json.loads(data)
+                except Exception:
+                    continue
+
+    def preload(self) -> None:
+        pass
+
+    # ---------- yozish ----------
+    def stage(self, changes: dict) -> None:
+        pass
+
+    def wants_snapshot(self) -> bool:
+        return False
+
+    def _upsert(self, cur: sqlite3.Cursor, uid, profile: dict) -> None:
+        cur.execute(
+            "INSERT INTO profiles (uid, name, phone, trial_granted_at, trial_expires_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(uid) DO UPDATE SET name=excluded.name, phone=excluded.phone, "
+            "trial_granted_at=excluded.trial_granted_at, trial_expires_at=excluded.trial_expires_at, "
+            "data=excluded.data",
+            (
+                uid,
+                profile.get("name"),
+                profile.get("phone"),
+                profile.get("trial_granted_at"),
+                profile.get("trial_expires_at"),
+                json.dumps(profile, ensure_ascii=False, separators=(",", ":")),
+            ),
+        )
+        cur.execute("DELETE FROM profile_regions WHERE uid = ?", (uid,))
+        regions = profile.get("regions") or []
+        if isinstance(regions, str):
+            regions = [regions]
+        cur.executemany(
+            "INSERT OR IGNORE INTO profile_regions (uid, region, pos) VALUES (?, ?, ?)",
+            [(uid, str(region), pos) for pos, region in enumerate(regions)],
+        )
+
+    def write(self, changes: dict, full: bool = False) -> None:
+        cur = self._conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            for uid, profile in changes.items():
+                if not isinstance(uid, int):
+                    # Telegram ID'lari doim butun son; boshqa kalitlar saqlanmaydi
+                    continue
+                if profile is None:
+                    cur.execute("DELETE FROM profiles WHERE uid = ?", (uid,))
+                    cur.execute("DELETE FROM profile_regions WHERE uid = ?", (uid,))
+                else:
+                    self._upsert(cur, uid, profile)
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        for conn in (self._read_conn, self._conn):
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    # ---------- migratsiya ----------
+    def get_meta(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """users.json'dan bir martalik ko'chirish. Ko'chirilgan profillar sonini qaytaradi."""
+        if self.get_meta("migrated_from_json"):
+            return 0
+        profiles = dict(JsonProfileBackend(json_path, binary_snapshot=False).iter_profiles())
+        self.write({uid: _plain_copy(p) for uid, p in profiles.items() if isinstance(p, dict)})
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            ("migrated_from_json", f"{json_path}@{int(time.time())}"),
+        )
+        return len(profiles)
+
+    # ---------- so'rovlar (admin buyruqlari uchun) ----------
+    def summary(self) -> dict:
+        with self._scan() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+            with_phone = conn.execute(
+                "SELECT COUNT(*) FROM profiles WHERE phone IS NOT NULL AND phone != ''"
+            ).fetchone()[0]
+            drivers = conn.execute("SELECT COUNT(DISTINCT uid) FROM profile_regions").fetchone()[0]
+            region_totals = dict(
+                conn.execute("SELECT region, COUNT(*) FROM profile_regions GROUP BY region").fetchall()
+            )
+        return {
+            "total": total,
+            "with_phone": with_phone,
+            "drivers": drivers,
+            "region_totals": region_totals,
+        }
+
+    def find_by_phone(self, phone: str) -> list[int]:
+        with self._read_lock:
+            rows = self._read_conn.execute("SELECT uid FROM profiles WHERE phone = ?", (phone,)).fetchall()
+        return [r[0] for r in rows]
+
+    def drivers_in_region(self, region: str) -> list[int]:
+        with self._scan() as conn:
+            rows = conn.execute(
+                "SELECT uid FROM profile_regions WHERE region = ?", (region,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def trials_expiring_before(self, iso_dt: str) -> list[tuple[int, str]]:
+        with self._scan() as conn:
+            rows = conn.execute(
+                "SELECT uid, trial_expires_at FROM profiles "
+                "WHERE trial_expires_at IS NOT NULL AND trial_expires_at <= ? ORDER BY trial_expires_at",
+                (iso_dt,),
+            ).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+    def trials_expiring_after(self, iso_dt: str) -> list[tuple[int, str]]:
+        with self._scan() as conn:
+            rows = conn.execute(
+                "SELECT uid, trial_expires_at FROM profiles "
+                "WHERE trial_expires_at IS NOT NULL AND trial_expires_at > ? ORDER BY trial_expires_at",
+                (iso_dt,),
+            ).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+
+def open_backend(kind: str, json_path: str, db_path: str, journal_path: str | None = None,
+                 journal_compact_bytes: int = 4 * 1024 * 1024,
+                 record_cls=None, binary_snapshot: bool = True):
+    kind = (kind or "json").strip().lower()
+    if kind == "journal":
+        return JournalProfileBackend(
+            json_path,
+            journal_path or json_path + ".journal",
+            journal_compact_bytes,
+            record_cls=record_cls,
+            binary_snapshot=binary_snapshot,
+        )
+    if kind == "sqlite":
+        backend = SqliteProfileBackend(db_path, record_cls=record_cls)
+        if os.path.exists(json_path):
+            backend.migrate_from_json(json_path)
+        return backend
+    return JsonProfileBackend(json_path, record_cls=record_cls, binary_snapshot=binary_snapshot)
+
+
+# ================== LRU PROFIL KESHI ==================
+class ProfileCache(MutableMapping):
+    """
+    user_profiles o'rnida ishlatiladigan dict-ga o'xshash kesh: profillar
+    backend'dan talab bo'yicha o'qiladi va `max_entries`dan oshsa eng eski
+    (saqlanmagan o'zgarishi yo'q) yozuvlar chiqarib yuboriladi.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_entries: int = 50_000,
+        on_load: Callable[[Any, dict], bool] | None = None,
+        on_dirty: Callable[[Any], None] | None = None,
+        pinned: Callable[[Any], bool] | None = None,
+        factory: Callable[[dict], Any] | None = None,
+    ):
+        self.backend = backend
+        self.factory = factory
+        self.max_entries = max(1, int(max_entries))
+        self.on_load = on_load
+        self.on_dirty = on_dirty
+        self.pinned = pinned or (lambda uid: False)
+        self._lru: OrderedDict = OrderedDict()
+        self._new: set = set()       # hali backend'ga yozilmagan yangi profillar
+        self._deleted: set = set()   # o'chirilgan, lekin hali flush qilinmagan
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- ichki ----------
+    def _evict(self) -> None:
+        # RAM'da to'liq turadigan backend uchun chiqarishdan foyda yo'q
+        if self.backend.in_memory or len(self._lru) <= self.max_entries:
+            return
+        excess = len(self._lru) - self.max_entries
+        for uid in list(self._lru.keys()):
+            if excess <= 0:
+                break
+            if uid in self._new or self.pinned(uid):
+                continue
+            del self._lru[uid]
+            self.evictions += 1
+            excess -= 1
+
+    def _load(self, uid):
+        profile = self._lru.get(uid)
+        if profile is not None:
+            self.hits += 1
+            self._lru.move_to_end(uid)
+            return profile
+        if uid in self._deleted:
+            return None
+        self.misses += 1
+        profile = self.backend.fetch(uid)
+        if profile is None:
+            return None
+        if self.on_load is not None and self.on_load(uid, profile) and self.on_dirty is not None:
+            self.on_dirty(uid)
+        self._lru[uid] = profile
+        self._evict()
+        return profile
+
+    def peek(self, uid):
+        """LRU tartibini o'zgartirmasdan keshdagi obyektni qaytaradi."""
+        return self._lru.get(uid)
+
+    def cached_keys(self) -> list:
+        return list(self._lru.keys())
+
+    def persisted(self, uids) -> None:
+        self._new.difference_update(uids)
+        self._deleted.difference_update(uids)
+        self._evict()
+
+    # ---------- Mapping interfeysi ----------
+    def __getitem__(self, uid):
+        profile = self._load(uid)
+        if profile is None:
+            raise KeyError(uid)
+        return profile
+
+    def get(self, uid, default=None):
+        profile = self._load(uid)
+        return default if profile is None else profile
+
+    def __contains__(self, uid) -> bool:
+        if uid in self._lru:
+            return True
+        if uid in self._deleted:
+            return False
+        return self.backend.contains(uid)
+
+    def __setitem__(self, uid, profile) -> None:
+        if self.factory is not None:
+            profile = self.factory(profile)
+        if uid not in self._lru and (uid in self._deleted or not self.backend.contains(uid)):
+            self._new.add(uid)
+        self._deleted.discard(uid)
+        self._lru[uid] = profile
+        self._lru.move_to_end(uid)
+        self._evict()
+
+    def setdefault(self, uid, default=None):
+        # MutableMapping.setdefault `default`ni qaytaradi; bizga keshdagi (factory'dan
+        # o'tgan) obyekt kerak, aks holda chaqiruvchi o'zgartirgan narsa yo'qoladi
+        profile = self._load(uid)
+        if profile is None:
+            self[uid] = default
+            profile = self._lru[uid]
+        return profile
+
+    def __delitem__(self, uid) -> None:
+        if uid not in self:
+            raise KeyError(uid)
+        self._lru.pop(uid, None)
+        self._new.discard(uid)
+        self._deleted.add(uid)
+        if self.on_dirty is not None:
+            self.on_dirty(uid)
+
+    def __iter__(self):
+        for uid in self.backend.iter_uids():
+            if uid not in self._deleted:
+                yield uid
+        for uid in list(self._new):
+            yield uid
+
+    def __len__(self) -> int:
+        # Flush'gacha yaratilib o'chirilgan profil backend'da yo'q — faqat u yerda
+        # bor o'chirishlar ayiriladi (ikkala to'plam ham flush'da tozalanadi)
+        contains = self.backend.contains
+        added = sum(1 for uid in self._new if not contains(uid))
+        removed = sum(1 for uid in self._deleted if contains(uid))
+        return self.backend.count() + added - removed
+
+    def items(self):
+        # Keshdagi obyekt ustun; to'liq o'tish keshni "yuvib" yubormaydi
+        for uid, profile in self.backend.iter_profiles():
+            if uid in self._deleted:
+                continue
+            yield uid, self._lru.get(uid, profile)
+        for uid in list(self._new):
+            profile = self._lru.get(uid)
+            if profile is not None:
+                yield uid, profile
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self._lru),
+            "max_entries": self.max_entries,
+            # RAM'da to'liq turadigan backend uchun chiqarish o'chiq
+            "bounded": not self.backend.in_memory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+# ================== WRITE-BEHIND STORE ==================
+class ProfileStore:
+    """
+    user_profiles uchun write-behind saqlovchi: o'zgargan profillar "dirty" deb
+    belgilanadi va har `interval` soniyada bitta yozuvga jamlanadi.
+    Serializatsiya event loop'dan tashqarida (thread'da) bajariladi.
+    """
+
+    def __init__(
+        self,
+        backend,
+        interval: float = 2.0,
+        cache_size: int = 50_000,
+        on_load: Callable[[Any, dict], bool] | None = None,
+        factory: Callable[[dict], Any] | None = None,
+    ):
+        self.backend = backend
+        self.interval = max(0.05, float(interval))
+        self._dirty: set = set()
+        self._inflight: set = set()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self.profiles = ProfileCache(
+            backend,
+            max_entries=cache_size,
+            on_load=on_load,
+            on_dirty=self.mark_dirty,
+            pinned=lambda uid: uid in self._dirty or uid in self._inflight,
+            factory=factory,
+        )
+
+        self.mutations = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_batch = 0
+
+    # ---------- yuklash ----------
+    def load(self) -> ProfileCache:
+        # Profillar talab bo'yicha o'qiladi — bu yerda hech narsa yuklanmaydi
+        return self.profiles
+
+    async def preload(self) -> None:
+        # JSON/jurnal backend'ni fon thread'da oldindan o'qib qo'yish
+        await asyncio.to_thread(self.backend.preload)
+
+    # ---------- dirty tracking ----------
+    def mark_dirty(self, uid) -> None:
+        self._dirty.add(uid)
+        self.mutations += 1
+
+    def mark_all_dirty(self) -> None:
+        self._dirty.update(self.profiles.cached_keys())
+        self.mutations += 1
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    # ---------- yozish ----------
+    async def flush(self) -> bool:
+        async with self._lock:
+            if not self._dirty:
+                return True
+            batch = self._dirty
+            self._dirty = set()
+            self._inflight = batch
+            started = time.perf_counter()
+            # Loop ichida faqat o'zgargan qatorlar nusxalanadi; to'liq snapshot
+            # (kerak bo'lsa) backend'ning o'zi thread'da yig'adi
+            changes = {}
+            for uid in batch:
+                profile = self.profiles.peek(uid)
+                changes[uid] = _plain_copy(profile) if profile is not None else None
+            self.backend.stage(changes)
+            try:
+                await asyncio.to_thread(self.backend.write, changes, self.backend.wants_snapshot())
+            except Exception:
+                self._dirty |= batch
+                self.flush_errors += 1
+                return False
+            finally:
+                self._inflight = set()
+            self.profiles.persisted(batch)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.last_batch = len(batch)
+            self.last_flush_ms = elapsed
+            self.total_flush_ms += elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            return True
+
+    async def query(self, method: str, *args):
+        """Backend so'rovi (masalan SQLite summary). Qo'llab-quvvatlanmasa None."""
+        fn = getattr(self.backend, method, None)
+        if fn is None:
+            return None
+        await self.flush()
+        return await asyncio.to_thread(fn, *args)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._dirty:
+                try:
+                    await self.flush()
+                except Exception:
+                    # flush sikli yiqilmasin
+                    pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self.flush()
+        self.backend.close()
+
+    def stats(self) -> dict[str, Any]:
+        avg = self.total_flush_ms / self.flush_count if self.flush_count else 0.0
+        return {
+            "backend": self.backend.name,
+            "pending": self.pending,
+            "mutations": self.mutations,
+            "flushes": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_batch": self.last_batch,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(avg, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "interval_s": self.interval,
+            "cache": self.profiles.stats(),
+            "backend_stats": getattr(self.backend, "stats", dict)(),
+        }
+
+
+if __name__ == "__main__":
+    # python -m app.storage migrate data/users.json data/users.sqlite3
+    if len(sys.argv) == 4 and sys.argv[1] == "migrate":
+        db = SqliteProfileBackend(sys.argv[3])
+        moved = db.migrate_from_json(sys.argv[2])
+        db.close()
+        print(f"Ko'chirildi: {moved} ta profil")
+    else:
+        print("Foydalanish: python -m app.storage migrate USERS_JSON USERS_DB")
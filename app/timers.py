@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Hashable, Iterable, NamedTuple
+
+from app.metrics import LatencyHistogram
+
+# Kechikish gistogrammasi chegaralari (soniya): taymer rejalashtirilgan paytdan qancha keyin ishladi
+LATENESS_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0, 3600.0)
+
+
+class Timer(NamedTuple):
+    due: float          # time.time() bo'yicha
+    seq: int
+    key: Hashable
+    kind: str
+    payload: Any
+
+
+class TimerService:
+    """
+    Jarayon uchun yagona taymer navbati: heap (due, seq) bo'yicha va bitta
+    kutuvchi vazifa. schedule() — O(log n); cancel() — kalit lug'atdan
+    o'chiriladi, heap'dagi yozuv "o'lik" bo'lib qoladi va navbati kelganda
+    tashlab yuboriladi (o'liklar ko'payib ketsa heap qayta quriladi).
+
+    Har bir taymer turi (`kind`) uchun register() bilan async handler
+    beriladi; payload oddiy qiymat bo'lishi kerak — export()/restore() orqali
+    runtime snapshot'ga tushadi. Jarayon to'xtab turgan paytda o'tib ketgan
+    taymerlar `max_lateness`dan kech bo'lsa ishlamaydi (expired). `concurrency`
+    — bir vaqtda ko'pi bilan nechta handler (ko'p taymer birdan tushganda).
+    """
+
+    def __init__(self, on_change: Callable[[], None] | None = None):
+        self.on_change = on_change
+        self._heap: list[Timer] = []
+        self._timers: dict[Hashable, Timer] = {}
+        self._handlers: dict[str, tuple[Callable[[Any], Awaitable[Any]], float | None, asyncio.Semaphore | None]] = {}
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+        self.fired = 0
+        self.cancelled = 0
+        self.expired = 0
+        self.errors = 0
+        self.lateness: dict[str, LatencyHistogram] = {}
+
+    def register(
+        self,
+        kind: str,
+        handler: Callable[[Any], Awaitable[Any]],
+        max_lateness: float | None = None,
+        concurrency: int | None = None,
+    ) -> None:
+        semaphore = asyncio.Semaphore(max(1, int(concurrency))) if concurrency else None
+        self._handlers[kind] = (handler, max_lateness, semaphore)
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change()
+            except Exception:
+                pass
+
+    # ---------- rejalashtirish ----------
+    def schedule(self, key: Hashable, due: float, kind: str, payload: Any = None) -> None:
+        """`due` (time.time()) paytida `kind` handlerini chaqiradi; shu kalitli eski taymer almashtiriladi."""
+        timer = Timer(due, next(self._seq), key, kind, payload)
+        self._timers[key] = timer
+        heapq.heappush(self._heap, timer)
+        if self._heap[0] is timer:
+            self._wake.set()  # eng yaqin taymer o'zgardi
+        self._changed()
+
+    def cancel(self, key: Hashable) -> bool:
+        if self._timers.pop(key, None) is None:
+            return False
+        self.cancelled += 1
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            self._heap = list(self._timers.values())
+            heapq.heapify(self._heap)
+        self._changed()
+        return True
+
+    def get(self, key: Hashable) -> Timer | None:
+        return self._timers.get(key)
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    # ---------- ishlash ----------
+    def _pop_due(self, now: float) -> list[Timer]:
+        due = []
+        while self._heap and self._heap[0].due <= now:
+            timer = heapq.heappop(self._heap)
+            # Bekor qilingan yoki almashtirilgan taymer — o'tkazib yuboriladi
+            if self._timers.get(timer.key) is timer:
+                del self._timers[timer.key]
+                due.append(timer)
+        return due
+
+    def _next_delay(self) -> float | None:
+        while self._heap and self._timers.get(self._heap[0].key) is not self._heap[0]:
+            heapq.heappop(self._heap)  # bekor qilingan/almashtirilganlar
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0].due - time.time())
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            delay = self._next_delay()
+            if delay is None or delay > 0:
+                try:
+                    # Uzoq taymerlar uchun ham vaqti-vaqti bilan uyg'onamiz (soat o'zgarishi)
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(delay if delay is not None else 60.0, 60.0))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now = time.time()
+            timers = self._pop_due(now)
+            if timers:
+                self._changed()
+            for timer in timers:
+                self._fire(timer, now)
+
+    def _fire(self, timer: Timer, now: float) -> None:
+        handler, max_lateness, semaphore = self._handlers.get(timer.kind, (None, None, None))
+        late = now - timer.due
+        if handler is None or (max_lateness is not None and late > max_lateness):
+            self.expired += 1
+            return
+        histogram = self.lateness.get(timer.kind)
+        if histogram is None:
+            histogram = self.lateness[timer.kind] = LatencyHistogram(LATENESS_BUCKETS)
+        histogram.observe(max(0.0, late))
+        self.fired += 1
+        task = asyncio.create_task(self._call(handler, timer, semaphore))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _call(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        timer: Timer,
+        semaphore: asyncio.Semaphore | None,
+    ) -> None:
+        try:
+            if semaphore is None:
+                await handler(timer.payload)
+                return
+            async with semaphore:
+                await handler(timer.payload)
+        except Exception:
+            self.errors += 1
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- snapshot ----------
+    def export(self) -> list[Timer]:
+        # Loop ichida faqat ro'yxat nusxasi (Timer o'zgarmas); pickle snapshot thread'ida
+        return list(self._timers.values())
+
+    def restore(self, entries: Iterable[tuple] | None) -> int:
+        restored = 0
+        for entry in entries or ():
+            try:
+                if isinstance(entry, Timer):
+                    key, due, kind, payload = entry.key, entry.due, entry.kind, entry.payload
+                else:
+                    key, due, kind, payload = entry
+            except (TypeError, ValueError):
+                continue
+            if key in self._timers:
+                continue
+            self.schedule(key, float(due), kind, payload)
+            restored += 1
+        return restored
+
+    def stats(self) -> dict[str, Any]:
+        pending: dict[str, int] = {}
+        for timer in self._timers.values():
+            pending[timer.kind] = pending.get(timer.kind, 0) + 1
+        upcoming = min(self._timers.values(), default=None)
+        return {
+            "pending": pending,
+            "next_in": round(upcoming.due - time.time(), 1) if upcoming else None,
+            "fired": self.fired,
+            "cancelled": self.cancelled,
+            "expired": self.expired,
+            "errors": self.errors,
+            "lateness": {kind: h.summary() for kind, h in self.lateness.items()},
+        }
@@ -0,0 +1,87 @@
+"""
+To'lov tasdiqlangandan keyin haydovchiga invite silkalar yuborish vaqti
+(hududlar soniga qarab): ketma-ket va parallel (fan_out).
+
+    python bench/bench_fanout.py [LATENCY_MS]
+
+Telegram API o'rniga soxta session: har bir so'rov LATENCY_MS (standart 80)
+kutadi. So'rovlar haqiqiy OutboundLimiter'dan o'tadi; "burst 3" — standart
+chat limiti, "burst 10" — qisqa portlashga ruxsat berilgan holat.
+"""
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="eltiber-bench-")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ["RUNTIME_STATE_PATH"] = os.path.join(TMP, "runtime_state.bin")
+
+from aiogram import types  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+
+import bot  # noqa: E402
+from app.outbound import OutboundLimiter  # noqa: E402
+
+_ids = itertools.count(1000)
+
+
+class LatencySession(BaseSession):
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def make_request(self, bot_, method, timeout=None):
+        await asyncio.sleep(self.latency)
+        ret = method.__returning__
+        if ret is types.Message:
+            chat = types.Chat(id=int(getattr(method, "chat_id", 0) or 0), type="private")
+            return types.Message(message_id=next(_ids), date=datetime.now(), chat=chat)
+        if ret is types.ChatInviteLink:
+            creator = types.User(id=1, is_bot=True, first_name="bot")
+            return types.ChatInviteLink(
+                invite_link=f"https://t.me/+bench{next(_ids)}", creator=creator,
+                creates_join_request=False, is_primary=False, is_revoked=False,
+            )
+        return True
+
+
+async def approve(driver_id: int, regions: list[str], limit: int, burst: float, latency: float) -> float:
+    session = LatencySession(latency)
+    session.middleware(OutboundLimiter(chat_burst=burst))
+    bot.bot.session = session
+    bot.FANOUT_CONCURRENCY = limit
+    started = time.perf_counter()
+    outcomes = await bot.send_region_invites(driver_id, regions, bot.payment_confirmed_text)
+    elapsed = time.perf_counter() - started
+    assert all(o.ok for o in outcomes)
+    return elapsed * 1000
+
+
+async def main(latency_ms: float) -> None:
+    latency = latency_ms / 1000
+    names = bot.REGION_NAMES
+    driver_ids = itertools.count(500_000)
+    print(f"so'rov kechikishi: {latency_ms:.0f} ms")
+    for burst in (3.0, 10.0):
+        print(f"-- chat burst {burst:.0f}")
+        for count in range(1, min(7, len(names)) + 1):
+            regions = names[:count]
+            seq = await approve(next(driver_ids), regions, 1, burst, latency)
+            par = await approve(next(driver_ids), regions, 5, burst, latency)
+            print(f"{count} hudud   ketma-ket {seq:7.0f} ms   parallel {par:7.0f} ms   x{seq / par:.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 80.0))
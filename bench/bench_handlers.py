@@ -0,0 +1,255 @@
+"""
+Handlerlar uchun mikrobenchmark: sintetik Update'lar `dp.feed_update` orqali
+beriladi, Bot sessiyasi tarmoqqa chiqmaydi (so'rovlarni faqat sanaydi).
+
+    python bench/bench_handlers.py [--iterations N] [--users N]
+                                   [--baseline FILE] [--save] [--threshold 0.3]
+
+Har bir handler uchun p50/p99 (µs), bitta update'ga chiquvchi so'rovlar soni va
+tracemalloc bo'yicha eng yuqori xotira (KiB). --save natijani baseline faylga
+yozadi; keyingi ishga tushirishda p50 baseline'dan `threshold` ulushdan ko'proq
+oshsa — regressiya, chiqish kodi 1.
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="eltiber-bench-")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ["RUNTIME_STATE_PATH"] = os.path.join(TMP, "runtime_state.bin")
+
+from aiogram import types  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+
+import bot  # noqa: E402
+from app.records import Draft, Order, Profile, Subscription  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "handlers_baseline.json")
+_ids = itertools.count(10_000)
+
+
+class RecordingSession(BaseSession):
+    """Tarmoqsiz session: metod turiga mos soxta javob qaytaradi va chaqiriqlarni sanaydi."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._user = types.User(id=1, is_bot=True, first_name="bot", username="bot")
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def make_request(self, bot_, method, timeout=None):
+        self.calls += 1
+        ret = method.__returning__
+        if ret is types.Message:
+            chat = types.Chat(id=int(getattr(method, "chat_id", 0) or 0), type="private")
+            return types.Message(message_id=next(_ids), date=datetime.now(), chat=chat)
+        if ret is types.ChatInviteLink:
+            return types.ChatInviteLink(
+                invite_link=f"https://t.me/+bench{next(_ids)}", creator=self._user,
+                creates_join_request=False, is_primary=False, is_revoked=False,
+            )
+        if ret is types.User:
+            return self._user
+        return True
+
+
+def _user(uid: int) -> types.User:
+    return types.User(id=uid, is_bot=False, first_name=f"U{uid}")
+
+
+def message_update(uid: int, text: str, chat_id: int | None = None) -> types.Update:
+    entities = None
+    if text.startswith("/"):
+        entities = [types.MessageEntity(type="bot_command", offset=0, length=len(text.split()[0]))]
+    message = types.Message(
+        message_id=next(_ids), date=datetime.now(), text=text, entities=entities,
+        chat=types.Chat(id=chat_id or uid, type="private"), from_user=_user(uid),
+    )
+    return types.Update(update_id=next(_ids), message=message)
+
+
+def callback_update(uid: int, data: str, chat_id: int) -> types.Update:
+    message = types.Message(
+        message_id=next(_ids), date=datetime.now(), text="x",
+        chat=types.Chat(id=chat_id, type="supergroup"), from_user=_user(uid),
+    )
+    query = types.CallbackQuery(id=str(next(_ids)), from_user=_user(uid), chat_instance="c", message=message, data=data)
+    return types.Update(update_id=next(_ids), callback_query=query)
+
+
+def chat_member_update(uid: int, chat_id: int) -> types.Update:
+    user = _user(uid)
+    event = types.ChatMemberUpdated(
+        chat=types.Chat(id=chat_id, type="supergroup"), from_user=user, date=datetime.now(),
+        old_chat_member=types.ChatMemberLeft(user=user), new_chat_member=types.ChatMemberMember(user=user),
+    )
+    return types.Update(update_id=next(_ids), chat_member=event)
+
+
+# ---------- sintetik holat ----------
+REGION = "Quva"
+CUSTOMER, DRIVER = 900_001, 900_002
+
+
+def populate(users: int) -> None:
+    names = bot.REGION_NAMES
+    for i in range(users):
+        uid = 800_000_000 + i
+        profile = Profile(name=f"Mijoz {i}", phone=f"+99890{i:07d}", regions=[names[i % len(names)]],
+                          last_region=names[i % len(names)])
+        bot.user_profiles[uid] = profile
+        if i % 10 == 0:
+            bot.subscriptions[uid] = Subscription(active=True, regions=[names[i % len(names)]])
+            bot.refresh_driver_regions(uid)
+    bot.user_profiles[CUSTOMER] = Profile(name="Mijoz", phone="+998900000001", last_region=REGION)
+    bot.user_profiles[DRIVER] = Profile(name="Haydovchi", phone="+998900000002", regions=[REGION])
+    bot.subscriptions[DRIVER] = Subscription(active=True, regions=[REGION])
+    bot.refresh_driver_regions(DRIVER)
+
+
+def open_order() -> None:
+    bot.orders[CUSTOMER] = Order(
+        region=REGION, vehicle="Labo", from_="A", to="B", when="23:59", msg_id=1,
+        chat_id=bot.get_order_chat_id(REGION), status="open", driver_id=None,
+        cust_info_msg_id=None, drv_info_msg_id=None, cust_rating_msg_id=None, rating=None, reminder_tasks=[],
+    )
+
+
+def new_draft() -> None:
+    bot.drafts[CUSTOMER] = Draft(stage="region", region=None, chat_id=None, vehicle=None, from_=None, to=None, when=None)
+
+
+def scenarios() -> dict:
+    """nom -> (tayyorlash, update yaratish, tozalash)"""
+    driver_chat = bot.get_driver_chat_id(REGION)
+
+    def onboarding_setup():
+        bot.driver_onboarding[DRIVER] = {"stage": "regions", "regions": []}
+
+    def onboarding_cleanup():
+        bot.driver_onboarding.pop(DRIVER, None)
+        bot.refresh_driver_regions(DRIVER)
+
+    def chat_member_setup():
+        bot.pending_invites[DRIVER] = {REGION: {"msg_id": 1, "link": "x", "chat_id": driver_chat, "region": REGION}}
+
+    return {
+        "onboarding_or_order_text": (onboarding_setup, lambda: message_update(DRIVER, REGION), onboarding_cleanup),
+        "collect_flow": (new_draft, lambda: message_update(CUSTOMER, REGION), lambda: bot.drafts.pop(CUSTOMER, None)),
+        "accept_order": (
+            open_order,
+            lambda: callback_update(DRIVER, f"accept_{CUSTOMER}", bot.get_order_chat_id(REGION)),
+            lambda: bot.cancel_driver_reminders(CUSTOMER),
+        ),
+        "cancel_order": (
+            open_order,
+            lambda: callback_update(CUSTOMER, f"cancel_{CUSTOMER}", CUSTOMER),
+            lambda: bot.orders.pop(CUSTOMER, None),
+        ),
+        "on_chat_member": (chat_member_setup, lambda: chat_member_update(DRIVER, driver_chat), lambda: None),
+        "stats_cmd": (lambda: None, lambda: message_update(bot.ADMIN_IDS[0], "/stats"), lambda: None),
+    }
+
+
+# ---------- o'lchash ----------
+async def measure(session: RecordingSession, setup, make_update, cleanup, iterations: int) -> dict:
+    feed = bot.dp.feed_update
+    samples = []
+    calls = 0
+    for i in range(iterations + iterations // 20):
+        setup()
+        update = make_update()
+        before = session.calls
+        started = time.perf_counter()
+        await feed(bot.bot, update)
+        elapsed = time.perf_counter() - started
+        cleanup()
+        if i >= iterations // 20:  # birinchi 5% — qizdirish
+            samples.append(elapsed)
+            calls += session.calls - before
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(min(200, iterations)):
+        setup()
+        update = make_update()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        await feed(bot.bot, update)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        cleanup()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 1),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6, 1),
+        "calls": round(calls / len(samples), 1),
+        "peak_kib": round(sum(peaks) / len(peaks) / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if result["p50_us"] > old["p50_us"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {old['p50_us']} -> {result['p50_us']} µs")
+    return regressions
+
+
+async def main(args) -> int:
+    session = RecordingSession()
+    bot.bot.session = session
+    bot.profile_store.backend.path = os.path.join(TMP, "users.json")
+    populate(args.users)
+    await bot.rebuild_region_indexes()
+    gc.collect()
+
+    results = {}
+    print(f"{'handler':<26} {'p50 µs':>9} {'p99 µs':>9} {'so‘rov':>7} {'xotira KiB':>11}")
+    for name, (setup, make_update, cleanup) in scenarios().items():
+        result = results[name] = await measure(session, setup, make_update, cleanup, args.iterations)
+        print(f"{name:<26} {result['p50_us']:>9} {result['p99_us']:>9} {result['calls']:>7} {result['peak_kib']:>11}")
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline yozildi: {args.baseline}")
+        return 0
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print("REGRESSIYA", line)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.3)
+    sys.exit(asyncio.run(main(parser.parse_args())))
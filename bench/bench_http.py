@@ -0,0 +1,67 @@
+"""
+HTTP ulanishlar puli hajmini tanlash: soxta Telegram API (bench/fakeapi.py)
+ustida bir vaqtda C ta sendMessage, har xil HTTP_POOL_SIZE bilan.
+
+    python bench/bench_http.py [N] [C] [LATENCY_MS]
+
+Har bir hajm uchun: o'tkazuvchanlik (so'rov/s), p50/p95 kechikish va ulanishlarni
+qayta ishlatish ulushi (InstrumentedSession.stats()).
+"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+
+from app.keyboards import KeyboardCache  # noqa: E402
+from app.session import InstrumentedSession  # noqa: E402
+from fakeapi import FakeTelegramAPI  # noqa: E402
+
+TOKEN = "123456:bench"
+
+
+async def run(base: str, pool_size: int, n: int, concurrency: int) -> None:
+    session = InstrumentedSession(
+        KeyboardCache(), pool_size=pool_size, api=TelegramAPIServer.from_base(base)
+    )
+    bot = Bot(TOKEN, session=session)
+    queue = iter(range(n))
+
+    async def worker():
+        for i in queue:
+            await bot.send_message(1 + i % 500, "salom")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    st = session.stats()
+    m = st["methods"]["sendMessage"]
+    print(
+        f"pul {pool_size:>4}   {n / elapsed:7.0f} so'rov/s   p50 {m['p50_ms']:6.1f} ms   p95 {m['p95_ms']:6.1f} ms"
+        f"   yangi ulanish {st['connections_created']:>4}   qayta ishlatish {st['reuse_ratio']:5.1f}%"
+    )
+    await session.close()
+
+
+async def main(n: int, concurrency: int, latency_ms: float) -> None:
+    api = FakeTelegramAPI(TOKEN, latency=latency_ms / 1000)
+    base = await api.start()
+    print(f"{n} ta so'rov, {concurrency} parallel, API kechikishi {latency_ms:.0f} ms")
+    try:
+        for pool_size in (10, 30, 100, 200):
+            await run(base, pool_size, n, concurrency)
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 3000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 50.0,
+    ))
@@ -0,0 +1,69 @@
+"""
+Bitta javobga to'g'ri keladigan klaviatura xarajati: markup qurish + so'rov
+tanasini (form-data) tayyorlash.
+
+    python bench/bench_keyboards.py [N]
+
+"eski" — har safar yangi markup va oddiy AiohttpSession; "yangi" — keshdagi
+markup va CachedMarkupSession (JSON ham keshdan).
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="eltiber-bench-")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ["RUNTIME_STATE_PATH"] = os.path.join(TMP, "runtime_state.bin")
+
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.methods import SendMessage  # noqa: E402
+
+import bot  # noqa: E402
+from app.session import CachedMarkupSession  # noqa: E402
+
+TEXT = "✅ Hudud qo‘shildi: <b>Quva</b>\nTanlangan hududlar: <b>Quva</b>"
+
+
+def markup_field(form) -> str:
+    for options, _headers, value in form._fields:
+        if options.get("name") == "reply_markup":
+            return value
+    raise AssertionError("reply_markup yo'q")
+
+
+def old_reply(session, kind: str):
+    if kind == "driver_region":
+        markup = bot._build_driver_region_keyboard(bot.REGION_NAMES, False)
+    else:
+        markup = bot._build_back_cancel_keyboard([bot.HOZIR, bot.BOSHQA], per_row=2, show_back=True)
+    return session.build_form_data(bot.bot, SendMessage(chat_id=1, text=TEXT, reply_markup=markup))
+
+
+def new_reply(session, kind: str):
+    markup = bot.driver_region_keyboard(include_back=False) if kind == "driver_region" else bot.when_keyboard()
+    return session.build_form_data(bot.bot, SendMessage(chat_id=1, text=TEXT, reply_markup=markup))
+
+
+def timed(fn, session, kind: str, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn(session, kind)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+def main(n: int) -> None:
+    plain = AiohttpSession()
+    cached = CachedMarkupSession(bot.keyboard_cache)
+    for kind in ("driver_region", "when"):
+        # Natija bir xil bo'lishi shart
+        assert markup_field(old_reply(plain, kind)) == markup_field(new_reply(cached, kind))
+        before = timed(old_reply, plain, kind, n)
+        after = timed(new_reply, cached, kind, n)
+        print(f"{kind:<14} eski {before:8.1f} µs   yangi {after:8.1f} µs   x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000)
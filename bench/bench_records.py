@@ -0,0 +1,87 @@
+"""
+Yozuv turlarining xotira sarfi: oddiy dict va __slots__ yozuvlar.
+
+    python bench/bench_records.py [N]
+
+Har bir tur uchun N ta sintetik yozuv yaratiladi va tracemalloc orqali
+bitta yozuvga to'g'ri keladigan baytlar o'lchanadi (qiymatlar o'zi —
+satrlar, ro'yxatlar — ikkala holatda ham umumiy, shuning uchun farq faqat
+konteynerning o'zida).
+"""
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.records import Draft, Order, Profile, Subscription, TrialEntry  # noqa: E402
+
+REGIONS = ["Quva", "Rishton"]
+PHONE = "+998901234567"
+EXPIRES = "2025-10-16T14:36:37.264637"
+
+
+def profile_data(i: int) -> dict:
+    return {
+        "name": "Mijoz",
+        "phone": PHONE,
+        "regions": REGIONS,
+        "last_region": "Rishton",
+        "trial_granted_at": EXPIRES,
+        "trial_expires_at": EXPIRES,
+    }
+
+
+def draft_data(i: int) -> dict:
+    return {"stage": "to", "region": "Quva", "chat_id": -100, "vehicle": "🛻 Labo", "from": "A", "to": None, "when": None}
+
+
+def order_data(i: int) -> dict:
+    return {
+        "region": "Quva", "vehicle": "🛻 Labo", "from": "A", "to": "B", "when": "19:00",
+        "msg_id": i, "chat_id": -100, "status": "open", "driver_id": None,
+        "cust_info_msg_id": None, "drv_info_msg_id": None, "cust_rating_msg_id": None,
+        "rating": None, "reminder_tasks": None,
+    }
+
+
+def subscription_data(i: int) -> dict:
+    return {"active": True, "regions": REGIONS, "last_region": "Rishton"}
+
+
+def trial_data(i: int) -> dict:
+    return {"expires_at": EXPIRES, "regions": REGIONS, "last_region": "Rishton"}
+
+
+def measure(build, n: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Ro'yxatning o'zi (8 bayt/element) hisobdan chiqariladi
+    per_record = (after - before - sys.getsizeof(items)) / n
+    del items
+    return per_record
+
+
+def main(n: int) -> None:
+    kinds = [
+        ("profile", profile_data, Profile),
+        ("draft", draft_data, Draft),
+        ("order", order_data, Order),
+        ("subscription", subscription_data, Subscription),
+        ("trial", trial_data, TrialEntry),
+    ]
+    print(f"N = {n}")
+    print(f"{'tur':<14}{'dict B':>10}{'slots B':>10}{'tejash':>10}")
+    for name, data, cls in kinds:
+        as_dict = measure(data, n)
+        as_record = measure(lambda i: cls.from_dict(data(i)), n)
+        saved = 100 * (1 - as_record / as_dict) if as_dict else 0
+        print(f"{name:<14}{as_dict:>10.0f}{as_record:>10.0f}{saved:>9.0f}%")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,93 @@
+"""
+RAM holati snapshot'ini saqlash/tiklash tezligi.
+
+    python bench/bench_runtime_state.py [N]
+
+N ta sintetik buyurtma/obuna/trial/draft yaratadi, snapshot'ni yozadi va
+qayta o'qib `apply_runtime_state` orqali tiklaydi. "loop" — saqlashning event
+loop ichidagi qismi (bo'limlarning sayoz nusxasi); qolgani thread'da.
+Oxirida faqat bitta bo'lim (drafts) o'zgargandagi saqlash ham o'lchanadi.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="eltiber-bench-")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ["RUNTIME_STATE_PATH"] = os.path.join(TMP, "runtime_state.bin")
+
+import bot  # noqa: E402
+from app.records import Draft, Order, Subscription, TrialEntry  # noqa: E402
+
+
+def populate(n: int) -> None:
+    regions = bot.REGION_NAMES
+    now = datetime.now()
+    for i in range(n):
+        uid = 10_000_000 + i
+        region = regions[i % len(regions)]
+        bot.orders[uid] = Order(
+            region=region,
+            vehicle="🛻 Labo",
+            from_=f"Ko'cha {i}",
+            to=f"Mahalla {i}",
+            when="23:59",
+            msg_id=i,
+            chat_id=bot.ORDER_CHAT_IDS[region],
+            status="open",
+            driver_id=None,
+            cust_info_msg_id=None,
+            drv_info_msg_id=None,
+            cust_rating_msg_id=None,
+            rating=None,
+            reminder_tasks=[],
+        )
+        if i % 4 == 0:
+            bot.subscriptions[uid] = Subscription(active=True, regions=[region], last_region=region)
+        if i % 4 == 1:
+            bot.trial_members[uid] = TrialEntry(expires_at=now + timedelta(days=30), regions=[region], last_region=region)
+        if i % 4 == 2:
+            bot.drafts[uid] = Draft(stage="to", region=region, chat_id=1, vehicle="Labo", from_="x", to=None, when=None)
+        if i % 4 == 3:
+            bot.pending_invites[uid] = {region: {"msg_id": i, "link": "https://t.me/+abc", "chat_id": 1, "region": region}}
+
+
+async def main(n: int) -> None:
+    populate(n)
+    total = sum(len(getattr(bot, key)) for key in bot.RUNTIME_STATE_KEYS)
+
+    started = time.perf_counter()
+    await bot.runtime_state.save()
+    save_ms = (time.perf_counter() - started) * 1000
+    save_loop_ms = bot.runtime_state.last_loop_ms
+
+    bot.drafts[next(iter(bot.drafts))]["to"] = "Yangi manzil"
+    bot.runtime_state.mark_dirty("drafts")
+    started = time.perf_counter()
+    await bot.runtime_state.save()
+    partial_ms = (time.perf_counter() - started) * 1000
+    partial_loop_ms = bot.runtime_state.last_loop_ms
+
+    for key in bot.RUNTIME_STATE_KEYS:
+        getattr(bot, key).clear()
+
+    started = time.perf_counter()
+    state = bot.runtime_state.load()
+    restored = bot.apply_runtime_state(state)
+    restore_ms = (time.perf_counter() - started) * 1000
+
+    size = os.path.getsize(bot.RUNTIME_STATE_PATH)
+    print(f"yozuvlar:   {total}")
+    print(f"fayl:       {size / 1024 / 1024:.2f} MiB")
+    print(f"saqlash:    {save_ms:.1f} ms (loop: {save_loop_ms:.1f} ms)")
+    print(f"faqat drafts: {partial_ms:.1f} ms (loop: {partial_loop_ms:.1f} ms)")
+    print(f"tiklash:    {restore_ms:.1f} ms ({restored} yozuv)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,81 @@
+"""
+Ishga tushishda users.json o'qish vaqti: JSON va binar snapshot (users.json.bin).
+
+    python bench/bench_startup.py [N ...]
+
+Har bir N uchun sintetik users.json yaratiladi, so'ng profillar avval JSON'dan
+(binar nusxasiz), keyin binar snapshot'dan yuklanadi. Standart: 10k, 100k, 1M.
+"""
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.records import Profile  # noqa: E402
+from app.storage import JsonProfileBackend  # noqa: E402
+
+REGIONS = ["Quva", "Rishton", "Farg'ona", "Qo'qon"]
+EXPIRES = "2025-10-16T14:36:37.264637"
+
+
+def make_users(n: int) -> dict:
+    users = {}
+    for i in range(n):
+        profile = {
+            "name": f"Mijoz {i}",
+            "phone": f"+99890{i:07d}",
+            "regions": [REGIONS[i % 4], REGIONS[(i + 1) % 4]],
+            "last_region": REGIONS[i % 4],
+        }
+        if i % 3 == 0:
+            profile["trial_granted_at"] = EXPIRES
+            profile["trial_expires_at"] = EXPIRES
+        users[str(100_000_000 + i)] = profile
+    return users
+
+
+def timed_load(path: str, binary: bool) -> tuple[float, str, int]:
+    gc.collect()
+    backend = JsonProfileBackend(path, record_cls=Profile, binary_snapshot=binary)
+    started = time.perf_counter()
+    count = backend.count()
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed, backend.loaded_from, count
+
+
+def run(n: int, tmp: str) -> None:
+    path = os.path.join(tmp, f"users_{n}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(make_users(n), f, ensure_ascii=False, indent=2)
+
+    json_ms, _, count = timed_load(path, binary=False)
+    # Birinchi yuklash binar nusxani yaratadi, ikkinchisi undan o'qiydi
+    timed_load(path, binary=True)
+    bin_ms, source, bin_count = timed_load(path, binary=True)
+    assert source == "binary" and bin_count == count
+
+    json_mb = os.path.getsize(path) / 1024 / 1024
+    bin_mb = os.path.getsize(path + ".bin") / 1024 / 1024
+    print(
+        f"{n:>9}  json {json_ms:>8.1f} ms ({json_mb:6.1f} MiB)"
+        f"  binar {bin_ms:>8.1f} ms ({bin_mb:6.1f} MiB)  x{json_ms / bin_ms:.1f}"
+    )
+
+
+def main(sizes: list[int]) -> None:
+    tmp = tempfile.mkdtemp(prefix="eltiber-startup-")
+    try:
+        for n in sizes:
+            run(n, tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,131 @@
+"""
+Polling va webhook rejimlarini solishtirish: lokal soxta Telegram API
+(bench/fakeapi.py) orqali update yuboriladi, bot javobi (sendMessage) kelguncha
+vaqt o'lchanadi.
+
+    python bench/bench_webhook.py [N] [LATENCY_MS]
+
+1) kechikish — 100 ta /start, sekundiga 50 tadan (p50/p99);
+2) o'tkazuvchanlik — N ta /start bir vaqtda (standart 1000), update/s.
+Har bir update alohida foydalanuvchidan; OutboundLimiter ulanmagan (faqat transport).
+LATENCY_MS — soxta API javoblari va webhook yetkazish kechikishi (standart 0).
+"""
+import asyncio
+import itertools
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="eltiber-bench-")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ["RUNTIME_STATE_PATH"] = os.path.join(TMP, "runtime_state.bin")
+
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import bot  # noqa: E402
+from app.session import CachedMarkupSession  # noqa: E402
+from fakeapi import FakeTelegramAPI  # noqa: E402
+
+_users = itertools.count(700_000_000)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_batch(api: FakeTelegramAPI, count: int, rate: float | None) -> tuple[list[float], float]:
+    pushed: dict[int, float] = {}
+    replied: dict[int, float] = {}
+    done = asyncio.Event()
+
+    def on_call(method: str, params: dict, now: float) -> None:
+        if method != "sendMessage":
+            return
+        chat_id = int(params.get("chat_id") or 0)
+        if chat_id in pushed and chat_id not in replied:
+            replied[chat_id] = now
+            if len(replied) == count:
+                done.set()
+
+    api.listeners.append(on_call)
+    try:
+        started = time.perf_counter()
+        for _ in range(count):
+            uid = next(_users)
+            pushed[uid] = time.perf_counter()
+            api.push_update(api.text_update(uid, "/start"))
+            if rate:
+                await asyncio.sleep(1 / rate)
+        await asyncio.wait_for(done.wait(), timeout=60)
+    finally:
+        api.listeners.remove(on_call)
+    latencies = [(replied[uid] - pushed[uid]) * 1000 for uid in pushed]
+    return latencies, count / (max(replied.values()) - started)
+
+
+def report(mode: str, latencies: list[float], throughput: float) -> None:
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{mode:<8} kechikish p50 {p50:6.1f} ms  p99 {p99:6.1f} ms   o'tkazuvchanlik {throughput:7.0f} update/s")
+
+
+async def bench_polling(api: FakeTelegramAPI, n: int) -> None:
+    await bot.bot.delete_webhook()
+    task = asyncio.create_task(
+        bot.dp.start_polling(bot.bot, handle_signals=False, close_bot_session=False, polling_timeout=10)
+    )
+    await asyncio.sleep(0.2)
+    latencies, _ = await run_batch(api, 100, rate=50)
+    _, throughput = await run_batch(api, n, rate=None)
+    await bot.dp.stop_polling()
+    await task
+    report("polling", latencies, throughput)
+
+
+async def bench_webhook(api: FakeTelegramAPI, n: int) -> None:
+    port = _free_port()
+    runner = web.AppRunner(bot.build_webhook_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    await bot.bot.set_webhook(
+        url=f"http://127.0.0.1:{port}{bot.WEBHOOK_PATH}",
+        secret_token=bot.WEBHOOK_SECRET,
+        max_connections=bot.WEBHOOK_MAX_CONNECTIONS,
+    )
+    try:
+        latencies, _ = await run_batch(api, 100, rate=50)
+        _, throughput = await run_batch(api, n, rate=None)
+    finally:
+        await bot.bot.delete_webhook()
+        # runner.cleanup bot sessiyasini ham yopadi — u oxirida chaqiriladi
+        await runner.cleanup()
+    assert api.webhook_errors == 0, api.webhook_errors
+    report("webhook", latencies, throughput)
+
+
+async def main(n: int, latency_ms: float) -> None:
+    api = FakeTelegramAPI(bot.TOKEN, latency=latency_ms / 1000)
+    base = await api.start()
+    bot.bot.session = CachedMarkupSession(bot.keyboard_cache, api=TelegramAPIServer.from_base(base))
+    try:
+        await bench_polling(api, n)
+        await bench_webhook(api, n)
+    finally:
+        await bot.bot.session.close()
+        await api.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.0,
+    ))
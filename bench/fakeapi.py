@@ -0,0 +1,320 @@
+"""
+Telegram Bot API o'rniga lokal aiohttp server (benchmark va yuklama testlari uchun).
+
+    api = FakeTelegramAPI(TOKEN)
+    base = await api.start()          # http://127.0.0.1:PORT
+    session = AiohttpSession(api=TelegramAPIServer.from_base(base))
+    api.push_update({...})            # getUpdates yoki webhook orqali yetkaziladi
+
+Har bir chaqiruv `listeners` ga (method, params, vaqt) bilan uzatiladi.
+`latency` (+ tasodifiy `jitter`) — har bir API javobi va webhook yetkazishdan
+oldingi kutish (tarmoq RTT o'rniga); `rate_limit_p` — shu ehtimollik bilan 429
+(retry_after) qaytariladi.
+
+Bot yuborgan xabarlar chat bo'yicha `inbox(chat_id)` navbatiga tushadi —
+`FakeUser` shu orqali skript bo'yicha javob beradi (matn, kontakt, tugma bosish).
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Callable
+
+import aiohttp
+from aiohttp import web
+
+
+class FakeTelegramAPI:
+    # 429 qaytarilmaydigan xizmat metodlari
+    NEVER_LIMITED = frozenset({"getUpdates", "getMe", "setWebhook", "deleteWebhook"})
+
+    def __init__(
+        self,
+        token: str,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit_p: float = 0.0,
+        retry_after: int = 1,
+        seed: int | None = None,
+    ):
+        self.token = token
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_p = rate_limit_p
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.listeners: list[Callable[[str, dict, float], None]] = []
+        self.calls: dict[str, int] = {}
+        self.rate_limited = 0
+        self._inboxes: dict[int, asyncio.Queue] = {}
+
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1000)
+        self._updates: list[dict] = []
+        self._new_updates = asyncio.Event()
+        self._runner: web.AppRunner | None = None
+
+        self.webhook_url = ""
+        self.webhook_secret = ""
+        self._webhook_slots: asyncio.Semaphore | None = None
+        self._webhook_session: aiohttp.ClientSession | None = None
+        self._webhook_tasks: set[asyncio.Task] = set()
+        self.webhook_errors = 0
+
+    # ---------- server ----------
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self._dispatch)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self) -> None:
+        for task in list(self._webhook_tasks):
+            task.cancel()
+        if self._webhook_session is not None:
+            await self._webhook_session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _dispatch(self, request: web.Request) -> web.Response:
+        if request.match_info["token"] != self.token:
+            return web.json_response({"ok": False, "error_code": 401, "description": "Unauthorized"}, status=401)
+        method = request.match_info["method"]
+        params = dict(await request.post()) if request.can_read_body else {}
+        params.update(request.query)
+        self.calls[method] = self.calls.get(method, 0) + 1
+        now = time.perf_counter()
+        for listener in self.listeners:
+            listener(method, params, now)
+        if self.rate_limit_p and method not in self.NEVER_LIMITED and self.random.random() < self.rate_limit_p:
+            self.rate_limited += 1
+            await self._delay()
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        # kechikish handlerdan oldin: xabar qabul qiluvchiga bot javob olgan paytda yetadi
+        await self._delay()
+        handler = getattr(self, "_m_" + method, None)
+        result = await handler(params) if handler is not None else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _delay(self) -> None:
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    # ---------- update'lar ----------
+    def push_update(self, update: dict) -> int:
+        update = dict(update)
+        update["update_id"] = next(self._update_ids)
+        if self.webhook_url:
+            task = asyncio.create_task(self._deliver(update))
+            self._webhook_tasks.add(task)
+            task.add_done_callback(self._webhook_tasks.discard)
+        else:
+            self._updates.append(update)
+            self._new_updates.set()
+        return update["update_id"]
+
+    def text_update(self, user_id: int, text: str) -> dict:
+        user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        return {
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+                "from": user,
+                "text": text,
+                **({"entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]}
+                   if text.startswith("/") else {}),
+            }
+        }
+
+    async def _deliver(self, update: dict) -> None:
+        # Telegram kabi: bir vaqtda ko'pi bilan max_connections ta so'rov
+        async with self._webhook_slots:
+            await self._delay()
+            try:
+                async with self._webhook_session.post(
+                    self.webhook_url,
+                    data=json.dumps(update),
+                    headers={"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": self.webhook_secret},
+                ) as response:
+                    if response.status != 200:
+                        self.webhook_errors += 1
+            except aiohttp.ClientError:
+                self.webhook_errors += 1
+
+    def contact_update(self, user_id: int, phone: str) -> dict:
+        update = self.text_update(user_id, "")
+        message = update["message"]
+        del message["text"]
+        message["contact"] = {"phone_number": phone, "first_name": f"User{user_id}", "user_id": user_id}
+        return update
+
+    def callback_update(self, user_id: int, message: dict, data: str) -> dict:
+        return {
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "from": {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"},
+                "chat_instance": "fake",
+                "message": message["raw"],
+                "data": data,
+            }
+        }
+
+    # ---------- bot yuborgan xabarlar ----------
+    def inbox(self, chat_id: int) -> asyncio.Queue:
+        queue = self._inboxes.get(chat_id)
+        if queue is None:
+            queue = self._inboxes[chat_id] = asyncio.Queue()
+        return queue
+
+    def _deliver_to_chat(self, method: str, params: dict, raw: dict) -> None:
+        try:
+            markup = json.loads(params.get("reply_markup") or "null") or {}
+        except ValueError:
+            markup = {}
+        buttons = [
+            button.get("callback_data")
+            for row in markup.get("inline_keyboard") or ()
+            for button in row
+            if button.get("callback_data")
+        ]
+        self.inbox(raw["chat"]["id"]).put_nowait({
+            "method": method,
+            "text": params.get("text") or params.get("caption") or "",
+            "buttons": buttons,
+            "raw": raw,
+            "at": time.perf_counter(),
+        })
+
+    # ---------- metodlar ----------
+    def _message(self, params: dict, **extra: Any) -> dict:
+        chat_id = int(params.get("chat_id") or 0)
+        message_id = int(params.get("message_id") or 0) or next(self._message_ids)
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup", "title": "chat"},
+            **extra,
+        }
+
+    def _sent(self, method: str, params: dict, **extra: Any) -> dict:
+        raw = self._message(params, **extra)
+        self._deliver_to_chat(method, params, raw)
+        return raw
+
+    async def _m_getMe(self, params: dict) -> dict:
+        return {"id": 1, "is_bot": True, "first_name": "EltiBer", "username": "eltiber_fake_bot"}
+
+    async def _m_getUpdates(self, params: dict) -> list:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        if offset:
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _m_setWebhook(self, params: dict) -> bool:
+        self.webhook_url = params.get("url", "")
+        self.webhook_secret = params.get("secret_token", "")
+        self._webhook_slots = asyncio.Semaphore(int(params.get("max_connections") or 40))
+        if self._webhook_session is None:
+            self._webhook_session = aiohttp.ClientSession()
+        return True
+
+    async def _m_deleteWebhook(self, params: dict) -> bool:
+        self.webhook_url = ""
+        return True
+
+    async def _m_sendMessage(self, params: dict) -> dict:
+        return self._sent("sendMessage", params, text=params.get("text", ""))
+
+    async def _m_sendPhoto(self, params: dict) -> dict:
+        photo = {"file_id": f"photo{next(self._message_ids)}", "file_unique_id": "p", "width": 1, "height": 1}
+        return self._sent("sendPhoto", params, caption=params.get("caption", ""), photo=[photo])
+
+    async def _m_sendDocument(self, params: dict) -> dict:
+        document = {"file_id": f"doc{next(self._message_ids)}", "file_unique_id": "d"}
+        return self._sent("sendDocument", params, caption=params.get("caption", ""), document=document)
+
+    async def _m_copyMessage(self, params: dict) -> dict:
+        return {"message_id": self._sent("copyMessage", params)["message_id"]}
+
+    async def _m_editMessageText(self, params: dict) -> dict:
+        return self._sent("editMessageText", params, text=params.get("text", ""))
+
+    async def _m_editMessageCaption(self, params: dict) -> dict:
+        return self._sent("editMessageCaption", params, caption=params.get("caption", ""))
+
+    async def _m_editMessageReplyMarkup(self, params: dict) -> dict:
+        return self._sent("editMessageReplyMarkup", params, text="")
+
+    async def _m_createChatInviteLink(self, params: dict) -> dict:
+        return {
+            "invite_link": f"https://t.me/+fake{next(self._message_ids)}",
+            "creator": await self._m_getMe(params),
+            "creates_join_request": False,
+            "is_primary": False,
+            "is_revoked": False,
+            "name": params.get("name"),
+        }
+
+    # deleteMessage, banChatMember, unbanChatMember, answerCallbackQuery va
+    # qolganlari — standart javob (True)
+
+
+class FakeUser:
+    """Skriptli foydalanuvchi: update yuboradi va botning javobini kutadi."""
+
+    def __init__(self, api: FakeTelegramAPI, user_id: int, timeout: float = 30.0):
+        self.api = api
+        self.user_id = user_id
+        self.timeout = timeout
+        self.inbox = api.inbox(user_id)
+
+    def _drain(self) -> None:
+        while not self.inbox.empty():
+            self.inbox.get_nowait()
+
+    async def expect(self, predicate: Callable[[dict], bool] | None = None, timeout: float | None = None) -> dict:
+        """Shartga mos keladigan keyingi xabarni kutadi (qolganlari tashlab yuboriladi)."""
+        deadline = time.perf_counter() + (timeout or self.timeout)
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"user {self.user_id}: javob kelmadi")
+            message = await asyncio.wait_for(self.inbox.get(), remaining)
+            if predicate is None or predicate(message):
+                return message
+
+    async def say(self, text: str, expect: Callable[[dict], bool] | None = None) -> dict:
+        self._drain()
+        self.api.push_update(self.api.text_update(self.user_id, text))
+        return await self.expect(expect)
+
+    async def share_contact(self, phone: str, expect: Callable[[dict], bool] | None = None) -> dict:
+        self._drain()
+        self.api.push_update(self.api.contact_update(self.user_id, phone))
+        return await self.expect(expect)
+
+    def press(self, message: dict, data: str) -> None:
+        self.api.push_update(self.api.callback_update(self.user_id, message, data))
@@ -0,0 +1,200 @@
+"""
+Butun bot uchun yuklama testi: soxta Telegram API (bench/fakeapi.py) ustida
+N ta mijoz buyurtma beradi, M ta haydovchi guruhdan qabul qiladi.
+
+    python bench/loadtest.py [--customers 60] [--drivers 12] [--regions 6]
+                             [--latency-ms 40] [--jitter-ms 20] [--p429 0.01]
+                             [--ramp 5] [--no-limiter]
+
+Mijoz: kontakt -> "Buyurtma berish" -> hudud -> mashina -> qayerdan -> qayerga ->
+"Hozir" -> "Tasdiqlash" -> "haydovchi qabul qildi" xabarini kutadi.
+Haydovchilar oldindan obuna qilingan (profil + subscription), o'z hududi
+guruhidagi "Qabul qilish" tugmasini bosadi.
+
+Natija: buyurtma to'ldirish (kontaktdan tasdiqlash tugmasigacha), tasdiqlashdan
+qabulgacha va umumiy kechikish p50/p95/maks, buyurtma/s, 429 va xatolar soni.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+TMP = tempfile.mkdtemp(prefix="eltiber-load-")
+os.environ.setdefault("BOT_TOKEN", "123456:bench")
+os.environ["RUNTIME_STATE_PATH"] = os.path.join(TMP, "runtime_state.bin")
+
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+
+import bot  # noqa: E402
+from app.records import Profile, Subscription  # noqa: E402
+from app.session import InstrumentedSession  # noqa: E402
+from fakeapi import FakeTelegramAPI, FakeUser  # noqa: E402
+
+CUSTOMER_BASE = 710_000_000
+DRIVER_BASE = 720_000_000
+
+
+def has(fragment: str):
+    return lambda message: fragment in message["text"]
+
+
+def has_button(prefix: str):
+    return lambda message: any(data.startswith(prefix) for data in message["buttons"])
+
+
+async def customer(api: FakeTelegramAPI, uid: int, region: str, delay: float, results: list, errors: list) -> None:
+    await asyncio.sleep(delay)
+    user = FakeUser(api, uid)
+    step = "kontakt"
+    try:
+        started = time.perf_counter()
+        await user.share_contact(f"+99891{uid % 10_000_000:07d}", expect=has("menyudan"))
+        for step, text, expect in (
+            ("buyurtma", "🚖 Buyurtma berish", has("hudud")),
+            ("hudud", region, has("mashina")),
+            ("mashina", "Labo", has("qayerdan")),
+            ("qayerdan", "Quva bozori", has("qayerga")),
+            ("qayerga", "Rishton", has("vaqtga")),
+            ("vaqt", bot.HOZIR, has_button("draft_confirm_")),
+        ):
+            confirm = await user.say(text, expect=expect)
+        confirmed = time.perf_counter()
+        step = "qabul"
+        user.press(confirm, f"draft_confirm_{uid}")
+        await user.expect(has("qabul qildi"), timeout=120)
+        accepted = time.perf_counter()
+        results.append((confirmed - started, accepted - confirmed, accepted - started))
+    except asyncio.TimeoutError:
+        errors.append(f"mijoz {uid}: '{step}' bosqichida javob kelmadi")
+
+
+async def driver_pool(api: FakeTelegramAPI, region: str, driver_ids: list[int], accepted: list) -> None:
+    """Guruhdagi har bir yangi buyurtmani bo'sh haydovchilardan biri oladi."""
+    group = api.inbox(bot.get_order_chat_id(region))
+    idle: asyncio.Queue = asyncio.Queue()
+    for driver_id in driver_ids:
+        idle.put_nowait(FakeUser(api, driver_id))
+
+    async def take(message: dict, data: str) -> None:
+        driver = await idle.get()
+        try:
+            driver.press(message, data)
+            await driver.expect(has("biriktirildi"))
+            accepted.append(driver.user_id)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            idle.put_nowait(driver)
+
+    tasks = set()
+    while True:
+        message = await group.get()
+        data = next((d for d in message["buttons"] if d.startswith("accept_")), None)
+        if message["method"] == "sendMessage" and data:
+            task = asyncio.create_task(take(message, data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+
+def seed_drivers(regions: list[str], count: int) -> dict[str, list[int]]:
+    by_region = {region: [] for region in regions}
+    for i in range(count):
+        uid = DRIVER_BASE + i
+        region = regions[i % len(regions)]
+        bot.user_profiles[uid] = Profile(name=f"Haydovchi {i}", phone=f"+99893{i:07d}", regions=[region])
+        bot.subscriptions[uid] = Subscription(active=True, regions=[region], last_region=region)
+        bot.refresh_driver_regions(uid)
+        by_region[region].append(uid)
+    return by_region
+
+
+def describe(label: str, values: list[float]) -> str:
+    values = sorted(values)
+    p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+    return (
+        f"{label:<22} p50 {statistics.median(values) * 1000:8.0f} ms   p95 {p95 * 1000:8.0f} ms"
+        f"   maks {values[-1] * 1000:8.0f} ms"
+    )
+
+
+async def main(args) -> None:
+    api = FakeTelegramAPI(
+        bot.TOKEN,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        rate_limit_p=args.p429,
+        seed=1,
+    )
+    base = await api.start()
+    session = InstrumentedSession(bot.keyboard_cache, api=TelegramAPIServer.from_base(base))
+    if not args.no_limiter:
+        session.middleware(bot.outbound)
+    bot.bot.session = session
+    bot.profile_store.backend.path = os.path.join(TMP, "users.json")
+
+    regions = bot.REGION_NAMES[: args.regions]
+    drivers = seed_drivers(regions, args.drivers)
+    accepted: list[int] = []
+    pools = [asyncio.create_task(driver_pool(api, region, ids, accepted)) for region, ids in drivers.items() if ids]
+    polling = asyncio.create_task(
+        bot.dp.start_polling(bot.bot, handle_signals=False, close_bot_session=False, polling_timeout=10)
+    )
+
+    results: list = []
+    errors: list = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        customer(api, CUSTOMER_BASE + i, regions[i % len(regions)], args.ramp * i / args.customers, results, errors)
+        for i in range(args.customers)
+    ))
+    elapsed = time.perf_counter() - started
+
+    await bot.dp.stop_polling()
+    await polling
+    for task in pools:
+        task.cancel()
+    for customer_id in list(bot.orders):
+        bot.cancel_driver_reminders(customer_id)
+    # ishlayotgan handlerlar API yopilishidan oldin tugasin
+    pending = asyncio.all_tasks() - {asyncio.current_task()}
+    if pending:
+        await asyncio.wait(pending, timeout=5)
+
+    print(
+        f"{args.customers} mijoz, {args.drivers} haydovchi, {len(regions)} hudud; API {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms,"
+        f" 429 ehtimoli {args.p429}, limiter {'yo‘q' if args.no_limiter else 'bor'}"
+    )
+    if results:
+        print(describe("to'ldirish", [r[0] for r in results]))
+        print(describe("tasdiq -> qabul", [r[1] for r in results]))
+        print(describe("umumiy", [r[2] for r in results]))
+    print(f"bajarildi {len(results)}/{args.customers} ({len(results) / elapsed:.2f} buyurtma/s, {elapsed:.1f} s)")
+    st = session.stats()
+    print(
+        f"API so'rovlar: {sum(api.calls.values())}, 429: {api.rate_limited}"
+        f" (limiter qayta urindi: {bot.outbound.retry_after}), xatolar: {len(errors)}"
+    )
+    if st["errors"]:
+        print("sessiya xatolari:", st["errors"])
+    for line in errors[:5]:
+        print("  ", line)
+    await session.close()
+    await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=60)
+    parser.add_argument("--drivers", type=int, default=12)
+    parser.add_argument("--regions", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--p429", type=float, default=0.01)
+    parser.add_argument("--ramp", type=float, default=5.0, help="mijozlar shu soniya ichida navbatma-navbat boshlaydi")
+    parser.add_argument("--no-limiter", action="store_true")
+    asyncio.run(main(parser.parse_args()))
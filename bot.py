@@ -2,7 +2,7 @@ from aiogram import Bot, Dispatcher, types, F
 from aiogram.types import (
     ReplyKeyboardMarkup, KeyboardButton,
     InlineKeyboardMarkup, InlineKeyboardButton,
-    FSInputFile
+    FSInputFile, BufferedInputFile
 )
 # CopyTextButton yangi Telegram Bot API’da bor. Aiogram versiyangizda bo‘lmasa, fallback ishlaydi.
 try:
@@ -12,12 +12,38 @@ except Exception:
     SUPPORTS_COPY_TEXT = False
 
 from aiogram.filters import Command, CommandStart
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 import asyncio
 from datetime import datetime, timedelta, time as dtime
 import os
+import secrets
+import signal
+import time
 import json
 from typing import Any
 import csv
+
+from app.assets import AssetRegistry
+from app.broadcast import BroadcastEngine
+from app.fanout import fan_out, summarize
+from app.invites import InviteLinkPool
+from app.keyboards import KeyboardCache
+from app.looplag import LoopLagMonitor, SlowCallback
+from app.metrics import ApiMetrics, Counters, PrometheusText
+from app.profiler import capture as capture_profile
+from app.outbound import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    OutboundLimiter,
+    outbound_priority,
+)
+from app.records import Draft, Order, Profile, Subscription, TrialEntry
+from app.regions import RegionIndex, RegionMembership
+from app.session import InstrumentedSession
+from app.snapshot import StateSnapshotter, load_json_with_snapshot
+from app.storage import ProfileStore, open_backend
+from app.timers import TimerService
 # ================== SOZLAMALAR ==================
 def _load_env():
     env_path = os.path.join(BASE_DIR, '.env') if 'BASE_DIR' in globals() else '.env'
@@ -51,6 +77,70 @@ SUBSCRIPTION_PRICE = 99_000
 CARD_NUMBER_DISPLAY = CARD_NUMBER
 
 MAX_DRIVER_REGIONS = 7
+# regions.json o'zgarishini kuzatish oralig'i (soniya); 0 — faqat /reload_regions orqali
+REGIONS_WATCH_INTERVAL = float(os.getenv("REGIONS_WATCH_INTERVAL", "0"))
+# Qo'lda yozilgan hudud nomi uchun taxminiy moslash chegarasi (0..1, trigram o'xshashligi)
+REGION_FUZZY_THRESHOLD = float(os.getenv("REGION_FUZZY_THRESHOLD", "0.5"))
+# Chiquvchi so'rovlar limiti (Telegram: ~30 xabar/s umumiy, ~1/s chatga, 20/daqiqa guruhga)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GROUP_PER_MINUTE = float(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20"))
+OUTBOUND_GROUP_BURST = float(os.getenv("OUTBOUND_GROUP_BURST", "5"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+# Telegram API bilan HTTP ulanishlar: pul hajmi, keep-alive (s), DNS kesh (s), umumiy timeout (s)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "30"))
+HTTP_DNS_TTL = int(os.getenv("HTTP_DNS_TTL", "300"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+# Metod bo'yicha timeout: "sendPhoto=90,answerCallbackQuery=10" (getUpdates polling o'zi belgilaydi)
+HTTP_METHOD_TIMEOUTS = os.getenv("HTTP_METHOD_TIMEOUTS", "sendPhoto=90,sendDocument=120,answerCallbackQuery=10")
+
+
+def _parse_method_timeouts(raw: str) -> dict[str, float]:
+    result = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        try:
+            result[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return result
+
+
+# Update qabul qilish usuli: "polling" (getUpdates) yoki "webhook" (aiohttp server)
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+# Tashqaridan ko'rinadigan manzil, masalan https://bot.example.uz (WEBHOOK_PATH qo'shiladi)
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "").rstrip("/")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# Bo'sh bo'lsa har ishga tushishda tasodifiy secret yaratiladi (set_webhook bilan birga yuboriladi)
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "") or secrets.token_urlsafe(32)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+# Telegram bir vaqtda nechta parallel so'rov yuboradi (1..100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Prometheus /metrics endpointi (0 — o'chirilgan); standart faqat lokal interfeysda
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# /profile: eng uzun kuzatish (s) va stek namunalari oralig'i (ms)
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "10"))
+# Event loop kechikishi: o'lchash oralig'i (s; 0 — o'chirilgan), sekin callback chegarasi (ms),
+# adminlarga ogohlantirish: lag LOOP_LAG_ALERT_MS dan LOOP_LAG_ALERT_SECONDS davomida yuqori bo'lsa
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_SLOW_MS = float(os.getenv("LOOP_SLOW_MS", "100"))
+LOOP_LAG_ALERT_MS = float(os.getenv("LOOP_LAG_ALERT_MS", "500"))
+LOOP_LAG_ALERT_SECONDS = float(os.getenv("LOOP_LAG_ALERT_SECONDS", "30"))
+LOOP_LAG_ALERT_COOLDOWN = float(os.getenv("LOOP_LAG_ALERT_COOLDOWN", "900"))
+# Bot to'xtab turganda o'tib ketgan eslatma shu soniyadan kech bo'lsa yuborilmaydi
+REMINDER_MAX_LATENESS = float(os.getenv("REMINDER_MAX_LATENESS", "300"))
+# Bir vaqtda nechta trial muddati qayta ishlanadi (ko'pi birdan tugaganda)
+TRIAL_EXPIRY_CONCURRENCY = int(os.getenv("TRIAL_EXPIRY_CONCURRENCY", "5"))
+# Hududi hali aniqlanmagan (profil yuklanmagan va h.k.) trial shuncha soniyadan keyin qayta tekshiriladi
+TRIAL_EXPIRY_RETRY = float(os.getenv("TRIAL_EXPIRY_RETRY", "3600"))
+# To'xtashda navbatdagi guruh postlari shuncha soniya kutiladi; ulgurmaganlari
+# msg_id'siz saqlanadi va qayta ishga tushganda yana yuboriladi
+GROUP_POST_DRAIN_SECONDS = float(os.getenv("GROUP_POST_DRAIN_SECONDS", "5"))
 REGION_PRICING = {
     1: 99_000,
     2: 179_000,
@@ -60,9 +150,44 @@ REGION_PRICING = {
 }
 MAX_REGION_PRICING = 499_000
 
-bot = Bot(token=TOKEN)
+# Statik klaviaturalar va ularning JSON ko'rinishi bir marta quriladi
+keyboard_cache = KeyboardCache()
+# Umumiy HTTP sessiya: sozlangan ulanishlar puli + metodlar bo'yicha kechikish o'lchovi
+http_session = InstrumentedSession(
+    keyboard_cache,
+    pool_size=HTTP_POOL_SIZE,
+    keepalive=HTTP_KEEPALIVE,
+    dns_ttl=HTTP_DNS_TTL,
+    method_timeouts=_parse_method_timeouts(HTTP_METHOD_TIMEOUTS),
+    timeout=HTTP_TIMEOUT,
+)
+bot = Bot(token=TOKEN, session=http_session)
+# Barcha chiquvchi so'rovlar shu navbatdan o'tadi (token bucket + ustuvorlik + RetryAfter)
+outbound = OutboundLimiter(
+    global_rate=OUTBOUND_GLOBAL_RATE,
+    chat_rate=OUTBOUND_CHAT_RATE,
+    chat_burst=OUTBOUND_CHAT_BURST,
+    group_per_minute=OUTBOUND_GROUP_PER_MINUTE,
+    group_burst=OUTBOUND_GROUP_BURST,
+    max_retries=OUTBOUND_MAX_RETRIES,
+)
+bot.session.middleware(outbound)
 dp  = Dispatcher()
 
+# O'lchovlar: update turi va handler bo'yicha kechikish/xatolar, buyurtma voronkasi hisoblagichlari
+update_metrics = ApiMetrics()
+handler_metrics = ApiMetrics()
+business = Counters((
+    "drafts_started",
+    "orders_posted",
+    "orders_accepted",
+    "orders_completed",
+    "orders_cancelled",
+    "orders_reopened",
+    "payments_approved",
+))
+STARTED_AT = time.time()
+
 # ---- Assets papka (rasmlar loyiha ichida) ----
 BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
@@ -75,7 +200,38 @@ CONTACT_IMAGE_URL  = ""   # xohlasa zahira URL
 DATA_DIR = os.path.join(BASE_DIR, "data")
 USERS_JSON = os.path.join(DATA_DIR, "users.json")
 REGIONS_JSON = os.path.join(DATA_DIR, "regions.json")
-STORE_LOCK = asyncio.Lock()
+# Profil o'zgarishlari shu oraliqda bitta yozuvga jamlanadi (soniya)
+USERS_FLUSH_INTERVAL = float(os.getenv("USERS_FLUSH_INTERVAL", "2"))
+# Profil saqlash turi: "json" (users.json), "sqlite" (users.sqlite3, WAL)
+# yoki "journal" (users.json snapshot + users.journal). json/journal barcha
+# profillarni RAM'da to'liq ushlaydi (USERS_CACHE_SIZE ta'sir qilmaydi, RSS
+# foydalanuvchilar soni bilan o'sadi; fon preload tugaguncha birinchi murojaat
+# fayl o'qilishini kutadi). Xotira chegarasi kerak bo'lsa — "sqlite" (birinchi
+# ishga tushishda users.json'dan avtomatik ko'chiriladi)
+USERS_BACKEND = os.getenv("USERS_BACKEND", "json")
+USERS_DB = os.getenv("USERS_DB", os.path.join(DATA_DIR, "users.sqlite3"))
+USERS_JOURNAL = os.getenv("USERS_JOURNAL", os.path.join(DATA_DIR, "users.journal"))
+USERS_JOURNAL_MAX_BYTES = int(os.getenv("USERS_JOURNAL_MAX_BYTES", str(4 * 1024 * 1024)))
+# users.json yonida binar snapshot (users.json.bin) — tez ishga tushish uchun
+USERS_BINARY_SNAPSHOT = os.getenv("USERS_BINARY_SNAPSHOT", "1") not in ("0", "false", "no")
+# Profil keshi chegarasi (yozuvlar soni); SQLite backend'da ortiqchasi RAM'dan chiqariladi
+USERS_CACHE_SIZE = int(os.getenv("USERS_CACHE_SIZE", "50000"))
+# Buyurtmalar, obunalar, trial va h.k. RAM holati (qayta ishga tushishda tiklanadi)
+RUNTIME_STATE_PATH = os.getenv("RUNTIME_STATE_PATH", os.path.join(DATA_DIR, "runtime_state.bin"))
+RUNTIME_STATE_INTERVAL = float(os.getenv("RUNTIME_STATE_INTERVAL", "10"))
+# /broadcast: holat (checkpoint) fayli va parallel yuborishlar soni
+BROADCAST_STATE_PATH = os.getenv("BROADCAST_STATE_PATH", os.path.join(DATA_DIR, "broadcast.json"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+# Bir nechta hudud uchun invite/kick so'rovlari bir vaqtda nechta parallel ketadi
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "5"))
+# assets/* rasmlari uchun Telegram file_id keshi (fayl xeshi bo'yicha)
+ASSET_FILE_IDS_PATH = os.getenv("ASSET_FILE_IDS_PATH", os.path.join(DATA_DIR, "assets.json"))
+assets = AssetRegistry(ASSET_FILE_IDS_PATH)
+# Har bir haydovchilar guruhi uchun oldindan yaratib qo'yiladigan bir martalik silkalar
+INVITE_POOL_SIZE = int(os.getenv("INVITE_POOL_SIZE", "3"))
+INVITE_POOL_TTL_HOURS = float(os.getenv("INVITE_POOL_TTL_HOURS", "168"))
+# Haydovchiga berilgan silka kamida shuncha soat amal qiladi
+INVITE_POOL_MIN_HOURS = float(os.getenv("INVITE_POOL_MIN_HOURS", "120"))
 
 def _ensure_data_dir():
     try:
@@ -90,20 +246,6 @@ def _load_json(path: str, default: Any):
     except Exception:
         return default
 
-async def _save_json(path: str, data: Any):
-    _ensure_data_dir()
-    tmp = path + ".tmp"
-    try:
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, path)
-    except Exception:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
-
-
 def _ensure_regions_template() -> None:
     if os.path.exists(REGIONS_JSON):
         return
@@ -123,15 +265,21 @@ def _ensure_regions_template() -> None:
         pass
 
 
-def _load_regions_config() -> dict[str, dict[str, int]]:
-    data = _load_json(REGIONS_JSON, None)
+def _load_regions_config() -> dict[str, dict[str, Any]]:
+    data = load_json_with_snapshot(REGIONS_JSON, None, kind="regions")
     if not data:
         _ensure_regions_template()
         raise RuntimeError(
             f"regions.json fayli topilmadi yoki bo'sh. Iltimos, {REGIONS_JSON} ichida hudud nomlari va guruh IDlarini kiriting."
         )
+    return _parse_regions_config(data)
 
-    regions: dict[str, dict[str, int]] = {}
+
+def _parse_regions_config(data) -> dict[str, dict[str, Any]]:
+    if not isinstance(data, list):
+        raise RuntimeError("regions.json ro'yxat (list) bo'lishi kerak.")
+
+    regions: dict[str, dict[str, Any]] = {}
     for entry in data:
         if not isinstance(entry, dict):
             continue
@@ -154,9 +302,14 @@ def _load_regions_config() -> dict[str, dict[str, int]]:
         if driver_chat == 0:
             driver_chat = order_chat
 
+        aliases = entry.get("aliases") or []
+        if isinstance(aliases, str):
+            aliases = [aliases]
+
         regions[name] = {
             "order_chat_id": order_chat,
             "driver_chat_id": driver_chat,
+            "aliases": [str(alias) for alias in aliases if alias],
         }
 
     if not regions:
@@ -166,25 +319,53 @@ def _load_regions_config() -> dict[str, dict[str, int]]:
     return regions
 
 
-REGIONS = _load_regions_config()
-REGION_NAMES = list(REGIONS.keys())
-ORDER_CHAT_IDS = {name: cfg["order_chat_id"] for name, cfg in REGIONS.items()}
-DRIVER_CHAT_IDS = {
-    name: (cfg.get("driver_chat_id") or cfg["order_chat_id"])
-    for name, cfg in REGIONS.items()
-}
-DRIVER_CHAT_ID_SET = set(DRIVER_CHAT_IDS.values())
-DRIVER_CHAT_ID_TO_REGION = {chat_id: name for name, chat_id in DRIVER_CHAT_IDS.items()}
+def build_region_tables(regions: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """regions.json'dan hosil bo'ladigan barcha jadvallar (modul global nomlari bilan)."""
+    driver_chat_ids = {
+        name: (cfg.get("driver_chat_id") or cfg["order_chat_id"])
+        for name, cfg in regions.items()
+    }
+    names = list(regions.keys())
+    return {
+        "REGIONS": regions,
+        "REGION_NAMES": names,
+        "ORDER_CHAT_IDS": {name: cfg["order_chat_id"] for name, cfg in regions.items()},
+        "DRIVER_CHAT_IDS": driver_chat_ids,
+        "DRIVER_CHAT_ID_SET": set(driver_chat_ids.values()),
+        "DRIVER_CHAT_ID_TO_REGION": {chat_id: name for name, chat_id in driver_chat_ids.items()},
+        "REGION_INDEX": RegionIndex(
+            names,
+            aliases={name: cfg.get("aliases") or [] for name, cfg in regions.items()},
+            fuzzy_threshold=REGION_FUZZY_THRESHOLD,
+        ),
+    }
+
+
+def install_region_tables(tables: dict[str, Any]) -> None:
+    # Bitta sinxron blok: loop'dagi handlerlar hech qachon yarim yangilangan jadvallarni ko'rmaydi
+    globals().update(tables)
 
 
-def resolve_region_name(value: str | None) -> str | None:
-    if not value:
+def _regions_file_signature() -> tuple[int, int] | None:
+    try:
+        st = os.stat(REGIONS_JSON)
+    except OSError:
         return None
-    needle = value.strip().lower()
-    for name in REGION_NAMES:
-        if needle == name.lower():
-            return name
-    return None
+    return st.st_mtime_ns, st.st_size
+
+
+# regions.json o'zgarganini aniqlash uchun (mtime_ns, hajm) — o'qishdan oldin olinadi
+_regions_file_sig = _regions_file_signature()
+REGIONS = _load_regions_config()
+install_region_tables(build_region_tables(REGIONS))
+
+
+def resolve_region_name(value: str | None, fuzzy: bool = False) -> str | None:
+    """
+    Hudud nomini kanonik shaklga keltiradi (apostrof/kirill/alias farqlari
+    hisobga olinadi). `fuzzy=True` — foydalanuvchi qo'lda yozgan matn uchun.
+    """
+    return REGION_INDEX.lookup(value, fuzzy=fuzzy)
 
 
 def normalize_region_list(values) -> list[str]:
@@ -218,6 +399,8 @@ def get_profile_regions(uid: int) -> list[str]:
 def set_profile_regions(uid: int, regions) -> list[str]:
     normalized = normalize_region_list(regions)
     profile = user_profiles.setdefault(uid, {})
+    if (profile.get("regions") or []) != normalized or "region" in profile:
+        mark_user_dirty(uid)
     if normalized:
         profile["regions"] = normalized
         profile["last_region"] = normalized[-1]
@@ -225,6 +408,8 @@ def set_profile_regions(uid: int, regions) -> list[str]:
         profile.pop("regions", None)
         profile.pop("last_region", None)
     profile.pop("region", None)
+    profile_regions_index.assign(uid, normalized)
+    refresh_driver_regions(uid)
     return normalized
 
 
@@ -236,10 +421,21 @@ def add_profile_regions(uid: int, regions) -> list[str]:
     return set_profile_regions(uid, current)
 
 
-def _normalize_existing_regions() -> None:
-    for uid in list(user_profiles.keys()):
-        set_profile_regions(uid, get_profile_regions(uid))
+def _normalize_loaded_profile(uid, profile: dict) -> bool:
+    # Profil keshga yuklanganda bir marta chaqiriladi (set_profile_regions bilan bir xil qoida)
+    before = (profile.get("regions"), profile.get("last_region"), "region" in profile)
+    normalized = normalize_region_list(profile.get("regions") or profile.get("region"))
+    if normalized:
+        profile["regions"] = normalized
+        profile["last_region"] = normalized[-1]
+    else:
+        profile.pop("regions", None)
+        profile.pop("last_region", None)
+    profile.pop("region", None)
+    return before != (profile.get("regions"), profile.get("last_region"), False)
 
+
+def _normalize_existing_regions() -> None:
     for uid, data in list(subscriptions.items()):
         regions = data.get("regions") or data.get("region")
         normalized = normalize_region_list(regions)
@@ -287,15 +483,52 @@ def get_driver_chat_id(region: str) -> int:
     return DRIVER_CHAT_IDS[region]
 
 
+async def _create_pooled_invite(chat_id: int, expire_date: int) -> str:
+    region = DRIVER_CHAT_ID_TO_REGION.get(chat_id, chat_id)
+    invite = await bot.create_chat_invite_link(
+        chat_id=chat_id,
+        name=f"pool-{region}-{int(time.time())}",
+        member_limit=1,
+        expire_date=expire_date,
+    )
+    return invite.invite_link
+
+
+async def _revoke_pooled_invite(chat_id: int, invite_link: str) -> None:
+    await bot.revoke_chat_invite_link(chat_id=chat_id, invite_link=invite_link)
+
+
+# Tasdiqlash paytida create_chat_invite_link kutilmasligi uchun silkalar zaxirasi
+invite_pool = InviteLinkPool(
+    _create_pooled_invite,
+    _revoke_pooled_invite,
+    size=INVITE_POOL_SIZE,
+    ttl=INVITE_POOL_TTL_HOURS * 3600,
+    min_lifetime=INVITE_POOL_MIN_HOURS * 3600,
+    on_change=lambda: runtime_state.mark_dirty("invite_pool"),
+)
+invite_pool.set_chats(DRIVER_CHAT_IDS.values())
+
+# Eslatmalar uchun yagona taymer navbati (heap + bitta kutuvchi vazifa), runtime snapshot'da saqlanadi
+timer_service = TimerService(on_change=lambda: runtime_state.mark_dirty("timers"))
+
+
 async def send_region_invite(uid: int, region: str, header_text: str) -> bool:
     chat_id = get_driver_chat_id(region)
     try:
-        invite = await bot.create_chat_invite_link(
-            chat_id=chat_id,
-            name=f"driver-{region}-{uid}-{int(datetime.now().timestamp())}",
-            member_limit=1,
-        )
-        invite_link = invite.invite_link
+        invite_link = invite_pool.take(chat_id)
+        if invite_link is not None:
+            # member_limit=1 silka haydovchiga yetib borishidan oldin snapshot'dan
+            # chiqariladi — crash'dan keyin restore uni ikkinchi haydovchiga bermaydi
+            await runtime_state.save()
+        else:
+            # Zaxira bo'sh (yoki o'chirilgan) — eski usulda darhol yaratamiz
+            invite = await bot.create_chat_invite_link(
+                chat_id=chat_id,
+                name=f"driver-{region}-{uid}-{int(datetime.now().timestamp())}",
+                member_limit=1,
+            )
+            invite_link = invite.invite_link
     except Exception as exc:
         for admin in ADMIN_IDS:
             try:
@@ -338,12 +571,33 @@ async def send_region_invite(uid: int, region: str, header_text: str) -> bool:
             "chat_id": chat_id,
             "region": region,
         }
+        runtime_state.mark_dirty("pending_invites")
+        refresh_driver_regions(uid)
         return True
     except Exception:
         return False
 
 
-def resolve_driver_regions(driver_id: int) -> list[str]:
+async def send_region_invites(uid: int, regions: list[str], header_for) -> list:
+    """Har bir hudud uchun send_region_invite (parallel); natijalar hududlar tartibida."""
+    return await fan_out(
+        lambda region: send_region_invite(uid, region, header_for(region)),
+        regions,
+        limit=FANOUT_CONCURRENCY,
+    )
+
+
+def payment_confirmed_text(region: str) -> str:
+    return (
+        "✅ <b>To‘lov tasdiqlandi.</b>\n\n"
+        f"📍 <b>Hudud:</b> {region}\n"
+        "Quyidagi tugma orqali haydovchilar guruhiga qo‘shiling. "
+        "Guruhga qo‘shilgandan so‘ng bu xabar avtomatik o‘chiriladi."
+    )
+
+
+def _driver_regions_from_sources(driver_id: int, profile=None) -> list[str]:
+    # Haqiqat manbai: beshta dict birlashmasi. Indeks shu funksiya natijasini saqlaydi.
     regions: list[str] = []
 
     def _extend(source) -> None:
@@ -363,7 +617,8 @@ def resolve_driver_regions(driver_id: int) -> list[str]:
         _extend(sub.get("region"))
         _extend(sub.get("last_region"))
 
-    profile = user_profiles.get(driver_id)
+    if profile is None:
+        profile = user_profiles.get(driver_id)
     if profile:
         _extend(profile.get("regions"))
         _extend(profile.get("region"))
@@ -387,22 +642,115 @@ def resolve_driver_regions(driver_id: int) -> list[str]:
 
     return regions[:MAX_DRIVER_REGIONS]
 
+
+def _profile_regions_of(profile) -> list[str]:
+    if not profile:
+        return []
+    return normalize_region_list(profile.get("regions") or profile.get("region"))
+
+
+# haydovchi <-> hududlar (resolve_driver_regions natijasi) va profildagi hududlar (/stats)
+driver_regions_index = RegionMembership()
+profile_regions_index = RegionMembership()
+
+
+def resolve_driver_regions(driver_id: int) -> list[str]:
+    if driver_regions_index.ready:
+        regions = driver_regions_index.get(driver_id)
+        return list(regions) if regions else []
+    return _driver_regions_from_sources(driver_id)
+
+
+def refresh_driver_regions(uid: int) -> None:
+    """Manba dict'lardan biri o'zgarganda chaqiriladi."""
+    driver_regions_index.assign(uid, _driver_regions_from_sources(uid))
+
+
+def drivers_in_region(region: str) -> set[int]:
+    return driver_regions_index.members(region)
+
+
+async def _scan_region_sources() -> tuple[dict, dict]:
+    profiles = await asyncio.to_thread(lambda: list(user_profiles.items()))
+    drivers: dict[int, list[str]] = {}
+    by_profile: dict[int, list[str]] = {}
+    for pos, (uid, profile) in enumerate(profiles, 1):
+        by_profile[uid] = _profile_regions_of(profile)
+        drivers[uid] = _driver_regions_from_sources(uid, profile)
+        if pos % 5000 == 0:
+            # Katta bazada loop'ni uzoq band qilmaslik uchun
+            await asyncio.sleep(0)
+    for source in (driver_onboarding, subscriptions, trial_members, pending_invites):
+        for uid in list(source):
+            if uid not in drivers:
+                drivers[uid] = _driver_regions_from_sources(uid)
+    return drivers, by_profile
+
+
+async def rebuild_region_indexes() -> None:
+    started = time.perf_counter()
+    driver_regions_index.begin_rebuild()
+    profile_regions_index.begin_rebuild()
+    try:
+        drivers, by_profile = await _scan_region_sources()
+    except Exception:
+        driver_regions_index.abort_rebuild()
+        profile_regions_index.abort_rebuild()
+        raise
+    elapsed = (time.perf_counter() - started) * 1000
+    driver_regions_index.finish_rebuild(drivers, elapsed)
+    profile_regions_index.finish_rebuild(by_profile, elapsed)
+
+
+async def verify_region_indexes(repair: bool = False) -> dict[str, list[int]]:
+    """Indekslarni manba dict'lardan qayta hisoblab solishtiradi; `repair` — farqlarni tuzatadi."""
+    drivers, by_profile = await _scan_region_sources()
+    result: dict[str, list[int]] = {}
+    checks = (
+        ("drivers", driver_regions_index, drivers, _driver_regions_from_sources),
+        ("profiles", profile_regions_index, by_profile, lambda uid: _profile_regions_of(user_profiles.get(uid))),
+    )
+    for name, index, expected, live in checks:
+        mismatched = []
+        for uid in index.diff(expected):
+            # Skan davomida o'zgargan bo'lishi mumkin — jonli holat bilan qayta tekshiramiz
+            current = tuple(live(uid))
+            if (index.get(uid) or ()) != current:
+                mismatched.append(uid)
+                if repair:
+                    index.assign(uid, current)
+        result[name] = mismatched
+    return result
+
+profile_store = ProfileStore(
+    open_backend(
+        USERS_BACKEND,
+        USERS_JSON,
+        USERS_DB,
+        journal_path=USERS_JOURNAL,
+        journal_compact_bytes=USERS_JOURNAL_MAX_BYTES,
+        record_cls=Profile,
+        binary_snapshot=USERS_BINARY_SNAPSHOT,
+    ),
+    interval=USERS_FLUSH_INTERVAL,
+    cache_size=USERS_CACHE_SIZE,
+    on_load=_normalize_loaded_profile,
+    factory=Profile.from_dict,
+)
+
+
 def load_users_from_disk() -> dict:
-    raw = _load_json(USERS_JSON, {})
-    fixed = {}
-    # JSON kalitlari string bo'lib keladi -> int'ga aylantiramiz
-    for k, v in (raw or {}).items():
-        try:
-            ik = int(k)
-        except (ValueError, TypeError):
-            ik = k
-        fixed[ik] = v
-    return fixed
+    return profile_store.load()
+
+
+def mark_user_dirty(uid: int) -> None:
+    profile_store.mark_dirty(uid)
 
-async def save_users_to_disk(users: dict):
-    async with STORE_LOCK:
-        # Diskka yozishda kalitlarni string ko'rinishida saqlash — normal
-        await _save_json(USERS_JSON, {str(k): v for k, v in (users or {}).items()})
+
+async def save_users_to_disk(users: dict | None = None):
+    # Majburiy yozish: hamma profillarni darhol diskka chiqaradi
+    profile_store.mark_all_dirty()
+    await profile_store.flush()
 
 # ================== XOTIRA (RAM) ==================
 user_profiles = load_users_from_disk()
@@ -453,7 +801,14 @@ def rows_from_list(items, per_row=3):
     return [list(map(lambda t: KeyboardButton(text=t), items[i:i+per_row])) for i in range(0, len(items), per_row)]
 
 def keyboard_with_back_cancel(options, per_row=3, show_back=True):
-    rows = rows_from_list(options or [], per_row=per_row)
+    options = tuple(options or ())
+    return keyboard_cache.get(
+        ("back_cancel", options, per_row, bool(show_back)),
+        lambda: _build_back_cancel_keyboard(options, per_row, show_back),
+    )
+
+def _build_back_cancel_keyboard(options, per_row=3, show_back=True):
+    rows = rows_from_list(list(options or []), per_row=per_row)
     tail = []
     if show_back: tail.append(KeyboardButton(text=BACK))
     tail.append(KeyboardButton(text=CANCEL))
@@ -462,11 +817,28 @@ def keyboard_with_back_cancel(options, per_row=3, show_back=True):
 
 
 def region_keyboard(show_back: bool = False) -> ReplyKeyboardMarkup:
-    return keyboard_with_back_cancel(REGION_NAMES, per_row=3, show_back=show_back)
+    key = ("order", bool(show_back))
+    return keyboard_cache.get(("region",) + key, lambda: REGION_KEYBOARDS[key])
 
 
 def driver_region_keyboard(include_back: bool) -> ReplyKeyboardMarkup:
-    rows = rows_from_list(REGION_NAMES, per_row=3)
+    key = ("driver", bool(include_back))
+    return keyboard_cache.get(("region",) + key, lambda: REGION_KEYBOARDS[key])
+
+
+def build_region_keyboards(names: list[str]) -> dict[tuple[str, bool], ReplyKeyboardMarkup]:
+    """Hudud klaviaturalari bir marta quriladi (regions.json qayta yuklanganda — yangidan)."""
+    return {
+        ("order", flag): _build_back_cancel_keyboard(names, per_row=3, show_back=flag)
+        for flag in (False, True)
+    } | {
+        ("driver", flag): _build_driver_region_keyboard(names, flag)
+        for flag in (False, True)
+    }
+
+
+def _build_driver_region_keyboard(names: list[str], include_back: bool) -> ReplyKeyboardMarkup:
+    rows = rows_from_list(names, per_row=3)
     rows.append([KeyboardButton(text=REGION_DONE)])
     rows.append([KeyboardButton(text=REGION_CLEAR)])
     control_row = []
@@ -476,47 +848,65 @@ def driver_region_keyboard(include_back: bool) -> ReplyKeyboardMarkup:
     rows.append(control_row)
     return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
 
+
+REGION_KEYBOARDS = build_region_keyboards(REGION_NAMES)
+
 def vehicle_keyboard():
     VEHICLES = ["🛻 Labo", "🚚 Labodan Kattaroq"]
     return keyboard_with_back_cancel(VEHICLES, per_row=1, show_back=False)
 
 def contact_keyboard(text="📲 Telefon raqamni yuborish"):
-    return ReplyKeyboardMarkup(
+    return keyboard_cache.get(("contact", text), lambda: ReplyKeyboardMarkup(
         keyboard=[[KeyboardButton(text=text, request_contact=True)]],
         resize_keyboard=True
-    )
+    ))
 
 def share_phone_keyboard():
-    return ReplyKeyboardMarkup(
+    return keyboard_cache.get("share_phone", lambda: ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📲 Telefon raqamini ulashish", request_contact=True)],
             [KeyboardButton(text=BACK), KeyboardButton(text=CANCEL)]
         ],
         resize_keyboard=True
-    )
+    ))
 
 def pickup_keyboard():
-    return ReplyKeyboardMarkup(
+    return keyboard_cache.get("pickup", lambda: ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="📍 Lokatsiyani yuborish", request_location=True)],
             [KeyboardButton(text=BACK), KeyboardButton(text=CANCEL)]
         ],
         resize_keyboard=True
-    )
+    ))
 
 def order_keyboard():
-    return ReplyKeyboardMarkup(
+    return keyboard_cache.get("order", lambda: ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text="🚖 Buyurtma berish")],
             [KeyboardButton(text=DRIVER_BTN)],
             [KeyboardButton(text=CONTACT_BTN)],
         ],
         resize_keyboard=True
-    )
+    ))
 
 def when_keyboard():
     return keyboard_with_back_cancel([HOZIR, BOSHQA], per_row=2, show_back=True)
 
+def payment_keyboard():
+    # To'lov xabaridagi tugmalar: karta raqamini nusxalash (mavjud bo'lsa) + chek yuborish
+    def build():
+        rows = []
+        if SUPPORTS_COPY_TEXT:
+            rows.append([
+                InlineKeyboardButton(
+                    text="📋 Karta raqamini nusxalash",
+                    copy_text=CopyTextButton(text=CARD_NUMBER_DISPLAY)
+                )
+            ])
+        rows.append([InlineKeyboardButton(text="📤 Chekni yuborish", callback_data="send_check")])
+        return InlineKeyboardMarkup(inline_keyboard=rows)
+    return keyboard_cache.get("payment", build)
+
 # ================== START ==================
 @dp.message(CommandStart())
 async def start_command(message: types.Message):
@@ -524,10 +914,7 @@ async def start_command(message: types.Message):
     profile = user_profiles.get(uid)
 
     if not profile or not profile.get("phone"):
-        kb = ReplyKeyboardMarkup(
-            keyboard=[[KeyboardButton(text="📞 Telefon raqamingizni yuboring", request_contact=True)]],
-            resize_keyboard=True
-        )
+        kb = contact_keyboard("📞 Telefon raqamingizni yuboring")
         await message.answer(
             f"Salom, {message.from_user.full_name}! 👋\n"
             "Iltimos, bir marta telefon raqamingizni yuboring:",
@@ -546,11 +933,12 @@ async def contact_received(message: types.Message):
     profile = user_profiles.get(uid, {})
     profile.update({"name": message.from_user.full_name, "phone": phone})
     user_profiles[uid] = profile
-    await save_users_to_disk(user_profiles)
+    mark_user_dirty(uid)
 
     # Onboardingning phone bosqichida bo'lsa — driver_onboarding ichiga ham yozib qo'yamiz
     if uid in driver_onboarding and driver_onboarding[uid].get("stage") == "phone":
         driver_onboarding[uid]["phone"] = phone
+        runtime_state.mark_dirty("driver_onboarding")
         await after_phone_collected(uid, message)
         return
 
@@ -565,13 +953,16 @@ async def contact_us(message: types.Message):
         f"• Telefon: <a href=\"tel:{CONTACT_PHONE_LINK}\">{CONTACT_PHONE}</a>\n"
         f"• Telegram: @{CONTACT_TG}"
     )
-    ikb = InlineKeyboardMarkup(inline_keyboard=[
+    ikb = keyboard_cache.get("contact_us", lambda: InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✉️ Telegramga yozish", url=f"https://t.me/{CONTACT_TG}")]
-    ])
+    ]))
     sent = False
-    if CONTACT_IMAGE_PATH and os.path.exists(CONTACT_IMAGE_PATH):
+    if CONTACT_IMAGE_PATH:
         try:
-            await message.answer_photo(photo=FSInputFile(CONTACT_IMAGE_PATH), caption=caption, parse_mode="HTML", reply_markup=ikb)
+            await assets.send(
+                CONTACT_IMAGE_PATH,
+                lambda photo: message.answer_photo(photo=photo, caption=caption, parse_mode="HTML", reply_markup=ikb),
+            )
             sent = True
         except Exception:
             sent = False
@@ -601,15 +992,17 @@ async def prompt_order_flow(message: types.Message):
         await message.answer("Iltimos, telefon raqamingizni yuboring 📞", reply_markup=contact_keyboard())
         return
 
-    drafts[uid] = {
-        "stage": "region",
-        "region": None,
-        "chat_id": None,
-        "vehicle": None,
-        "from": None,
-        "to": None,
-        "when": None,
-    }
+    drafts[uid] = Draft(
+        stage="region",
+        region=None,
+        chat_id=None,
+        vehicle=None,
+        from_=None,
+        to=None,
+        when=None,
+    )
+    runtime_state.mark_dirty("drafts")
+    business.inc("drafts_started")
     await message.answer(
         "📍 Qaysi hudud uchun buyurtma berasiz?",
         reply_markup=region_keyboard(show_back=False)
@@ -623,6 +1016,8 @@ async def cancel_flow(message: types.Message):
         await remove_confirm_message(uid, draft)
     drafts.pop(uid, None)
     driver_onboarding.pop(uid, None)
+    runtime_state.mark_dirty("drafts", "driver_onboarding")
+    refresh_driver_regions(uid)
     await message.answer("❌ Bekor qilindi.", reply_markup=order_keyboard())
 
 # ================== HAYDOVCHI BO‘LISH (ESLATMA + ROZIMAN) ==================
@@ -631,13 +1026,14 @@ async def haydovchi_bolish(message: types.Message):
     uid = message.from_user.id
     drafts.pop(uid, None)
     driver_onboarding.pop(uid, None)
+    runtime_state.mark_dirty("drafts", "driver_onboarding")
+    refresh_driver_regions(uid)
 
-    if ESLATMA_IMAGE_PATH and os.path.exists(ESLATMA_IMAGE_PATH):
+    if ESLATMA_IMAGE_PATH:
         try:
-            await message.answer_photo(
-                photo=FSInputFile(ESLATMA_IMAGE_PATH),
-                caption="🔔 <b>ESLATMA</b>",
-                parse_mode="HTML"
+            await assets.send(
+                ESLATMA_IMAGE_PATH,
+                lambda photo: message.answer_photo(photo=photo, caption="🔔 <b>ESLATMA</b>", parse_mode="HTML"),
             )
         except Exception:
             pass
@@ -652,9 +1048,9 @@ async def haydovchi_bolish(message: types.Message):
         "2) <b>EltiBer ma’muriyati</b> narx, to‘lov va yetkazish jarayoniga <b>aralashmaydi</b> va <b>javobgar emas</b>.\n"
         "3) Borolmasangiz — darhol mijozga xabar bering va bekor qiling.\n\n"
     )
-    ikb = InlineKeyboardMarkup(inline_keyboard=[
+    ikb = keyboard_cache.get("driver_agree", lambda: InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✅ Shartlarga roziman", callback_data="driver_agree")]
-    ])
+    ]))
     await message.answer(req_text, parse_mode="HTML", reply_markup=ikb)
 
 @dp.callback_query(F.data == "driver_agree")
@@ -668,6 +1064,8 @@ async def driver_agree_cb(callback: types.CallbackQuery):
         "car_plate": None,
         "phone": None,
     }
+    runtime_state.mark_dirty("driver_onboarding")
+    refresh_driver_regions(uid)
     await callback.message.answer(
         "📍 Qaysi hududlar uchun haydovchi bo‘lasiz?\n"
         "Bir nechta hududni ketma-ket tanlang. Tanlash tugagach “✅ Tanlash tugadi” tugmasini bosing."
@@ -677,7 +1075,8 @@ async def driver_agree_cb(callback: types.CallbackQuery):
     await callback.answer()
 
 # ================== ONBOARDING MATN KOLLEKTORI ==================
-@dp.message(F.text)
+# "/..." buyruqlari (admin komandalari) pastdagi Command handlerlarga yetib borishi uchun
+@dp.message(F.text, ~F.text.startswith("/"))
 async def onboarding_or_order_text(message: types.Message):
     uid = message.from_user.id
     txt = (message.text or "").strip()
@@ -687,6 +1086,8 @@ async def onboarding_or_order_text(message: types.Message):
         return
 
     if uid in driver_onboarding:
+        # Quyidagi bosqichlarning deyarli hammasi onboarding holatini o'zgartiradi
+        runtime_state.mark_dirty("driver_onboarding")
         st = driver_onboarding[uid].get("stage")
 
         if st == "regions":
@@ -714,6 +1115,7 @@ async def onboarding_or_order_text(message: types.Message):
                 return
             if txt == REGION_CLEAR:
                 driver_onboarding[uid]["regions"] = []
+                refresh_driver_regions(uid)
                 await message.answer(
                     "✅ Tanlov tozalandi.\n"
                     "Tanlangan hududlar: <b>—</b>\n"
@@ -723,7 +1125,7 @@ async def onboarding_or_order_text(message: types.Message):
                 )
                 return
 
-            selected = resolve_region_name(txt)
+            selected = resolve_region_name(txt, fuzzy=True)
             if not selected:
                 await message.answer(
                     "❗️ Iltimos, hududni tugmalar yordamida tanlang.",
@@ -741,6 +1143,7 @@ async def onboarding_or_order_text(message: types.Message):
 
             if selected in regions_list:
                 regions_list.remove(selected)
+                refresh_driver_regions(uid)
                 price_txt = format_price(compute_subscription_price(len(regions_list)))
                 await message.answer(
                     f"ℹ️ <b>{selected}</b> hududi tanlovdan olib tashlandi."
@@ -757,6 +1160,7 @@ async def onboarding_or_order_text(message: types.Message):
                 return
 
             regions_list.append(selected)
+            refresh_driver_regions(uid)
             price_txt = format_price(compute_subscription_price(len(regions_list)))
             await message.answer(
                 "✅ Hudud qo‘shildi: <b>{selected}</b>\n"
@@ -822,12 +1226,15 @@ async def _send_trial_invites(uid: int, regions: list[str]):
     profile["trial_granted_at"] = granted_at.isoformat()
     profile["trial_expires_at"] = expires_at.isoformat()
     add_profile_regions(uid, regions)
-    await save_users_to_disk(user_profiles)
+    mark_user_dirty(uid)
 
-    entry = trial_members.setdefault(uid, {"expires_at": expires_at, "regions": []})
+    entry = trial_members.setdefault(uid, TrialEntry(expires_at=expires_at, regions=[]))
     entry["expires_at"] = expires_at
     entry["regions"] = [trial_region]
     entry["last_region"] = trial_region
+    runtime_state.mark_dirty("trial_members")
+    refresh_driver_regions(uid)
+    schedule_trial_expiry(uid)
 
     text = (
         "🎁 <b>30 kunlik bepul sinov</b> faollashtirildi!\n\n"
@@ -848,87 +1255,145 @@ async def _send_trial_invites(uid: int, regions: list[str]):
         except Exception:
             pass
 
-async def trial_watcher():
+def schedule_trial_expiry(uid: int) -> None:
+    info = trial_members.get(uid)
+    exp = info.get("expires_at") if info else None
+    if exp:
+        timer_service.schedule(("trial_expiry", uid), exp.timestamp(), "trial_expiry", uid)
+
+
+def cancel_trial_expiry(uid: int) -> None:
+    timer_service.cancel(("trial_expiry", uid))
+
+
+async def expire_trial(uid: int):
     """
-    Har soatda trial muddati tugaganlarni (to‘lov qilmagan bo‘lsa) guruhdan chiqaradi
-    va to‘lov ma'lumotlari bilan DM yuboradi.
+    Trial muddati tugagan haydovchini (to‘lov qilmagan bo‘lsa) guruhdan chiqaradi
+    va to‘lov ma'lumotlari bilan DM yuboradi. TimerService muddat kelganda chaqiradi.
     """
-    while True:
-        try:
-            now = datetime.now()
-            for uid, info in list(trial_members.items()):
-                # To'lov qilganlar kuzatuvdan chiqariladi
-                if subscriptions.get(uid, {}).get("active"):
-                    trial_members.pop(uid, None)
-                    continue
+    info = trial_members.get(uid)
+    if not info:
+        return
+    # To'lov qilganlar kuzatuvdan chiqariladi
+    if subscriptions.get(uid, {}).get("active"):
+        trial_members.pop(uid, None)
+        runtime_state.mark_dirty("trial_members")
+        refresh_driver_regions(uid)
+        return
 
-                exp = info.get("expires_at")
-                regions = normalize_region_list(info.get("regions"))
-                if not regions:
-                    regions = get_profile_regions(uid)
-
-                if exp and now >= exp and regions:
-                    driver_state = driver_onboarding.setdefault(uid, {})
-                    driver_state["stage"] = "wait_check"
-                    driver_state["regions"] = normalize_region_list(regions)
-
-                    for region in regions:
-                        try:
-                            chat_id = get_driver_chat_id(region)
-                        except Exception:
-                            continue
-                        try:
-                            await bot.ban_chat_member(chat_id, uid)
-                            await bot.unban_chat_member(chat_id, uid)
-                        except Exception:
-                            pass
-
-                    price_value = compute_subscription_price(len(regions))
-                    price_txt = format_price(price_value)
-                    regions_text = ", ".join(regions)
-                    pay_text = (
-                        "⛔️ <b>30 kunlik bepul sinov muddati tugadi.</b>\n\n"
-                        f"📍 <b>Hududlar:</b> {regions_text}\n"
-                        f"💳 <b>Obuna to‘lovi:</b> <code>{price_txt} so‘m</code> ({len(regions)} hudud)\n"
-                        f"🧾 <b>Karta:</b> <code>{CARD_NUMBER_DISPLAY}</code>\n"
-                        f"👤 Karta egasi: <b>{CARD_HOLDER}</b>\n\n"
-                        "✅ To‘lovni amalga oshirgach, <b>chek rasm</b>ini yuboring.\n"
-                        "Tasdiqlangach, sizga <b>haydovchilar guruhiga</b> qayta qo‘shilish havolasini yuboramiz."
-                    )
+    exp = info.get("expires_at")
+    if exp and datetime.now() < exp:
+        # Muddat o'zgargan — yangi muddatga qayta rejalashtiriladi
+        schedule_trial_expiry(uid)
+        return
+    if not exp:
+        # Muddatsiz yozuvni hech qachon tugatib bo'lmaydi — kuzatuvdan chiqaramiz
+        trial_members.pop(uid, None)
+        runtime_state.mark_dirty("trial_members")
+        refresh_driver_regions(uid)
+        return
+    regions = normalize_region_list(info.get("regions"))
+    if not regions:
+        regions = get_profile_regions(uid)
+    if not regions:
+        # Eski soatlik tekshiruv kabi keyinroq yana urinib ko'ramiz
+        timer_service.schedule(("trial_expiry", uid), time.time() + TRIAL_EXPIRY_RETRY, "trial_expiry", uid)
+        return
 
-                    if SUPPORTS_COPY_TEXT:
-                        ikb = InlineKeyboardMarkup(
-                            inline_keyboard=[
-                                [
-                                    InlineKeyboardButton(
-                                        text="📋 Karta raqamini nusxalash",
-                                        copy_text=CopyTextButton(text=CARD_NUMBER_DISPLAY)
-                                    )
-                                ],
-                                [InlineKeyboardButton(text="📤 Chekni yuborish", callback_data="send_check")],
-                            ]
-                        )
-                    else:
-                        ikb = InlineKeyboardMarkup(
-                            inline_keyboard=[
-                                [InlineKeyboardButton(text="📤 Chekni yuborish", callback_data="send_check")]
-                            ]
-                        )
-
-                    try:
-                        await bot.send_message(uid, pay_text, parse_mode="HTML", reply_markup=ikb)
-                    except Exception:
-                        pass
-
-                    trial_members.pop(uid, None)
+    driver_state = driver_onboarding.setdefault(uid, {})
+    driver_state["stage"] = "wait_check"
+    driver_state["regions"] = normalize_region_list(regions)
+    runtime_state.mark_dirty("driver_onboarding")
+    refresh_driver_regions(uid)
+
+    async def kick(region):
+        chat_id = get_driver_chat_id(region)
+        await bot.ban_chat_member(chat_id, uid)
+        await bot.unban_chat_member(chat_id, uid)
+
+    # Hududlar bo'yicha parallel; xatolar Outcome ichida qoladi
+    await fan_out(kick, regions, limit=FANOUT_CONCURRENCY)
+
+    price_value = compute_subscription_price(len(regions))
+    price_txt = format_price(price_value)
+    regions_text = ", ".join(regions)
+    pay_text = (
+        "⛔️ <b>30 kunlik bepul sinov muddati tugadi.</b>\n\n"
+        f"📍 <b>Hududlar:</b> {regions_text}\n"
+        f"💳 <b>Obuna to‘lovi:</b> <code>{price_txt} so‘m</code> ({len(regions)} hudud)\n"
+        f"🧾 <b>Karta:</b> <code>{CARD_NUMBER_DISPLAY}</code>\n"
+        f"👤 Karta egasi: <b>{CARD_HOLDER}</b>\n\n"
+        "✅ To‘lovni amalga oshirgach, <b>chek rasm</b>ini yuboring.\n"
+        "Tasdiqlangach, sizga <b>haydovchilar guruhiga</b> qayta qo‘shilish havolasini yuboramiz."
+    )
+
+    ikb = payment_keyboard()
+
+    try:
+        await bot.send_message(uid, pay_text, parse_mode="HTML", reply_markup=ikb)
+    except Exception:
+        pass
+
+    trial_members.pop(uid, None)
+    refresh_driver_regions(uid)
+    runtime_state.mark_dirty("trial_members")
+
+timer_service.register("trial_expiry", expire_trial, concurrency=TRIAL_EXPIRY_CONCURRENCY)
+
+
+def _scan_trial_deadlines(after_iso: str) -> list[tuple[int, str]]:
+    # Worker thread'da; satrlar faqat o'qiladi
+    rows = []
+    for uid, profile in user_profiles.items():
+        expires_raw = profile.get("trial_expires_at")
+        if isinstance(expires_raw, str) and expires_raw > after_iso:
+            rows.append((uid, expires_raw))
+    return rows
 
-        except Exception:
-            # watchdog yiqilmasin
-            pass
 
-        await asyncio.sleep(3600)  # 1 soatda bir tekshiradi
+async def load_trial_deadlines() -> int:
+    """
+    Ishga tushishda trial muddatlarini taymerlarga yuklaydi: RAM holatidagi
+    trial_members hamda profillardagi kelajakdagi trial_expires_at (snapshot
+    yo'qolgan bo'lsa). O'tib ketgan va trial_members'da yo'q muddatlar allaqachon
+    qayta ishlangan hisoblanadi.
+    """
+    for uid in list(trial_members):
+        schedule_trial_expiry(uid)
+    now = datetime.now()
+    rows = await profile_store.query("trials_expiring_after", now.isoformat())
+    if rows is None:
+        # SQL so'rovsiz backend: O(users) skan thread'da, loop'ga faqat kelajakdagi
+        # muddatlar (uid, sana) qaytadi; hududlar keyin kesh orqali (on_load
+        # normalizatsiyasi bilan) olinadi
+        rows = await asyncio.to_thread(_scan_trial_deadlines, now.isoformat())
+    loaded = 0
+    for pos, (uid, expires_raw) in enumerate(rows, 1):
+        if pos % 5000 == 0:
+            await asyncio.sleep(0)
+        uid = int(uid)
+        if uid in trial_members or subscriptions.get(uid, {}).get("active"):
+            continue
+        try:
+            expires_at = datetime.fromisoformat(expires_raw)
+        except (TypeError, ValueError):
+            continue
+        if expires_at <= now:
+            continue
+        regions = get_profile_regions(uid)[:1]
+        trial_members[uid] = TrialEntry(expires_at=expires_at, regions=regions)
+        if regions:
+            trial_members[uid]["last_region"] = regions[-1]
+        schedule_trial_expiry(uid)
+        loaded += 1
+    if loaded:
+        runtime_state.mark_dirty("trial_members")
+    return loaded
+
 
 async def after_phone_collected(uid: int, message: types.Message):
+    # Har bir tarmoq onboarding holatini o'zgartiradi (yoki o'chiradi)
+    runtime_state.mark_dirty("driver_onboarding")
     data = driver_onboarding.get(uid, {})
     name = data.get("name", "—")
     car_make = data.get("car_make", "—")
@@ -947,6 +1412,7 @@ async def after_phone_collected(uid: int, message: types.Message):
         return
 
     driver_onboarding[uid]["regions"] = regions
+    refresh_driver_regions(uid)
 
     profile_entry = user_profiles.setdefault(uid, {})
     if phone and phone != "—":
@@ -954,13 +1420,13 @@ async def after_phone_collected(uid: int, message: types.Message):
     if name and name != "—":
         profile_entry["name"] = profile_entry.get("name") or name
     set_profile_regions(uid, regions)
-    await save_users_to_disk(user_profiles)
+    mark_user_dirty(uid)
 
     profile = user_profiles.get(uid, {})
     trial_granted_at = profile.get("trial_granted_at")
     trial_joined_at = profile.get("trial_joined_at")
 
-    sub_entry = subscriptions.get(uid) or {}
+    sub_entry = subscriptions.get(uid) or Subscription()
     has_active_sub = bool(sub_entry.get("active"))
 
     if FREE_TRIAL_ENABLED and not has_active_sub:
@@ -975,6 +1441,7 @@ async def after_phone_collected(uid: int, message: types.Message):
                 pass
             await _send_trial_invites(uid, regions)
             driver_onboarding.pop(uid, None)
+            refresh_driver_regions(uid)
             return
         else:
             dt_txt = human_dt(trial_joined_at or trial_granted_at)
@@ -990,16 +1457,17 @@ async def after_phone_collected(uid: int, message: types.Message):
     elif has_active_sub:
         active_regions = set(normalize_region_list(sub_entry.get("regions")))
         new_regions = [r for r in regions if r not in active_regions]
-        successful: list[str] = []
-        for region in new_regions:
-            text = (
+        outcomes = await send_region_invites(
+            uid,
+            new_regions,
+            lambda region: (
                 "✅ Sizning obunangiz faol.\n\n"
                 f"📍 <b>Hudud:</b> {region}\n"
                 "Quyidagi tugma orqali haydovchilar guruhiga qo‘shiling."
-            )
-            if await send_region_invite(uid, region, text):
-                active_regions.add(region)
-                successful.append(region)
+            ),
+        )
+        successful = [o.item for o in outcomes if o.ok]
+        active_regions.update(successful)
         if active_regions:
             sub_entry["active"] = True
             normalized_active = normalize_region_list(active_regions)
@@ -1007,15 +1475,19 @@ async def after_phone_collected(uid: int, message: types.Message):
             if normalized_active:
                 sub_entry["last_region"] = normalized_active[-1]
         subscriptions[uid] = sub_entry
+        runtime_state.mark_dirty("subscriptions")
+        refresh_driver_regions(uid)
         if new_regions:
             if successful:
                 driver_onboarding.pop(uid, None)
+                refresh_driver_regions(uid)
                 return
             await message.answer(
                 "❌ Silka yaratib bo‘lmadi. Iltimos, admin bilan bog‘laning yoki keyinroq qayta urinib ko‘ring.",
                 reply_markup=order_keyboard()
             )
             driver_onboarding.pop(uid, None)
+            refresh_driver_regions(uid)
             return
         if not new_regions:
             await message.answer(
@@ -1023,6 +1495,7 @@ async def after_phone_collected(uid: int, message: types.Message):
                 reply_markup=order_keyboard()
             )
             driver_onboarding.pop(uid, None)
+            refresh_driver_regions(uid)
             return
 
     price_value = compute_subscription_price(len(regions))
@@ -1035,24 +1508,7 @@ async def after_phone_collected(uid: int, message: types.Message):
         "⚠️ <b>Ogohlantirish:</b> soxtalashtirilgan chek yuborgan shaxsga <b>jinoyiy javobgarlik</b> qo‘llanilishi mumkin."
     )
 
-    if SUPPORTS_COPY_TEXT:
-        ikb = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="📋 Karta raqamini nusxalash",
-                        copy_text=CopyTextButton(text=CARD_NUMBER_DISPLAY)
-                    )
-                ],
-                [InlineKeyboardButton(text="📤 Chekni yuborish", callback_data="send_check")],
-            ]
-        )
-    else:
-        ikb = InlineKeyboardMarkup(
-            inline_keyboard=[
-                [InlineKeyboardButton(text="📤 Chekni yuborish", callback_data="send_check")]
-            ]
-        )
+    ikb = payment_keyboard()
 
     regions_text = ", ".join(regions)
     await message.answer(
@@ -1071,11 +1527,13 @@ async def after_phone_collected(uid: int, message: types.Message):
         await message.answer(pay_text, parse_mode="HTML", reply_markup=ikb)
         driver_onboarding[uid]["stage"] = "wait_check"
         driver_onboarding[uid]["regions"] = regions
+        refresh_driver_regions(uid)
     else:
         await message.answer(
             "🎁 30 kunlik trial faollashtirildi. Trial tugaguncha tashkilotchi siz bilan bog‘lanadi."
         )
         driver_onboarding.pop(uid, None)
+        refresh_driver_regions(uid)
 
 @dp.callback_query(F.data == "send_check")
 async def send_check_cb(callback: types.CallbackQuery):
@@ -1083,6 +1541,7 @@ async def send_check_cb(callback: types.CallbackQuery):
     if uid not in driver_onboarding:
         await callback.answer(); return
     driver_onboarding[uid]["stage"] = "wait_check"
+    runtime_state.mark_dirty("driver_onboarding")
     await callback.message.answer("📸 Iltimos, <b>chek rasmini</b> bitta rasm ko‘rinishida yuboring (screenshot ham bo‘ladi).", parse_mode="HTML")
     await callback.answer()
 
@@ -1108,6 +1567,7 @@ async def _build_check_caption(uid: int, data: dict) -> str:
         region_list = ["—"]
     else:
         data["regions"] = region_list
+        runtime_state.mark_dirty("driver_onboarding")
     region_text = ", ".join(region_list)
     price_value = compute_subscription_price(len([r for r in region_list if r != "—"]))
     price_txt = format_price(price_value)
@@ -1178,6 +1638,8 @@ async def receive_check_photo(message: types.Message):
         reply_markup=order_keyboard()
     )
     driver_onboarding.pop(uid, None)
+    runtime_state.mark_dirty("driver_onboarding")
+    refresh_driver_regions(uid)
 
 # FAYL (document) sifatida — image/* bo‘lsa ham, bo‘lmasa ham
 @dp.message(F.document)
@@ -1200,6 +1662,8 @@ async def receive_check_document(message: types.Message):
         reply_markup=order_keyboard()
     )
     driver_onboarding.pop(uid, None)
+    runtime_state.mark_dirty("driver_onboarding")
+    refresh_driver_regions(uid)
 
 # ================== ADMIN: Tasdiqlash/Rad etish tugmalari callbacklari ==================
 async def _send_driver_invite_and_mark(callback: types.CallbackQuery, driver_id: int):
@@ -1211,27 +1675,23 @@ async def _send_driver_invite_and_mark(callback: types.CallbackQuery, driver_id:
         )
         return
 
-    sent_any = False
-    for region in regions:
-        text = (
-            "✅ <b>To‘lov tasdiqlandi.</b>\n\n"
-            f"📍 <b>Hudud:</b> {region}\n"
-            "Quyidagi tugma orqali haydovchilar guruhiga qo‘shiling. "
-            "Guruhga qo‘shilgandan so‘ng bu xabar avtomatik o‘chiriladi."
-        )
-        ok = await send_region_invite(driver_id, region, text)
-        sent_any = sent_any or ok
+    outcomes = await send_region_invites(driver_id, regions, payment_confirmed_text)
+    failed = [o.item for o in outcomes if not o.ok]
 
-    if not sent_any:
+    if len(failed) == len(outcomes):
         await callback.answer("❌ Silka yuborilmadi. Iltimos, keyinroq qayta urinib ko‘ring.", show_alert=True)
         return
 
     normalized_regions = normalize_region_list(regions)
-    subscription_entry = {"active": True, "regions": normalized_regions}
+    subscription_entry = Subscription(active=True, regions=normalized_regions)
     if normalized_regions:
         subscription_entry["last_region"] = normalized_regions[-1]
     subscriptions[driver_id] = subscription_entry
     trial_members.pop(driver_id, None)
+    runtime_state.mark_dirty("subscriptions", "trial_members")
+    cancel_trial_expiry(driver_id)
+    refresh_driver_regions(driver_id)
+    business.inc("payments_approved")
 
     # Cheklar guruhidagi xabarni 'Tasdiqlandi' deb yangilash va tugmalarni o‘chirish
     try:
@@ -1240,7 +1700,7 @@ async def _send_driver_invite_and_mark(callback: types.CallbackQuery, driver_id:
         price_txt = format_price(compute_subscription_price(len(normalized_regions)))
         new_cap = (
             f"{orig_cap}\n\n✅ <b>Tasdiqlandi</b> — {admin_name} • {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-            f"\n📍 Hududlar: {', '.join(normalized_regions)}"
+            f"\n📍 Hududlar: {summarize(outcomes)}"
             f"\n💳 To‘lov: {price_txt} so‘m"
         )
         await bot.edit_message_caption(
@@ -1256,6 +1716,11 @@ async def _send_driver_invite_and_mark(callback: types.CallbackQuery, driver_id:
         except Exception:
             pass
 
+    if failed:
+        await callback.answer(
+            f"✅ Tasdiqlandi. ⚠️ Silka yuborilmadi: {', '.join(failed)}", show_alert=True
+        )
+        return
     await callback.answer("✅ Tasdiqlandi va silka yuborildi.")
 
 @dp.callback_query(F.data.startswith("payok_"))
@@ -1329,28 +1794,23 @@ async def admin_confirm_payment(message: types.Message):
         await message.reply("❌ Haydovchining hududlari aniqlanmadi. Avval haydovchi hududlarni tanlashi kerak.")
         return
 
-    sent_any = False
-    for region in regions:
-        text = (
-            "✅ <b>To‘lov tasdiqlandi.</b>\n\n"
-            f"📍 <b>Hudud:</b> {region}\n"
-            "Quyidagi tugma orqali haydovchilar guruhiga qo‘shiling. "
-            "Guruhga qo‘shilgandan so‘ng bu xabar avtomatik o‘chiriladi."
-        )
-        ok = await send_region_invite(driver_id, region, text)
-        sent_any = sent_any or ok
+    outcomes = await send_region_invites(driver_id, regions, payment_confirmed_text)
 
-    if sent_any:
+    if any(o.ok for o in outcomes):
         normalized = normalize_region_list(regions)
-        sub_entry = {"active": True, "regions": normalized}
+        sub_entry = Subscription(active=True, regions=normalized)
         if normalized:
             sub_entry["last_region"] = normalized[-1]
         subscriptions[driver_id] = sub_entry
         trial_members.pop(driver_id, None)
+        runtime_state.mark_dirty("subscriptions", "trial_members")
+        cancel_trial_expiry(driver_id)
+        refresh_driver_regions(driver_id)
+        business.inc("payments_approved")
         await message.reply(
             "✅ Silka(l)ar yuborildi: {regions}\n"
             "💳 To‘lov: {price} so‘m".format(
-                regions=", ".join(normalized),
+                regions=summarize(outcomes),
                 price=format_price(compute_subscription_price(len(normalized))),
             ),
             parse_mode="HTML",
@@ -1380,8 +1840,11 @@ async def on_chat_member(update: types.ChatMemberUpdated):
                         del pend_map[region_key]
                 if pend_map:
                     pending_invites[user.id] = pend_map
+                    refresh_driver_regions(user.id)
                 elif user.id in pending_invites:
                     pending_invites.pop(user.id, None)
+                    refresh_driver_regions(user.id)
+                runtime_state.mark_dirty("pending_invites")
 
             if matched_info and matched_info.get("msg_id"):
                 try:
@@ -1398,15 +1861,17 @@ async def on_chat_member(update: types.ChatMemberUpdated):
             profile = user_profiles.setdefault(user.id, {})
             if region:
                 add_profile_regions(user.id, [region])
-                sub_entry = subscriptions.setdefault(user.id, {})
+                sub_entry = subscriptions.setdefault(user.id, Subscription())
                 if sub_entry.get("active"):
                     sub_entry["regions"] = normalize_region_list(sub_entry.get("regions") or [region])
                 trial_entry = trial_members.get(user.id)
                 if trial_entry:
                     trial_entry["regions"] = normalize_region_list(trial_entry.get("regions") or [region])
+                runtime_state.mark_dirty("subscriptions", "trial_members")
+                refresh_driver_regions(user.id)
             if profile.get("trial_granted_at") and not profile.get("trial_joined_at"):
                 profile["trial_joined_at"] = datetime.now().isoformat()
-                await save_users_to_disk(user_profiles)
+                mark_user_dirty(user.id)
     except Exception:
         pass
 
@@ -1417,9 +1882,12 @@ async def back_flow(message: types.Message):
 
     # Onboarding ortga
     if uid in driver_onboarding:
+        # Quyidagi bosqichlarning deyarli hammasi onboarding holatini o'zgartiradi
+        runtime_state.mark_dirty("driver_onboarding")
         st = driver_onboarding[uid].get("stage")
         if st == "regions":
             driver_onboarding.pop(uid, None)
+            refresh_driver_regions(uid)
             await message.answer("Asosiy menyu", reply_markup=order_keyboard()); return
         if st == "name":
             driver_onboarding[uid]["stage"] = "regions"
@@ -1445,6 +1913,7 @@ async def back_flow(message: types.Message):
     if not d:
         await message.answer("Asosiy menyu", reply_markup=order_keyboard()); return
 
+    runtime_state.mark_dirty("drafts")
     stage = d["stage"]
 
     # Soddalashtirilgan bosqichlar:
@@ -1497,6 +1966,7 @@ async def location_received(message: types.Message):
     lon = message.location.longitude
     d["from"] = f"https://maps.google.com/?q={lat},{lon}"
     d["stage"] = "to"
+    runtime_state.mark_dirty("drafts")
     await message.answer("✅ Lokatsiya qabul qilindi.\n\n📦 Endi yuk **qayerga** yetkaziladi? Manzilni yozing:", reply_markup=keyboard_with_back_cancel([], show_back=True))
 
 # ================== BUYURTMA KOLLEKTOR ==================
@@ -1505,11 +1975,13 @@ async def collect_flow(message: types.Message):
     if uid not in drafts:
         return
     d = drafts[uid]
+    # Har bir bosqich draft'ni o'zgartiradi
+    runtime_state.mark_dirty("drafts")
     stage = d["stage"]
     text = (message.text or "").strip()
 
     if stage == "region":
-        selected = resolve_region_name(text)
+        selected = resolve_region_name(text, fuzzy=True)
         if not selected:
             await message.answer(
                 "❗️ Iltimos, hududni tugmalar yordamida tanlang.",
@@ -1520,7 +1992,8 @@ async def collect_flow(message: types.Message):
         d["region"] = selected
         d["chat_id"] = get_order_chat_id(selected)
         user_profiles.setdefault(uid, {})["last_region"] = selected
-        await save_users_to_disk(user_profiles)
+        mark_user_dirty(uid)
+        refresh_driver_regions(uid)
         d["stage"] = "vehicle"
         await message.answer(
             "🚚 Qanday yuk mashinasi kerak?\nQuyidagidan tanlang yoki o‘zingiz yozing:",
@@ -1561,37 +2034,41 @@ async def collect_flow(message: types.Message):
     if stage == "when_select":
         await remove_confirm_message(uid, d)
         if text == HOZIR:
-            d["when"] = datetime.now().strftime("%H:%M")
+            now = datetime.now()
+            d["when"] = now.strftime("%H:%M")
+            d["when_at"] = now.isoformat(timespec="minutes")
             d["stage"] = "confirm"
             await send_draft_confirmation(uid, message, d)
             return
         if text == BOSHQA:
             d["stage"] = "when_input"
             await message.answer(
-                "⏰ Vaqtni kiriting (`HH:MM`, masalan: `19:00`):",
+                "⏰ Vaqtni kiriting: `HH:MM` (masalan: `19:00`), `ertaga 07:30` yoki `25.12 09:00`:",
                 reply_markup=keyboard_with_back_cancel([], show_back=True)
             )
             return
-        if is_hhmm(text):
-            d["when"] = normalize_hhmm(text)
+        event_dt = parse_when(text)
+        if event_dt:
+            set_draft_when(d, event_dt)
             d["stage"] = "confirm"
             await send_draft_confirmation(uid, message, d)
             return
         await message.answer(
-            "❗️ Vaqt formati `HH:MM` bo‘lishi kerak. Yoki tugmalarni tanlang.",
+            "❗️ Vaqt formati `HH:MM` (yoki `ertaga HH:MM`, `DD.MM HH:MM`) bo‘lishi kerak. Yoki tugmalarni tanlang.",
             reply_markup=when_keyboard()
         )
         return
 
     if stage == "when_input":
         await remove_confirm_message(uid, d)
-        if is_hhmm(text):
-            d["when"] = normalize_hhmm(text)
+        event_dt = parse_when(text)
+        if event_dt:
+            set_draft_when(d, event_dt)
             d["stage"] = "confirm"
             await send_draft_confirmation(uid, message, d)
             return
         await message.answer(
-            "❗️ Noto‘g‘ri format. `HH:MM` yozing (masalan: `19:00`).",
+            "❗️ Noto‘g‘ri format. `HH:MM` (masalan: `19:00`), `ertaga 07:30` yoki `25.12 09:00` yozing.",
             reply_markup=keyboard_with_back_cancel([], show_back=True)
         )
         return
@@ -1609,11 +2086,52 @@ def is_hhmm(s: str) -> bool:
     except Exception:
         return False
 
-def normalize_hhmm(s: str) -> str:
+# "HH:MM" o'tib ketgan bo'lsa shu oraliqda — "hozir", undan ko'p bo'lsa — ertangi kun
+WHEN_PAST_GRACE = timedelta(hours=1)
+WHEN_DATE_FORMATS = ("%d.%m.%Y %H:%M", "%Y-%m-%d %H:%M")
+
+def parse_when(text: str, now: datetime | None = None) -> datetime | None:
+    """Buyurtma vaqti: "HH:MM", "ertaga HH:MM", "DD.MM HH:MM", "DD.MM.YYYY HH:MM" (o'tgan sana — None)."""
+    now = now or datetime.now()
+    text = " ".join((text or "").split()).lower()
+    tomorrow = text.startswith("ertaga ")
+    if tomorrow:
+        text = text[len("ertaga "):]
+    if is_hhmm(text):
+        target = datetime.combine(now.date(), datetime.strptime(text, "%H:%M").time())
+        if tomorrow or target < now - WHEN_PAST_GRACE:
+            target += timedelta(days=1)
+        return target
+    if tomorrow:
+        return None
     try:
-        t = datetime.strptime(s, "%H:%M").time(); return t.strftime("%H:%M")
-    except Exception:
-        return s
+        # Yilsiz sana: joriy yil, o'tib ketgan bo'lsa — keyingisi
+        day, clock = text.split(" ")
+        target = datetime.strptime(f"{day}.{now.year} {clock}", "%d.%m.%Y %H:%M")
+        if target < now - WHEN_PAST_GRACE:
+            target = target.replace(year=now.year + 1)
+        return target
+    except ValueError:
+        pass
+    for fmt in WHEN_DATE_FORMATS:
+        try:
+            target = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return target if target >= now - WHEN_PAST_GRACE else None
+    return None
+
+def format_when(dt: datetime, now: datetime | None = None) -> str:
+    now = now or datetime.now()
+    if dt.date() == now.date():
+        return dt.strftime("%H:%M")
+    if dt.year == now.year:
+        return dt.strftime("%d.%m %H:%M")
+    return dt.strftime("%d.%m.%Y %H:%M")
+
+def set_draft_when(d: dict, event_dt: datetime) -> None:
+    d["when"] = format_when(event_dt)
+    d["when_at"] = event_dt.isoformat(timespec="minutes")
 
 def phone_display(p: str) -> str:
     if not p: return "—"
@@ -1654,23 +2172,35 @@ def _event_dt_today_or_now(hhmm: str, now: datetime | None = None) -> datetime:
         return now
     return target if target > now else now
 
-async def _sleep_and_notify(delay_sec: float, chat_id: int, text: str):
-    try:
-        if delay_sec > 0: await asyncio.sleep(delay_sec)
-        await bot.send_message(chat_id, text, disable_web_page_preview=True)
-    except asyncio.CancelledError:
+def order_event_dt(order: dict, now: datetime | None = None) -> datetime:
+    """Buyurtma vaqti: aniq sana (when_at) bo'lsa o'sha, aks holda eski "HH:MM" — bugun yoki hozir."""
+    when_at = order.get("when_at")
+    if when_at:
+        try:
+            return datetime.fromisoformat(when_at)
+        except ValueError:
+            pass
+    return _event_dt_today_or_now(order.get("when") or "", now=now)
+
+REMINDER_MILESTONES = ((3600, "⏳ 1 soat qoldi"), (1800, "⏳ 30 daqiqa qoldi"), (900, "⏳ 15 daqiqa qoldi"), (0, "⏰ Vaqti bo‘ldi"))
+
+async def _send_driver_reminder(payload):
+    customer_id, driver_id, text = payload
+    order = orders.get(customer_id)
+    # Buyurtma bekor qilingan yoki boshqa haydovchiga o'tgan bo'lsa — eslatma eskirgan
+    if not order or order.get("status") != "accepted" or order.get("driver_id") != driver_id:
         return
-    except Exception:
-        pass
+    with outbound_priority(PRIORITY_BACKGROUND):
+        try:
+            await bot.send_message(driver_id, text, disable_web_page_preview=True)
+        except Exception:
+            pass
+
+timer_service.register("driver_reminder", _send_driver_reminder, max_lateness=REMINDER_MAX_LATENESS)
 
 def cancel_driver_reminders(customer_id: int):
-    order = orders.get(customer_id)
-    if not order: return
-    tasks = order.get("reminder_tasks") or []
-    for t in tasks:
-        try: t.cancel()
-        except Exception: pass
-    order["reminder_tasks"] = []
+    for offset, _ in REMINDER_MILESTONES:
+        timer_service.cancel(("driver_reminder", customer_id, offset))
 
 def schedule_driver_reminders(customer_id: int):
     order = orders.get(customer_id)
@@ -1680,21 +2210,20 @@ def schedule_driver_reminders(customer_id: int):
 
     cancel_driver_reminders(customer_id)
     now = datetime.now()
-    event_dt = _event_dt_today_or_now(order["when"], now=now)
-    seconds_to_event = (event_dt - now).total_seconds()
-    milestones = [(3600, "⏳ 1 soat qoldi"), (1800, "⏳ 30 daqiqa qoldi"), (900, "⏳ 15 daqiqa qoldi"), (0, "⏰ Vaqti bo‘ldi")]
+    now_ts = now.timestamp()
+    # Vaqti o'tgan (yoki "Hozir") buyurtma: "Vaqti bo'ldi" darhol yuboriladi
+    event_ts = max(order_event_dt(order, now=now).timestamp(), now_ts)
     base = (
         f"{order['when']} vaqti uchun {order.get('region', 'Hudud')} buyurtma.\n"
         f"Yo‘nalish: {order['from']} → {order['to']}\n"
         "Muvofiqlashtirishni unutmang."
     )
-    order["reminder_tasks"] = []
-    for offset, label in milestones:
-        delay = seconds_to_event - offset
-        if delay < 0: continue
-        text = f"{label} — {base}"
-        task = asyncio.create_task(_sleep_and_notify(delay, driver_id, text))
-        order["reminder_tasks"].append(task)
+    for offset, label in REMINDER_MILESTONES:
+        due = event_ts - offset
+        if due < now_ts: continue
+        timer_service.schedule(
+            ("driver_reminder", customer_id, offset), due, "driver_reminder", (customer_id, driver_id, f"{label} — {base}")
+        )
 
 
 def build_draft_summary(d: dict) -> str:
@@ -1746,6 +2275,7 @@ async def finalize_and_send(message_or_uid, d: dict):
             region = profile_regions[-1]
     if not region:
         drafts[uid] = d
+        runtime_state.mark_dirty("drafts")
         prompt = "📍 Iltimos, hududni tanlang."
         if message:
             await message.answer(prompt, reply_markup=region_keyboard(show_back=False))
@@ -1761,33 +2291,84 @@ async def finalize_and_send(message_or_uid, d: dict):
         "to": d["to"],
         "when": d["when"],
     }
-    ikb_group = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="❗️ Qabul qilish", callback_data=f"accept_{uid}")]
-    ])
-    sent = await bot.send_message(chat_id, group_post_text(uid, order_data), reply_markup=ikb_group)
-    orders[uid] = {
-        **order_data,
-        "msg_id": sent.message_id,
-        "chat_id": chat_id,
-        "status": "open",
-        "driver_id": None,
-        "cust_info_msg_id": None,
-        "drv_info_msg_id": None,
-        "cust_rating_msg_id": None,
-        "rating": None,
-        "reminder_tasks": [],
-    }
+    order = Order(
+        region=region,
+        vehicle=order_data["vehicle"],
+        from_=order_data["from"],
+        to=order_data["to"],
+        when=order_data["when"],
+        msg_id=None,
+        chat_id=chat_id,
+        status="open",
+        driver_id=None,
+        cust_info_msg_id=None,
+        drv_info_msg_id=None,
+        cust_rating_msg_id=None,
+        rating=None,
+    )
+    if d.get("when_at"):
+        order["when_at"] = d["when_at"]
+    orders[uid] = order
+    drafts.pop(uid, None)
+    runtime_state.mark_dirty("orders", "drafts")
+    business.inc("orders_posted")
     ikb_cust = InlineKeyboardMarkup(
         inline_keyboard=[[InlineKeyboardButton(text="❌ Buyurtmani bekor qilish", callback_data=f"cancel_{uid}")]]
     )
-    notify = "✅ Buyurtma haydovchilarga yuborildi.\nKerak bo‘lsa bekor qilishingiz mumkin."
+    notify = "✅ Buyurtmangiz qabul qilindi va haydovchilarga yuborilmoqda.\nKerak bo‘lsa bekor qilishingiz mumkin."
+    # Mijozga javob darhol; guruh posti guruh limitida navbat kutishi mumkin,
+    # shuning uchun u handlerni ushlab turmaydi
     if message:
         await message.answer(notify, reply_markup=ikb_cust)
         await message.answer("Asosiy menyu", reply_markup=order_keyboard())
     else:
         await bot.send_message(uid, notify, reply_markup=ikb_cust)
         await bot.send_message(uid, "Asosiy menyu", reply_markup=order_keyboard())
-    drafts.pop(uid, None)
+    queue_group_post(uid, order)
+
+
+group_post_tasks: set[asyncio.Task] = set()
+
+
+def queue_group_post(uid: int, order: Order) -> None:
+    task = asyncio.create_task(post_order_to_group(uid, order))
+    group_post_tasks.add(task)
+    task.add_done_callback(group_post_tasks.discard)
+
+
+async def drain_group_posts(timeout: float) -> None:
+    """To'xtashda: navbatdagi postlarni kutadi, ulgurmaganlarini bekor qiladi."""
+    if not group_post_tasks:
+        return
+    _, pending = await asyncio.wait(set(group_post_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def post_order_to_group(uid: int, order: Order):
+    """Buyurtmani guruhga joylaydi va msg_id ni buyurtmaga yozadi."""
+    ikb_group = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="❗️ Qabul qilish", callback_data=f"accept_{uid}")]
+    ])
+    chat_id = order["chat_id"]
+    try:
+        sent = await bot.send_message(chat_id, group_post_text(uid, order), reply_markup=ikb_group)
+    except Exception:
+        if orders.get(uid) is order:
+            orders.pop(uid, None)
+            runtime_state.mark_dirty("orders")
+            try: await bot.send_message(uid, "❗️ Buyurtmani guruhga yuborib bo‘lmadi. Iltimos, qaytadan urinib ko‘ring.")
+            except Exception: pass
+        return
+    if orders.get(uid) is not order:
+        # Post navbatda turganda mijoz bekor qilgan
+        try: await bot.delete_message(chat_id=chat_id, message_id=sent.message_id)
+        except Exception: pass
+        return
+    order["msg_id"] = sent.message_id
+    runtime_state.mark_dirty("orders")
 
 # ================== DRAFT TASDIQLASH CALLBACKLARI ==================
 @dp.callback_query(F.data.startswith("draft_confirm_"))
@@ -1829,6 +2410,7 @@ async def draft_cancel_callback(callback: types.CallbackQuery):
     if draft:
         await remove_confirm_message(uid, draft)
     drafts.pop(uid, None)
+    runtime_state.mark_dirty("drafts")
 
     await bot.send_message(uid, "❌ Buyurtma bekor qilindi.", reply_markup=order_keyboard())
     await callback.answer("Bekor qilindi.")
@@ -1871,6 +2453,8 @@ async def accept_order(callback: types.CallbackQuery):
     chat_id = order.get("chat_id") or get_order_chat_id(order_region)
 
     order["status"] = "accepted"; order["driver_id"] = driver_id
+    runtime_state.mark_dirty("orders")
+    business.inc("orders_accepted")
 
     customer_name, customer_phone = customer.get("name", "Noma'lum"), customer.get("phone", "—")
     driver_name, driver_phone     = driver.get("name", callback.from_user.full_name), driver.get("phone", "—")
@@ -1935,6 +2519,8 @@ async def complete_order(callback: types.CallbackQuery):
         await callback.answer("Bu buyurtma yakunlab bo‘lmaydi (holat mos emas).", show_alert=True); return
 
     order["status"] = "completed"
+    runtime_state.mark_dirty("orders")
+    business.inc("orders_completed")
     cancel_driver_reminders(customer_id)
     drv_msg_id = order.get("drv_info_msg_id")
     if drv_msg_id:
@@ -1972,6 +2558,7 @@ async def rate_order(callback: types.CallbackQuery):
         await callback.answer("Baholash faqat yakunlangan buyurtma uchun.", show_alert=True); return
 
     order["rating"] = max(1, min(5, score))
+    runtime_state.mark_dirty("orders")
     rate_msg_id = order.get("cust_rating_msg_id")
     if rate_msg_id:
         try: await bot.edit_message_reply_markup(chat_id=customer_id, message_id=rate_msg_id, reply_markup=None)
@@ -1998,6 +2585,8 @@ async def cancel_order(callback: types.CallbackQuery):
 
     driver_id = order.get("driver_id"); caller = callback.from_user.id
     chat_id = order.get("chat_id") or get_order_chat_id(order.get("region"))
+    # Quyidagi uch tarmoq ham buyurtmani o'zgartiradi yoki o'chiradi
+    runtime_state.mark_dirty("orders")
 
     # Mijoz bekor qildi
     if caller == customer_id:
@@ -2010,6 +2599,7 @@ async def cancel_order(callback: types.CallbackQuery):
         try: await bot.send_message(customer_id, "❌ Buyurtmangiz bekor qilindi.")
         except Exception: pass
         orders.pop(customer_id, None)
+        business.inc("orders_cancelled")
         await callback.answer("Bekor qilindi (mijoz)."); return
 
     # Haydovchi bekor qildi
@@ -2035,6 +2625,7 @@ async def cancel_order(callback: types.CallbackQuery):
             try: await bot.edit_message_reply_markup(chat_id=driver_id, message_id=drv_msg_id, reply_markup=None)
             except Exception: pass
         order["status"] = "open"; order["driver_id"] = None
+        business.inc("orders_reopened")
         await callback.answer("Bekor qilindi (haydovchi)."); return
 
     # Admin bekor qildi
@@ -2048,6 +2639,7 @@ async def cancel_order(callback: types.CallbackQuery):
         try: await bot.send_message(customer_id, "❌ Buyurtmangiz admin tomonidan bekor qilindi.")
         except Exception: pass
         orders.pop(customer_id, None)
+        business.inc("orders_cancelled")
         await callback.answer("Bekor qilindi (admin)."); return
 
     await callback.answer("Bu buyurtmani bekor qilishga ruxsatingiz yo‘q.", show_alert=True)
@@ -2073,14 +2665,54 @@ async def test_payments_photo_cmd(message: types.Message):
         await message.reply("✅ Rasm cheklar guruhiga yuborildi.")
     except Exception as e:
         await message.reply(f"❌ Rasm yuborilmadi: {e}")
-        
+
+_profile_lock = asyncio.Lock()
+
+@dp.message(Command("profile"))
+async def profile_cmd(message: types.Message):
+    # /profile [soniya] [cprofile] — jonli jarayonni restartsiz kuzatish
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    parts = (message.text or "").split()[1:]
+    try:
+        seconds = float(parts[0]) if parts else 10.0
+    except ValueError:
+        await message.reply("Foydalanish: <code>/profile [soniya] [cprofile]</code>", parse_mode="HTML")
+        return
+    seconds = min(max(seconds, 1.0), PROFILE_MAX_SECONDS)
+    use_cprofile = "cprofile" in parts[1:]
+    if _profile_lock.locked():
+        await message.reply("⏳ Profiling allaqachon ketmoqda.")
+        return
+    async with _profile_lock:
+        await message.reply(
+            f"⏱ {seconds:g} s kuzatilmoqda ({'stek namunalari + cProfile' if use_cprofile else 'stek namunalari'})..."
+        )
+        result = await capture_profile(seconds, interval=PROFILE_SAMPLE_MS / 1000, use_cprofile=use_cprofile)
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    try:
+        await message.answer_document(
+            BufferedInputFile(result.report.encode("utf-8"), filename=f"profile_{ts}.txt"),
+            caption=f"📈 Profil: {result.seconds:.1f} s, {result.samples} namuna",
+        )
+        await message.answer_document(
+            BufferedInputFile(result.collapsed.encode("utf-8"), filename=f"profile_{ts}.collapsed"),
+            caption="🔥 Flame graph uchun (flamegraph.pl / speedscope)",
+        )
+    except Exception as e:
+        await message.reply(f"❌ Profil yuborilmadi: {e}")
+
 # ================== ADMIN: FOYDALANUVCHILAR SONI ==================
 @dp.message(Command("users_count"))
 async def users_count_cmd(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    total = len(user_profiles or {})
-    with_phone = sum(1 for _, p in (user_profiles or {}).items() if p.get("phone"))
+    summary = await profile_store.query("summary")
+    if summary is not None:
+        total, with_phone = summary["total"], summary["with_phone"]
+    else:
+        total = len(user_profiles or {})
+        with_phone = sum(1 for _, p in (user_profiles or {}).items() if p.get("phone"))
     await message.reply(
         f"👥 Jami foydalanuvchilar: <b>{total}</b>\n"
         f"📞 Telefon saqlanganlar: <b>{with_phone}</b>",
@@ -2093,10 +2725,25 @@ async def stats_cmd(message: types.Message):
     if message.from_user.id not in ADMIN_IDS:
         return
 
-    total_users = len(user_profiles or {})
-    with_phone = sum(1 for _, profile in (user_profiles or {}).items() if profile.get("phone"))
-    driver_ids = [uid for uid in (user_profiles or {}).keys() if get_profile_regions(uid)]
-    drivers_total = len(driver_ids)
+    summary = await profile_store.query("summary")
+    if summary is not None:
+        total_users = summary["total"]
+        with_phone = summary["with_phone"]
+        drivers_total = summary["drivers"]
+        region_totals = dict(summary["region_totals"])
+    else:
+        total_users = len(user_profiles or {})
+        with_phone = sum(1 for _, profile in (user_profiles or {}).items() if profile.get("phone"))
+        if profile_regions_index.ready:
+            drivers_total = len(profile_regions_index)
+            region_totals = profile_regions_index.counts()
+        else:
+            driver_ids = [uid for uid in (user_profiles or {}).keys() if get_profile_regions(uid)]
+            drivers_total = len(driver_ids)
+            region_totals: dict[str, int] = {}
+            for uid in driver_ids:
+                for region in get_profile_regions(uid):
+                    region_totals[region] = region_totals.get(region, 0) + 1
 
     active_subscribers = [
         uid for uid, data in subscriptions.items()
@@ -2104,11 +2751,6 @@ async def stats_cmd(message: types.Message):
     ]
     trial_active = len(trial_members or {})
 
-    region_totals: dict[str, int] = {}
-    for uid in driver_ids:
-        for region in get_profile_regions(uid):
-            region_totals[region] = region_totals.get(region, 0) + 1
-
     if region_totals:
         region_lines = "\n".join(
             f"• {region}: <b>{count}</b>" for region, count in sorted(region_totals.items())
@@ -2128,6 +2770,78 @@ async def stats_cmd(message: types.Message):
 
     await message.reply(text, parse_mode="HTML")
 
+@dp.message(Command("store_stats"))
+async def store_stats_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    st = profile_store.stats()
+    rt = runtime_state.stats()
+    cache = st["cache"]
+    extra = "".join(f"\n• {key}: {value}" for key, value in st["backend_stats"].items())
+    extra += (
+        "\n\n🧠 <b>RAM holati snapshot</b>\n"
+        f"• Saqlashlar: <b>{rt['saves']}</b> (xato: {rt['save_errors']})\n"
+        f"• Oxirgi: {rt['last_save_ms']} ms (loop: {rt['last_loop_ms']} ms), {rt['last_size']} bayt\n"
+        f"• Yozilgan bo'limlar: {', '.join(rt['last_sections']) or '—'}\n"
+        f"• Kutayotgan: {', '.join(rt['pending']) or '—'}\n"
+        f"• Tiklash: {rt['last_restore_ms']} ms"
+    )
+    kb = keyboard_cache.stats()
+    extra += (
+        "\n\n⌨️ <b>Klaviatura keshi</b>\n"
+        f"• Markuplar: {kb['markups']}, hit {kb['hits']}, miss {kb['misses']}, JSON hit {kb['json_hits']}"
+    )
+    ast = assets.stats()
+    extra += (
+        "\n\n🖼 <b>Rasm file_id keshi</b>\n"
+        f"• Saqlangan: {ast['cached']}, qayta ishlatilgan: {ast['reused']}, "
+        f"yuklangan: {ast['uploads']}, eskirgan: {ast['stale']}"
+    )
+    await message.reply(
+        "💾 <b>Profil saqlash (write-behind)</b>\n"
+        f"• Backend: <b>{st['backend']}</b>\n"
+        f"• Profillar: <b>{len(user_profiles)}</b>\n"
+        f"• Navbatda (dirty): <b>{st['pending']}</b>\n"
+        f"• O'zgarishlar: <b>{st['mutations']}</b>\n"
+        f"• Yozuvlar: <b>{st['flushes']}</b> (xato: {st['flush_errors']})\n"
+        f"• Oxirgi paket: <b>{st['last_batch']}</b> profil\n"
+        f"• Flush: oxirgi {st['last_flush_ms']} ms, o'rtacha {st['avg_flush_ms']} ms, maks {st['max_flush_ms']} ms\n"
+        f"• Interval: {st['interval_s']} s\n"
+        f"• Kesh: {cache['cached']}/{cache['max_entries'] if cache['bounded'] else 'cheklanmagan (backend RAM’da to‘liq)'}"
+        f", hit {cache['hits']}, miss {cache['misses']}"
+        f" ({cache['hit_rate']:.0%}), chiqarilgan {cache['evictions']}"
+        + extra,
+        parse_mode="HTML"
+    )
+
+@dp.message(Command("check_regions"))
+async def check_regions_cmd(message: types.Message):
+    """/check_regions — indeksni tekshiradi; /check_regions fix — farqlarni tuzatadi; rebuild — qayta quradi."""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    arg = (message.text or "").split(maxsplit=1)[1:]
+    mode = arg[0].strip().lower() if arg else ""
+    if mode == "rebuild":
+        await rebuild_region_indexes()
+        await message.reply(
+            f"🔁 Hudud indekslari qayta qurildi: {driver_regions_index.last_rebuild_ms:.1f} ms\n"
+            f"• Haydovchilar: <b>{len(driver_regions_index)}</b>\n"
+            f"• Profil hududlari: <b>{len(profile_regions_index)}</b>",
+            parse_mode="HTML"
+        )
+        return
+    result = await verify_region_indexes(repair=(mode == "fix"))
+    lines = []
+    for name, mismatched in result.items():
+        sample = ", ".join(str(uid) for uid in mismatched[:10])
+        lines.append(f"• {name}: <b>{len(mismatched)}</b> farq" + (f" ({sample})" if sample else ""))
+    await message.reply(
+        ("🛠 Tuzatildi\n" if mode == "fix" else "🔍 Hudud indekslari tekshiruvi\n")
+        + "\n".join(lines)
+        + f"\n• Tayyor: {driver_regions_index.ready}, qayta qurishlar: {driver_regions_index.rebuilds}",
+        parse_mode="HTML"
+    )
+
 # ================== ADMIN: CSV EXPORT ==================
 @dp.message(Command("export_users"))
 async def export_users_cmd(message: types.Message):
@@ -2156,15 +2870,639 @@ async def export_users_cmd(message: types.Message):
     except Exception as e:
         await message.reply(f"❌ CSV yuborilmadi: {e}")
 
+# ================== HUDUDLARNI QAYTA YUKLASH ==================
+_regions_reload_lock = asyncio.Lock()
+
+
+def _prepare_region_tables() -> dict[str, Any]:
+    # Thread ichida: o'qish, tekshirish va barcha jadvallar/klaviaturalarni qurish
+    with open(REGIONS_JSON, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    tables = build_region_tables(_parse_regions_config(data))
+    tables["REGION_KEYBOARDS"] = build_region_keyboards(tables["REGION_NAMES"])
+    return tables
+
+
+async def reload_regions() -> dict[str, Any]:
+    """
+    regions.json'ni qayta o'qiydi va hosila jadvallarni almashtiradi. Fayl
+    noto'g'ri bo'lsa istisno ko'tariladi va eski jadvallar o'zgarishsiz qoladi.
+    """
+    global _regions_file_sig
+    async with _regions_reload_lock:
+        started = time.perf_counter()
+        sig = _regions_file_signature()
+        tables = await asyncio.to_thread(_prepare_region_tables)
+        old, new = REGIONS, tables["REGIONS"]
+        install_region_tables(tables)
+        invite_pool.set_chats(DRIVER_CHAT_IDS.values())
+        keyboard_cache.invalidate(lambda key: isinstance(key, tuple) and key[0] == "region")
+        _regions_file_sig = sig
+        added = [name for name in new if name not in old]
+        removed = [name for name in old if name not in new]
+        changed = [name for name in new if name in old and old[name] != new[name]]
+        if added or removed or changed:
+            # Olib tashlangan hududlar ro'yxatlardan tushib qoladi — indeksni yangilaymiz
+            asyncio.create_task(rebuild_region_indexes())
+        return {
+            "regions": len(new),
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+            "open_orders_in_removed": sum(1 for o in orders.values() if o.get("region") in removed),
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+def format_region_reload(result: dict[str, Any]) -> str:
+    def _names(items):
+        return ", ".join(items) if items else "—"
+
+    text = (
+        f"🗺 <b>regions.json qayta yuklandi</b> ({result['ms']} ms)\n"
+        f"• Hududlar: <b>{result['regions']}</b>\n"
+        f"• Qo'shildi: {_names(result['added'])}\n"
+        f"• Olib tashlandi: {_names(result['removed'])}\n"
+        f"• O'zgardi: {_names(result['changed'])}"
+    )
+    if result["open_orders_in_removed"]:
+        text += f"\n⚠️ Olib tashlangan hududlarda ochiq buyurtmalar: <b>{result['open_orders_in_removed']}</b>"
+    return text
+
+
+async def regions_watcher():
+    """regions.json o'zgarsa avtomatik qayta yuklaydi (REGIONS_WATCH_INTERVAL > 0 bo'lsa)."""
+    global _regions_file_sig
+    while True:
+        await asyncio.sleep(REGIONS_WATCH_INTERVAL)
+        sig = _regions_file_signature()
+        if sig is None or sig == _regions_file_sig:
+            continue
+        try:
+            text = format_region_reload(await reload_regions())
+        except Exception as exc:
+            # Shu holatdagi faylni qayta-qayta urinmaymiz; keyingi o'zgarishni kutamiz
+            _regions_file_sig = sig
+            text = f"❌ regions.json qayta yuklanmadi, eski sozlamalar amalda: {exc}"
+        for admin in ADMIN_IDS:
+            try:
+                await bot.send_message(admin, text, parse_mode="HTML")
+            except Exception:
+                pass
+
+
+@dp.message(Command("reload_regions"))
+async def reload_regions_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    try:
+        result = await reload_regions()
+    except Exception as exc:
+        await message.reply(f"❌ regions.json qayta yuklanmadi, eski sozlamalar amalda: {exc}")
+        return
+    await message.reply(format_region_reload(result), parse_mode="HTML")
+
+# ================== CHIQUVCHI NAVBAT ==================
+@dp.update.outer_middleware()
+async def outbound_priority_middleware(handler, event, data):
+    # Update ichidagi javoblar (o'sha chatga) eng yuqori ustuvorlikda yuboriladi
+    chat = data.get("event_chat")
+    with outbound_priority(PRIORITY_INTERACTIVE, reply_chat=chat.id if chat else None):
+        return await handler(event, data)
+
+
+@dp.message(Command("queue_stats"))
+async def queue_stats_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    st = outbound.stats()
+    depth = st["queue_depth"]
+    lines = [
+        "📤 <b>Chiquvchi navbat</b>",
+        f"• Yuborilgan: <b>{st['sent']}</b>",
+        f"• 429 (RetryAfter): <b>{st['retry_after']}</b>, qayta urinishdan keyin ham xato: {st['failed_after_retries']}",
+        f"• Navbatda: interactive {depth['interactive']}, normal {depth['normal']}, background {depth['background']}",
+        f"• Chat limitini kutayotganlar: {st['chat_waiting']} (kuzatilayotgan chatlar: {st['chats_tracked']})",
+    ]
+    for name, wait in st["waits"].items():
+        lines.append(f"• Kutish ({name}): {wait['count']} ta, o'rtacha {wait['avg_ms']} ms, maks {wait['max_ms']} ms")
+    pool = invite_pool.stats()
+    available = ", ".join(
+        f"{DRIVER_CHAT_ID_TO_REGION.get(chat_id, chat_id)} {count}" for chat_id, count in pool["available"].items()
+    )
+    lines += [
+        "",
+        f"🔗 <b>Invite silkalar zaxirasi</b> (har guruhga {pool['size']} ta)",
+        f"• Zaxiradan: <b>{pool['hits']}</b>, zaxira bo'sh: {pool['misses']} (hit rate {pool['hit_rate']}%)",
+        f"• Yaratilgan: {pool['created']}, bekor qilingan: {pool['revoked']}, xatolar: {pool['errors']}",
+        f"• Mavjud: {available or '—'}",
+    ]
+    tm = timer_service.stats()
+    pending = ", ".join(f"{kind} {count}" for kind, count in tm["pending"].items())
+    lines += [
+        "",
+        "⏲ <b>Taymerlar</b>",
+        f"• Kutilmoqda: {pending or '—'}" + (f" (eng yaqini {tm['next_in']:g} s dan keyin)" if tm["next_in"] is not None else ""),
+        f"• Ishladi: {tm['fired']}, bekor qilindi: {tm['cancelled']}, kechikib tashlandi: {tm['expired']}, xatolar: {tm['errors']}",
+    ]
+    for kind, late in tm["lateness"].items():
+        lines.append(f"• Kechikish ({kind}): p50 {late['p50_ms']} / p95 {late['p95_ms']} / maks {late['max_ms']} ms")
+    await message.reply("\n".join(lines), parse_mode="HTML")
+
+@dp.message(Command("http_stats"))
+async def http_stats_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    st = http_session.stats()
+    timeouts = ", ".join(f"{name} {value:g}s" for name, value in st["method_timeouts"].items())
+    lines = [
+        "🌐 <b>Telegram API ulanishlari</b>",
+        f"• Pul: {st['pool_size']} ulanish, keep-alive {st['keepalive']:g}s, DNS kesh {st['dns_ttl']}s",
+        f"• Timeout: {st['timeout']:g}s" + (f" ({timeouts})" if timeouts else ""),
+        f"• Yangi ulanishlar: {st['connections_created']}, qayta ishlatilgan: {st['connections_reused']}"
+        f" (<b>{st['reuse_ratio']}%</b>)",
+    ]
+    methods = list(st["methods"].items())[:15]
+    if methods:
+        lines.append("")
+        lines.append("⏱ <b>Metodlar</b> (soni • o'rtacha / p50 / p95 / maks, ms)")
+        for name, m in methods:
+            lines.append(
+                f"• {name}: {m['count']} • {m['avg_ms']} / {m['p50_ms']} / {m['p95_ms']} / {m['max_ms']}"
+            )
+    if st["errors"]:
+        lines.append("")
+        lines.append("❗️ <b>Xatolar</b>")
+        for (name, error), count in sorted(st["errors"].items(), key=lambda item: -item[1])[:10]:
+            lines.append(f"• {name} — {error}: {count}")
+    await message.reply("\n".join(lines), parse_mode="HTML")
+
+# ================== METRIKALAR (Prometheus) ==================
+@dp.update.outer_middleware()
+async def update_metrics_middleware(handler, event, data):
+    started = time.perf_counter()
+    try:
+        result = await handler(event, data)
+    except Exception as exc:
+        update_metrics.observe(event.event_type, time.perf_counter() - started, type(exc).__name__)
+        raise
+    update_metrics.observe(event.event_type, time.perf_counter() - started)
+    return result
+
+
+async def handler_metrics_middleware(handler, event, data):
+    # Inner middleware: faqat filtrdan o'tgan handler uchun chaqiriladi, nomi data["handler"] da
+    name = data["handler"].callback.__name__
+    started = time.perf_counter()
+    try:
+        result = await handler(event, data)
+    except Exception as exc:
+        handler_metrics.observe(name, time.perf_counter() - started, type(exc).__name__)
+        raise
+    handler_metrics.observe(name, time.perf_counter() - started)
+    return result
+
+
+for _name, _observer in dp.observers.items():
+    if _name not in ("update", "error"):
+        _observer.middleware(handler_metrics_middleware)
+
+
+def _log_slow_callback(event: SlowCallback) -> None:
+    print(
+        f"[loop] {event.seconds * 1000:.0f} ms bloklandi: handler={event.handler or '?'} "
+        f"update={event.update_type or '?'} joy={event.where or '?'}"
+    )
+
+
+async def _alert_admins_loop_lag(text: str) -> None:
+    for admin_id in ADMIN_IDS:
+        try:
+            await bot.send_message(admin_id, text)
+        except Exception:
+            pass
+
+
+loop_monitor = LoopLagMonitor(
+    interval=LOOP_LAG_INTERVAL,
+    slow_threshold=LOOP_SLOW_MS / 1000,
+    alert_threshold=LOOP_LAG_ALERT_MS / 1000,
+    alert_after=LOOP_LAG_ALERT_SECONDS,
+    alert_cooldown=LOOP_LAG_ALERT_COOLDOWN,
+    project_dir=BASE_DIR,
+    on_slow=_log_slow_callback,
+    on_alert=_alert_admins_loop_lag,
+)
+# Loop bloklanganda stekda shu middleware bo'lsa — handler nomi va update turi olinadi
+loop_monitor.register_context(
+    handler_metrics_middleware,
+    lambda f: (f.get("name"), getattr(f["data"].get("event_update"), "event_type", None)),
+)
+
+
+@dp.message(Command("loop_stats"))
+async def loop_stats_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    st = loop_monitor.stats()
+    w, t = st["window"], st["total"]
+    lines = [
+        "🔁 <b>Event loop kechikishi</b>",
+        f"• Oxirgi 15 daqiqa: {w['count']} o'lchov • p50 {w['p50_ms']} / p95 {w['p95_ms']} / maks {w['max_ms']} ms",
+        f"• Ishga tushgandan beri: {t['count']} o'lchov • o'rtacha {t['avg_ms']} / maks {t['max_ms']} ms",
+        f"• Sekin callbacklar (>{st['slow_threshold_ms']} ms): <b>{st['slow_total']}</b>, ogohlantirishlar: {st['alerts']}",
+    ]
+    by_handler = list(st["slow_by_handler"].items())[:10]
+    if by_handler:
+        lines.append("")
+        lines.append("🐢 <b>Handler bo'yicha</b>")
+        lines += [f"• {name}: {count}" for name, count in by_handler]
+    if st["recent"]:
+        lines.append("")
+        lines.append("🕒 <b>Oxirgilari</b>")
+        for event in reversed(st["recent"]):
+            lines.append(
+                f"• {datetime.fromtimestamp(event.at).strftime('%H:%M:%S')} {event.seconds * 1000:.0f} ms — "
+                f"{event.handler or '?'} ({event.update_type or '?'}) <code>{event.where or '?'}</code>"
+            )
+    await message.reply("\n".join(lines), parse_mode="HTML")
+
+
+def render_metrics() -> str:
+    out = PrometheusText()
+    out.latency("eltiber_update", "Update qayta ishlash vaqti (update turi bo'yicha)", "type", update_metrics)
+    out.latency("eltiber_handler", "Handler bajarilish vaqti", "handler", handler_metrics)
+    out.latency("eltiber_telegram_api", "Telegram API so'rovlari", "method", http_session.metrics)
+    out.counter(
+        "eltiber_events_total",
+        "Buyurtma voronkasi va to'lovlar",
+        (({"event": name}, value) for name, value in business.values.items()),
+    )
+    st = outbound.stats()
+    out.counter("eltiber_outbound_sent_total", "Limiter orqali yuborilgan so'rovlar", [({}, st["sent"])])
+    out.counter("eltiber_outbound_retry_after_total", "429 (RetryAfter) javoblari", [({}, st["retry_after"])])
+    out.gauge(
+        "eltiber_outbound_queue_depth",
+        "Chiquvchi navbat uzunligi",
+        (({"priority": name}, depth) for name, depth in st["queue_depth"].items()),
+    )
+    out.gauge("eltiber_orders", "RAM'dagi buyurtmalar (holat bo'yicha)", (
+        ({"status": status}, sum(1 for o in orders.values() if o.get("status") == status))
+        for status in ("open", "accepted", "completed")
+    ))
+    out.histograms("eltiber_loop_lag_seconds", "Event loop kechikishi", "monitor", {"probe": loop_monitor.lag.total})
+    out.counter(
+        "eltiber_loop_slow_callbacks_total",
+        "Loop'ni bloklagan callbacklar (handler bo'yicha)",
+        (({"handler": name}, count) for name, count in loop_monitor.slow_by_handler.items()),
+    )
+    tm = timer_service.stats()
+    out.gauge("eltiber_timers_pending", "Kutilayotgan taymerlar", (({"kind": k}, v) for k, v in tm["pending"].items()))
+    out.counter("eltiber_timers_fired_total", "Ishlagan taymerlar", [({}, tm["fired"])])
+    out.counter("eltiber_timers_expired_total", "Juda kech bo'lgani uchun tashlangan taymerlar", [({}, tm["expired"])])
+    out.histograms("eltiber_timer_lateness_seconds", "Taymer rejalashtirilgan paytdan qancha kech ishladi", "kind", timer_service.lateness)
+    out.gauge("eltiber_drafts", "To'ldirilayotgan buyurtmalar", [({}, len(drafts))])
+    out.gauge("eltiber_users", "Ro'yxatdagi foydalanuvchilar", [({}, len(user_profiles))])
+    out.gauge("eltiber_uptime_seconds", "Ishga tushgandan beri", [({}, round(time.time() - STARTED_AT, 1))])
+    return out.render()
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(body=render_metrics().encode("utf-8"), headers={"Content-Type": PrometheusText.CONTENT_TYPE})
+
+
+async def start_metrics_server() -> web.AppRunner | None:
+    if METRICS_PORT <= 0:
+        return None
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_endpoint)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=METRICS_HOST, port=METRICS_PORT).start()
+    print(f"Metrikalar: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return runner
+
+# ================== ADMIN: BROADCAST ==================
+BROADCAST_HELP = (
+    "📣 <b>/broadcast</b> — yubormoqchi bo'lgan xabaringizga <b>reply</b> qilib yozing.\n"
+    "Filtrlar (bir nechtasi birga — hammasi bajarilishi kerak):\n"
+    "• <code>all</code> — barcha foydalanuvchilar\n"
+    "• <code>region=Quva</code> — hudud bo'yicha (haydovchi hududlari va oxirgi buyurtma hududi)\n"
+    "• <code>drivers</code> — haydovchi profili borlar\n"
+    "• <code>subscribed</code> / <code>trial</code> — faol obuna / bepul sinovdagilar\n"
+    "• <code>phone</code> — telefon raqami saqlanganlar\n"
+    "Masalan: <code>/broadcast region=Quva drivers</code>\n"
+    "/broadcast_status — holat, /broadcast_cancel — to'xtatish"
+)
+
+
+def parse_broadcast_filters(text: str) -> dict[str, Any]:
+    filters: dict[str, Any] = {}
+    for token in text.split():
+        key, _, value = token.partition("=")
+        key = key.strip().lower()
+        if key == "region":
+            region = resolve_region_name(value.replace("_", " "), fuzzy=True)
+            if not region:
+                raise ValueError(f"Noma'lum hudud: {value}")
+            filters.setdefault("regions", []).append(region)
+        elif key in ("all", "drivers", "subscribed", "trial", "phone"):
+            filters[key] = True
+        else:
+            raise ValueError(f"Noma'lum filtr: {token}")
+    if not filters:
+        raise ValueError("Filtr ko'rsatilmagan")
+    return filters
+
+
+def describe_broadcast_filters(filters: dict[str, Any]) -> str:
+    parts = [f"region={r}" for r in filters.get("regions", [])]
+    parts += [key for key in ("all", "drivers", "subscribed", "trial", "phone") if filters.get(key)]
+    return " ".join(parts)
+
+
+async def select_broadcast_targets(filters: dict[str, Any]) -> list[int]:
+    profiles = dict(await asyncio.to_thread(lambda: list(user_profiles.items())))
+    candidates = set(profiles) | set(subscriptions) | set(trial_members)
+    if filters.get("regions") and driver_regions_index.ready:
+        candidates = set().union(*(drivers_in_region(r) for r in filters["regions"]))
+    targets = []
+    for uid in sorted(candidates):
+        profile = profiles.get(uid) or {}
+        if filters.get("regions"):
+            regions = resolve_driver_regions(uid)
+            if not any(r in regions for r in filters["regions"]):
+                continue
+        if filters.get("drivers") and not (_profile_regions_of(profile) or uid in subscriptions):
+            continue
+        if filters.get("subscribed") and not (subscriptions.get(uid) or {}).get("active"):
+            continue
+        if filters.get("trial") and uid not in trial_members:
+            continue
+        if filters.get("phone") and not profile.get("phone"):
+            continue
+        targets.append(uid)
+    return targets
+
+
+async def _broadcast_send(uid: int, job: dict) -> None:
+    await bot.copy_message(chat_id=uid, from_chat_id=job["from_chat_id"], message_id=job["message_id"])
+
+
+def format_broadcast_status(st: dict[str, Any]) -> str:
+    titles = {"running": "⏳ Davom etmoqda", "done": "✅ Yakunlandi", "cancelled": "⛔️ To'xtatildi"}
+    return (
+        f"📣 <b>Broadcast</b> — {titles.get(st['state'], st['state'])}\n"
+        f"• Filtr: <code>{st['filters']}</code>\n"
+        f"• Jarayon: <b>{st['processed']}</b> / {st['total']}\n"
+        f"• Yetkazildi: <b>{st['delivered']}</b>\n"
+        f"• Bloklagan: <b>{st['blocked']}</b>\n"
+        f"• Xato: <b>{st['failed']}</b>\n"
+        f"• Vaqt: {st['elapsed_s']} s, tezlik: {st['rate']} xabar/s"
+    )
+
+
+async def _broadcast_finished(job: dict) -> None:
+    st = broadcasts.status()
+    if st:
+        await bot.send_message(job["admin_chat"], format_broadcast_status(st), parse_mode="HTML")
+
+
+broadcasts = BroadcastEngine(
+    BROADCAST_STATE_PATH,
+    _broadcast_send,
+    concurrency=BROADCAST_CONCURRENCY,
+    on_finish=_broadcast_finished,
+)
+
+
+@dp.message(Command("broadcast"))
+async def broadcast_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    source = message.reply_to_message
+    args = (message.text or "").split(maxsplit=1)[1:]
+    if source is None or not args:
+        await message.reply(BROADCAST_HELP, parse_mode="HTML")
+        return
+    if broadcasts.running:
+        await message.reply("❗️ Boshqa broadcast davom etmoqda. /broadcast_status yoki /broadcast_cancel")
+        return
+    try:
+        filters = parse_broadcast_filters(args[0])
+    except ValueError as exc:
+        await message.reply(f"❗️ {exc}\n\n{BROADCAST_HELP}", parse_mode="HTML")
+        return
+    targets = await select_broadcast_targets(filters)
+    if not targets:
+        await message.reply("ℹ️ Filtrga mos foydalanuvchi topilmadi.")
+        return
+    description = describe_broadcast_filters(filters)
+    broadcasts.start(targets, {
+        "filters": description,
+        "admin_chat": message.chat.id,
+        "from_chat_id": source.chat.id,
+        "message_id": source.message_id,
+    })
+    await message.reply(
+        f"📣 Broadcast boshlandi: <b>{len(targets)}</b> ta foydalanuvchi (<code>{description}</code>).",
+        parse_mode="HTML"
+    )
+
+
+@dp.message(Command("broadcast_status"))
+async def broadcast_status_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    st = broadcasts.status()
+    if not st:
+        await message.reply("ℹ️ Hali broadcast bo'lmagan.")
+        return
+    await message.reply(format_broadcast_status(st), parse_mode="HTML")
+
+
+@dp.message(Command("broadcast_cancel"))
+async def broadcast_cancel_cmd(message: types.Message):
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    if not await broadcasts.cancel():
+        await message.reply("ℹ️ Davom etayotgan broadcast yo'q.")
+        return
+    await message.reply(format_broadcast_status(broadcasts.status()), parse_mode="HTML")
+
+# ================== WARM RESTART (RAM holatini saqlash/tiklash) ==================
+RUNTIME_STATE_KEYS = ("orders", "subscriptions", "trial_members", "pending_invites", "drafts", "driver_onboarding")
+
+
+# Har bo'lim loop ichida sayoz nusxa qaytaradi; pickle thread'da. Holatni o'zgartirgan
+# kod tegishli bo'limni runtime_state.mark_dirty("orders", ...) bilan belgilaydi
+RUNTIME_STATE_SECTIONS = {
+    "orders": lambda: dict(orders),
+    "subscriptions": lambda: dict(subscriptions),
+    "trial_members": lambda: dict(trial_members),
+    "pending_invites": lambda: dict(pending_invites),
+    "drafts": lambda: dict(drafts),
+    "driver_onboarding": lambda: dict(driver_onboarding),
+    "invite_pool": lambda: invite_pool.export(),
+    "timers": lambda: timer_service.export(),
+}
+
+
+def apply_runtime_state(state: dict) -> int:
+    targets = {
+        "orders": orders,
+        "subscriptions": subscriptions,
+        "trial_members": trial_members,
+        "pending_invites": pending_invites,
+        "drafts": drafts,
+        "driver_onboarding": driver_onboarding,
+    }
+    restored = 0
+    for key in RUNTIME_STATE_KEYS:
+        data = state.get(key)
+        if isinstance(data, dict):
+            targets[key].update(data)
+            restored += len(data)
+    restored += invite_pool.restore(state.get("invite_pool"))
+
+    for customer_id, order in list(orders.items()):
+        if not isinstance(order, Order):
+            # Eski snapshot'dagi dict yozuvlar
+            orders[customer_id] = Order.from_dict(order)
+    if "timers" in state:
+        restored += timer_service.restore(state["timers"])
+    else:
+        # Taymerlarsiz (eski) snapshot: eslatmalar buyurtmalardan qayta hisoblanadi,
+        # o'tib ketgan vaqtlar uchun qayta yuborilmaydi
+        now = datetime.now()
+        for customer_id, order in orders.items():
+            if order.get("status") == "accepted" and order.get("when") and order_event_dt(order, now=now) > now:
+                schedule_driver_reminders(customer_id)
+    return restored
+
+
+runtime_state = StateSnapshotter(RUNTIME_STATE_PATH, RUNTIME_STATE_SECTIONS, interval=RUNTIME_STATE_INTERVAL)
+
+
+@dp.update.outer_middleware()
+async def runtime_state_middleware(handler, event, data):
+    # Faqat handler belgilagan bo'limlar; ular handler tugagach yana belgilanadi
+    with runtime_state.tracking():
+        return await handler(event, data)
+
+
+def restore_runtime_state() -> None:
+    state = runtime_state.load()
+    if not state:
+        return
+    restored = apply_runtime_state(state)
+    # Guruhga chiqib ulgurmagan buyurtmalar qayta navbatga qo'yiladi
+    for customer_id, order in orders.items():
+        if order.get("status") == "open" and order.get("msg_id") is None:
+            queue_group_post(customer_id, order)
+    print(
+        f"RAM holati tiklandi: {restored} ta yozuv "
+        f"({runtime_state.last_restore_ms:.1f} ms, saqlangan: {state.get('saved_at')})"
+    )
+
 # ================== POLLING ==================
-async def main():
-    print("Bot ishga tushmoqda...")
-    await bot.delete_webhook(drop_pending_updates=True)
+async def warm_up_profiles() -> None:
+    # Profillar fon rejimida yuklanadi, so'ng hudud indekslari quriladi
+    await profile_store.preload()
+    try:
+        # Trial muddatlari indekslardan oldin — tiklangan trial'lar ham indeksga tushadi
+        loaded = await load_trial_deadlines()
+        if loaded:
+            print(f"Profillardan {loaded} ta trial muddati tiklandi")
+    except Exception:
+        pass
+    try:
+        await rebuild_region_indexes()
+    except Exception:
+        # Indeks tayyor bo'lmasa resolve_driver_regions manbalardan hisoblayveradi
+        pass
+
 
-    # >>> Trial nazoratchisini fon rejimda ishga tushiramiz
-    asyncio.create_task(trial_watcher())
+def build_webhook_app() -> web.Application:
+    """Webhook uchun aiohttp ilova: secret tekshiriladi, Telegram'ga darhol 200 qaytadi, update fonda ishlanadi."""
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=WEBHOOK_SECRET,
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook() -> None:
+    if not WEBHOOK_BASE_URL:
+        raise RuntimeError("BOT_MODE=webhook uchun WEBHOOK_BASE_URL o'rnatilishi kerak")
+    runner = web.AppRunner(build_webhook_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBHOOK_HOST, port=WEBHOOK_PORT)
+    await site.start()
+    # Server tayyor bo'lgach webhook o'rnatiladi — birinchi update yo'qolmaydi
+    await bot.set_webhook(
+        url=WEBHOOK_BASE_URL + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        drop_pending_updates=True,
+    )
+    print(f"Webhook: {WEBHOOK_BASE_URL}{WEBHOOK_PATH} ({WEBHOOK_HOST}:{WEBHOOK_PORT})")
+    # start_polling kabi SIGINT/SIGTERM'da muloyim to'xtaymiz (finally ichida holat saqlanadi)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
 
+
+async def run_polling() -> None:
+    await bot.delete_webhook(drop_pending_updates=True)
     await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
+
+async def main():
+    print("Bot ishga tushmoqda...")
+    restore_runtime_state()
+
+    asyncio.create_task(warm_up_profiles())
+    if REGIONS_WATCH_INTERVAL > 0:
+        asyncio.create_task(regions_watcher())
+    # To'xtab qolgan broadcast bo'lsa — checkpoint'dan davom ettiramiz
+    broadcasts.resume()
+    invite_pool.start()
+    timer_service.start()
+    profile_store.start()
+    runtime_state.start()
+    metrics_runner = await start_metrics_server()
+    loop_monitor.start()
+
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await run_polling()
+    finally:
+        # To'xtashda navbatdagi profil o'zgarishlarini va RAM holatini diskka yozib qo'yamiz
+        loop_monitor.stop()
+        await broadcasts.suspend()
+        await drain_group_posts(GROUP_POST_DRAIN_SECONDS)
+        await invite_pool.close()
+        await timer_service.close()
+        await runtime_state.close()
+        await profile_store.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+
 if __name__ == "__main__":
     asyncio.run(main())